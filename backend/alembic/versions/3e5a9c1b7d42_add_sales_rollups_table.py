@@ -0,0 +1,39 @@
+"""Add sales_rollups table for hourly and daily sales time series
+
+Revision ID: 3e5a9c1b7d42
+Revises: f2c8b5d17e94
+Create Date: 2026-02-12 10:03:44.581290
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '3e5a9c1b7d42'
+down_revision: Union[str, Sequence[str], None] = 'f2c8b5d17e94'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # History is filled in with `python sales_rollups.py --since <first sale>`
+    op.create_table(
+        'sales_rollups',
+        sa.Column('granularity', sa.String(), primary_key=True),
+        sa.Column('bucket', sa.DateTime(), primary_key=True),
+        sa.Column('staff_id', sa.Integer(), primary_key=True),
+        sa.Column('category_id', sa.Integer(), primary_key=True),
+        sa.Column('revenue', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('discount', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('units', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('voucher_count', sa.Integer(), nullable=False, server_default='0'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('sales_rollups')
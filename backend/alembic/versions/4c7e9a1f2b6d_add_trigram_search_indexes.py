@@ -0,0 +1,35 @@
+"""Add pg_trgm GIN indexes for product and customer search
+
+Revision ID: 4c7e9a1f2b6d
+Revises: b3f1c2a9e8d4
+Create Date: 2026-01-12 14:27:03.551870
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '4c7e9a1f2b6d'
+down_revision: Union[str, Sequence[str], None] = 'b3f1c2a9e8d4'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # gin_trgm_ops indexes serve ILIKE '%term%' as well as the similarity operators (%, <%)
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    op.create_index('ix_stock_name_trgm', 'stock', ['name'], postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_customers_name_trgm', 'customers', ['name'], postgresql_using='gin', postgresql_ops={'name': 'gin_trgm_ops'})
+    op.create_index('ix_customers_phone_trgm', 'customers', ['phone'], postgresql_using='gin', postgresql_ops={'phone': 'gin_trgm_ops'})
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_customers_phone_trgm', table_name='customers')
+    op.drop_index('ix_customers_name_trgm', table_name='customers')
+    op.drop_index('ix_stock_name_trgm', table_name='stock')
+    # The pg_trgm extension is left installed; other objects may depend on it
@@ -0,0 +1,33 @@
+"""Add change_counters table for catalog ETags
+
+Revision ID: 5a8b3d6e1f07
+Revises: 9e2d5b7c4a13
+Create Date: 2026-01-16 10:05:52.770341
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5a8b3d6e1f07'
+down_revision: Union[str, Sequence[str], None] = '9e2d5b7c4a13'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'change_counters',
+        sa.Column('name', sa.String(), primary_key=True),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='0'),
+    )
+    op.execute("INSERT INTO change_counters (name, version) VALUES ('stock', 0), ('categories', 0)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('change_counters')
@@ -0,0 +1,36 @@
+"""Add voucher_receipts table for pre-rendered receipts
+
+Revision ID: 6b4f0e9a2c37
+Revises: a7e1d3f58c20
+Create Date: 2026-02-05 16:48:22.193807
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '6b4f0e9a2c37'
+down_revision: Union[str, Sequence[str], None] = 'a7e1d3f58c20'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Existing vouchers get their receipt rendered on first reprint (receipts.get)
+    op.create_table(
+        'voucher_receipts',
+        sa.Column('voucher_id', sa.Integer(), primary_key=True),
+        sa.Column('text', sa.String(), nullable=False),
+        sa.Column('escpos', sa.LargeBinary(), nullable=False),
+        sa.Column('html', sa.String(), nullable=False),
+        sa.Column('created_at', sa.DateTime(), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('voucher_receipts')
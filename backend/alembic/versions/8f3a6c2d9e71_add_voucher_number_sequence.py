@@ -0,0 +1,29 @@
+"""Add voucher_number_seq for block-allocated voucher numbers
+
+Revision ID: 8f3a6c2d9e71
+Revises: e47a2c9f6d15
+Create Date: 2026-01-23 10:41:36.208154
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '8f3a6c2d9e71'
+down_revision: Union[str, Sequence[str], None] = 'e47a2c9f6d15'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Each nextval reserves a block of 100 numbers (models.VOUCHER_NUMBER_BLOCK)
+    op.execute(sa.schema.CreateSequence(sa.Sequence('voucher_number_seq', start=1, increment=100)))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.execute(sa.schema.DropSequence(sa.Sequence('voucher_number_seq')))
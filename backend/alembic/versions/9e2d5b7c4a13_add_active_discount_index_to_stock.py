@@ -0,0 +1,35 @@
+"""Add partial index on stock discount window
+
+Revision ID: 9e2d5b7c4a13
+Revises: 4c7e9a1f2b6d
+Create Date: 2026-01-14 16:40:19.204118
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '9e2d5b7c4a13'
+down_revision: Union[str, Sequence[str], None] = '4c7e9a1f2b6d'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Effective price depends on now(), so it can't be a stored column. Instead, index the
+    # (small) set of discounted products by their window so on_sale filters stay cheap.
+    op.create_index(
+        'ix_stock_discount_window', 'stock', ['discount_start_date', 'discount_end_date'],
+        postgresql_where=sa.text('discount_percent > 0')
+    )
+    op.create_index('ix_stock_price', 'stock', ['price'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stock_price', table_name='stock')
+    op.drop_index('ix_stock_discount_window', table_name='stock')
@@ -0,0 +1,153 @@
+"""Partition vouchers and voucher_items by month of created_at
+
+Revision ID: a7e1d3f58c20
+Revises: 2d9c4e7b1a58
+Create Date: 2026-02-02 11:05:19.664023
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a7e1d3f58c20'
+down_revision: Union[str, Sequence[str], None] = '2d9c4e7b1a58'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 12 # Same as voucher_partitions.PARTITION_MONTHS_AHEAD
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_month(month: date):
+    upper = _add_months(month, 1)
+    for table in ('vouchers', 'voucher_items'):
+        op.execute(
+            f"CREATE TABLE {table}_{month:%Y_%m} PARTITION OF {table} "
+            f"FOR VALUES FROM ('{month.isoformat()}') TO ('{upper.isoformat()}')"
+        )
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.add_column('voucher_items', sa.Column('created_at', sa.DateTime(), nullable=True))
+    op.execute(
+        "UPDATE voucher_items SET created_at = "
+        "(SELECT vouchers.created_at FROM vouchers WHERE vouchers.id = voucher_items.voucher_id)"
+    )
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # 1. Move the current tables aside. Their id sequences are kept for the new tables.
+    op.execute("UPDATE vouchers SET created_at = now() AT TIME ZONE 'utc' WHERE created_at IS NULL")
+    op.execute("UPDATE voucher_items SET created_at = now() AT TIME ZONE 'utc' WHERE created_at IS NULL")
+    op.execute("ALTER SEQUENCE vouchers_id_seq OWNED BY NONE")
+    op.execute("ALTER SEQUENCE voucher_items_id_seq OWNED BY NONE")
+    op.execute("ALTER TABLE voucher_items RENAME TO voucher_items_unpartitioned")
+    op.execute("ALTER TABLE vouchers RENAME TO vouchers_unpartitioned")
+    for index in ('ix_voucher_items_id', 'ix_vouchers_id', 'ix_vouchers_voucher_number'):
+        op.execute(f"DROP INDEX IF EXISTS {index}")
+
+    # 2. Partitioned parents. The partition key has to be part of every unique constraint, so
+    #    voucher_number is no longer unique in the database; voucher_numbers.py guarantees it.
+    op.execute("""
+        CREATE TABLE vouchers (
+            id INTEGER NOT NULL DEFAULT nextval('vouchers_id_seq'),
+            voucher_number VARCHAR,
+            total_amount FLOAT,
+            total_discount FLOAT,
+            discount_percentage FLOAT,
+            discount_amount FLOAT,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            delivery_address VARCHAR,
+            staff_id INTEGER REFERENCES users (id),
+            customer_id INTEGER REFERENCES customers (id),
+            PRIMARY KEY (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("""
+        CREATE TABLE voucher_items (
+            id INTEGER NOT NULL DEFAULT nextval('voucher_items_id_seq'),
+            voucher_id INTEGER NOT NULL,
+            product_id INTEGER REFERENCES stock (id),
+            quantity INTEGER,
+            price_at_sale FLOAT,
+            subtotal FLOAT,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL,
+            PRIMARY KEY (id, created_at),
+            CONSTRAINT fk_voucher_items_voucher FOREIGN KEY (voucher_id, created_at) REFERENCES vouchers (id, created_at)
+        ) PARTITION BY RANGE (created_at)
+    """)
+    op.execute("ALTER SEQUENCE vouchers_id_seq OWNED BY vouchers.id")
+    op.execute("ALTER SEQUENCE voucher_items_id_seq OWNED BY voucher_items.id")
+    op.create_index('ix_vouchers_id', 'vouchers', ['id'])
+    op.create_index('ix_vouchers_voucher_number', 'vouchers', ['voucher_number'])
+    op.create_index('ix_voucher_items_id', 'voucher_items', ['id'])
+    op.create_index('ix_voucher_items_voucher_id', 'voucher_items', ['voucher_id'])
+
+    # 3. One partition per month, from the first sale to MONTHS_AHEAD months from now
+    #    (voucher_partitions.ensure_partitions() keeps creating them from there), plus a
+    #    default partition as a safety net that should stay empty.
+    first = op.get_bind().execute(sa.text("SELECT min(created_at) FROM vouchers_unpartitioned")).scalar()
+    today = datetime.utcnow().date().replace(day=1)
+    month = (first.date().replace(day=1) if first else today)
+    while month <= _add_months(today, MONTHS_AHEAD):
+        _create_month(month)
+        month = _add_months(month, 1)
+    op.execute("CREATE TABLE vouchers_default PARTITION OF vouchers DEFAULT")
+    op.execute("CREATE TABLE voucher_items_default PARTITION OF voucher_items DEFAULT")
+
+    # 4. Copy the history over and drop the old tables
+    op.execute("""
+        INSERT INTO vouchers (id, voucher_number, total_amount, total_discount, discount_percentage,
+                              discount_amount, created_at, delivery_address, staff_id, customer_id)
+        SELECT id, voucher_number, total_amount, total_discount, discount_percentage,
+               discount_amount, created_at, delivery_address, staff_id, customer_id
+        FROM vouchers_unpartitioned
+    """)
+    op.execute("""
+        INSERT INTO voucher_items (id, voucher_id, product_id, quantity, price_at_sale, subtotal, created_at)
+        SELECT id, voucher_id, product_id, quantity, price_at_sale, subtotal, created_at
+        FROM voucher_items_unpartitioned
+    """)
+    op.execute("DROP TABLE voucher_items_unpartitioned")
+    op.execute("DROP TABLE vouchers_unpartitioned")
+
+    # 5. Archive tier: voucher_partitions.archive_partitions() moves old months under these parents
+    op.execute("CREATE SCHEMA IF NOT EXISTS archive")
+    op.execute("CREATE TABLE archive.vouchers (LIKE public.vouchers) PARTITION BY RANGE (created_at)")
+    op.execute("CREATE TABLE archive.voucher_items (LIKE public.voucher_items) PARTITION BY RANGE (created_at)")
+    op.execute("CREATE INDEX ix_archive_vouchers_voucher_number ON archive.vouchers (voucher_number)")
+    op.execute("CREATE INDEX ix_archive_voucher_items_voucher_id ON archive.voucher_items (voucher_id)")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        # Archived months are brought back too, so nothing is lost
+        op.execute("CREATE TABLE vouchers_unpartitioned AS SELECT * FROM vouchers UNION ALL SELECT * FROM archive.vouchers")
+        op.execute("CREATE TABLE voucher_items_unpartitioned AS SELECT * FROM voucher_items UNION ALL SELECT * FROM archive.voucher_items")
+        op.execute("DROP SCHEMA archive CASCADE")
+        op.execute("ALTER SEQUENCE vouchers_id_seq OWNED BY NONE")
+        op.execute("ALTER SEQUENCE voucher_items_id_seq OWNED BY NONE")
+        op.execute("DROP TABLE voucher_items")
+        op.execute("DROP TABLE vouchers")
+        op.execute("ALTER TABLE vouchers_unpartitioned RENAME TO vouchers")
+        op.execute("ALTER TABLE voucher_items_unpartitioned RENAME TO voucher_items")
+        op.execute("ALTER TABLE vouchers ALTER COLUMN id SET DEFAULT nextval('vouchers_id_seq'), ALTER COLUMN id SET NOT NULL, ADD PRIMARY KEY (id)")
+        op.execute("ALTER TABLE voucher_items ALTER COLUMN id SET DEFAULT nextval('voucher_items_id_seq'), ALTER COLUMN id SET NOT NULL, ADD PRIMARY KEY (id)")
+        op.execute("ALTER SEQUENCE vouchers_id_seq OWNED BY vouchers.id")
+        op.execute("ALTER SEQUENCE voucher_items_id_seq OWNED BY voucher_items.id")
+        op.execute("ALTER TABLE vouchers ADD FOREIGN KEY (staff_id) REFERENCES users (id), ADD FOREIGN KEY (customer_id) REFERENCES customers (id)")
+        op.execute("ALTER TABLE voucher_items ADD FOREIGN KEY (voucher_id) REFERENCES vouchers (id), ADD FOREIGN KEY (product_id) REFERENCES stock (id)")
+        op.create_index('ix_vouchers_id', 'vouchers', ['id'])
+        op.create_index('ix_vouchers_voucher_number', 'vouchers', ['voucher_number'], unique=True)
+        op.create_index('ix_voucher_items_id', 'voucher_items', ['id'])
+    op.drop_column('voucher_items', 'created_at')
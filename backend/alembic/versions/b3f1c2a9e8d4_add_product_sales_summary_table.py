@@ -0,0 +1,45 @@
+"""Add product_sales summary table
+
+Revision ID: b3f1c2a9e8d4
+Revises: d0610159f4d5
+Create Date: 2026-01-10 09:12:41.318204
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b3f1c2a9e8d4'
+down_revision: Union[str, Sequence[str], None] = 'd0610159f4d5'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'product_sales',
+        sa.Column('product_id', sa.Integer(), sa.ForeignKey('stock.id'), primary_key=True),
+        sa.Column('total_sold', sa.Integer(), nullable=False, server_default='0'),
+        sa.Column('total_revenue', sa.Float(), nullable=False, server_default='0'),
+        sa.Column('last_sold_at', sa.DateTime(), nullable=True),
+    )
+    # Backfill from the existing sales history
+    op.execute(
+        """
+        INSERT INTO product_sales (product_id, total_sold, total_revenue, last_sold_at)
+        SELECT vi.product_id, SUM(vi.quantity), COALESCE(SUM(vi.subtotal), 0), MAX(v.created_at)
+        FROM voucher_items vi
+        JOIN vouchers v ON v.id = vi.voucher_id
+        WHERE vi.product_id IS NOT NULL
+        GROUP BY vi.product_id
+        """
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('product_sales')
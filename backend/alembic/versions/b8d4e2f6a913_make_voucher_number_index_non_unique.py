@@ -0,0 +1,36 @@
+"""Make the voucher_number index non-unique on every database
+
+Revision ID: b8d4e2f6a913
+Revises: 3e5a9c1b7d42
+Create Date: 2026-02-16 09:41:27.318054
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'b8d4e2f6a913'
+down_revision: Union[str, Sequence[str], None] = '3e5a9c1b7d42'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # PostgreSQL lost the unique index when vouchers was partitioned (a7e1d3f58c20); the
+    # other databases kept it. Recreate it as a plain index so every schema matches the model.
+    if op.get_bind().dialect.name == 'postgresql':
+        return
+    op.drop_index('ix_vouchers_voucher_number', table_name='vouchers')
+    op.create_index('ix_vouchers_voucher_number', 'vouchers', ['voucher_number'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    if op.get_bind().dialect.name == 'postgresql':
+        return
+    op.drop_index('ix_vouchers_voucher_number', table_name='vouchers')
+    op.create_index('ix_vouchers_voucher_number', 'vouchers', ['voucher_number'], unique=True)
@@ -0,0 +1,70 @@
+"""Create voucher partitions a year ahead and empty the default partitions
+
+Revision ID: c4a7f2e9d813
+Revises: b8d4e2f6a913
+Create Date: 2026-02-16 14:22:08.907316
+
+"""
+from datetime import date, datetime
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c4a7f2e9d813'
+down_revision: Union[str, Sequence[str], None] = 'b8d4e2f6a913'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+MONTHS_AHEAD = 12 # Same as voucher_partitions.PARTITION_MONTHS_AHEAD
+
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def _create_month(month: date):
+    # Same as voucher_partitions._create_month(): rows already in the default partition are moved
+    # into the new month before it is attached, since PostgreSQL refuses the partition otherwise
+    suffix = f"{month:%Y_%m}"
+    lower, upper = month.isoformat(), _add_months(month, 1).isoformat()
+    bounds = f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    in_month = f"created_at >= '{lower}' AND created_at < '{upper}'"
+    for table in ('vouchers', 'voucher_items'):
+        op.execute(f"CREATE TABLE {table}_{suffix} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)")
+        op.execute(f"INSERT INTO {table}_{suffix} SELECT * FROM {table}_default WHERE {in_month}")
+    for table in ('voucher_items', 'vouchers'):
+        op.execute(f"DELETE FROM {table}_default WHERE {in_month}")
+    for table in ('vouchers', 'voucher_items'):
+        op.execute(f"ALTER TABLE {table} ATTACH PARTITION {table}_{suffix} {bounds}")
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+    bind = op.get_bind()
+    existing = set(bind.execute(sa.text("""
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_namespace ns ON ns.oid = parent.relnamespace
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE ns.nspname = 'public' AND parent.relname = 'vouchers'
+    """)).scalars().all())
+    stranded = bind.execute(sa.text(
+        "SELECT DISTINCT date_trunc('month', created_at)::date FROM vouchers_default"
+    )).scalars().all()
+    today = datetime.utcnow().date().replace(day=1)
+    months = {_add_months(today, offset) for offset in range(MONTHS_AHEAD + 1)} | set(stranded)
+    for month in sorted(months):
+        if f"vouchers_{month:%Y_%m}" not in existing:
+            _create_month(month)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    # The partitions hold data once sales reach them, so they are left in place
+    pass
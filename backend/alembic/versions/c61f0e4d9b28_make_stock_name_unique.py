@@ -0,0 +1,52 @@
+"""Make stock.name unique
+
+Revision ID: c61f0e4d9b28
+Revises: 5a8b3d6e1f07
+Create Date: 2026-01-19 11:31:46.092517
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'c61f0e4d9b28'
+down_revision: Union[str, Sequence[str], None] = '5a8b3d6e1f07'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The API already rejects duplicate names; the bulk import upserts ON CONFLICT (name).
+    # Both store names trimmed and lower-cased, so older rows are normalized the same way first.
+    # Names that only become equal then (or already were) have to be merged by hand: stop and
+    # list them rather than pick which row's stock, prices and sales history to keep.
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text("""
+        SELECT lower(trim(name)) AS normalized, id, name FROM stock
+        WHERE lower(trim(name)) IN (
+            SELECT lower(trim(name)) FROM stock GROUP BY lower(trim(name)) HAVING count(*) > 1
+        )
+        ORDER BY normalized, id
+    """)).all()
+    if duplicates:
+        groups = {}
+        for normalized, stock_id, name in duplicates:
+            groups.setdefault(normalized, []).append(f"{stock_id} ({name!r})")
+        listing = "\n".join(f"  {normalized!r}: ids {', '.join(rows)}" for normalized, rows in groups.items())
+        raise RuntimeError(
+            f"Cannot make stock.name unique: {len(groups)} name(s) are used by more than one stock item "
+            f"once trimmed and lower-cased. Rename or merge these items, then rerun the migration:\n{listing}"
+        )
+    op.execute("UPDATE stock SET name = lower(trim(name)) WHERE name <> lower(trim(name))")
+    op.drop_index('ix_stock_name', table_name='stock')
+    op.create_index('ix_stock_name', 'stock', ['name'], unique=True)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_stock_name', table_name='stock')
+    op.create_index('ix_stock_name', 'stock', ['name'], unique=False)
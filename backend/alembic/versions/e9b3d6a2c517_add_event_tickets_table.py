@@ -0,0 +1,34 @@
+"""Add event_tickets table for single-use event stream tickets
+
+Revision ID: e9b3d6a2c517
+Revises: c4a7f2e9d813
+Create Date: 2026-02-17 10:26:51.442938
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e9b3d6a2c517'
+down_revision: Union[str, Sequence[str], None] = 'c4a7f2e9d813'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'event_tickets',
+        sa.Column('jti', sa.String(), primary_key=True),
+        sa.Column('expires_at', sa.DateTime(), nullable=False),
+    )
+    op.create_index(op.f('ix_event_tickets_expires_at'), 'event_tickets', ['expires_at'], unique=False)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_event_tickets_expires_at'), table_name='event_tickets')
+    op.drop_table('event_tickets')
@@ -0,0 +1,41 @@
+"""Add dashboard_counters table for O(1) dashboard stats
+
+Revision ID: f2c8b5d17e94
+Revises: 6b4f0e9a2c37
+Create Date: 2026-02-09 13:26:51.048172
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'f2c8b5d17e94'
+down_revision: Union[str, Sequence[str], None] = '6b4f0e9a2c37'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'dashboard_counters',
+        sa.Column('name', sa.String(), primary_key=True),
+        sa.Column('shard', sa.Integer(), primary_key=True),
+        sa.Column('value', sa.Float(), nullable=False, server_default='0'),
+    )
+    # Start from the current totals (shard 0); the write paths keep them up to date from here
+    op.execute("""
+        INSERT INTO dashboard_counters (name, shard, value)
+        SELECT 'total_revenue', 0, COALESCE((SELECT SUM(total_amount) FROM vouchers), 0)
+        UNION ALL SELECT 'vouchers_issued', 0, (SELECT COUNT(id) FROM vouchers)
+        UNION ALL SELECT 'new_customers', 0, (SELECT COUNT(id) FROM customers)
+        UNION ALL SELECT 'products_in_stock', 0, COALESCE((SELECT SUM(quantity) FROM stock), 0)
+    """)
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_table('dashboard_counters')
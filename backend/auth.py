@@ -1,12 +1,18 @@
 import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from dataclasses import dataclass
 from datetime import datetime, timedelta
 from typing import Optional
 from jose import JWTError, jwt
-from passlib.context import CryptContext
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-import models, database
+import models, database, live_events, passwords
 
 # 1. SECURITY CONFIGURATION
 SECRET_KEY = os.getenv("SECRET_KEY", "super_secret_master_key_change_me_in_production")
@@ -14,7 +20,8 @@ ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30")) 
 
 # 2. PASSWORD HASHER
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# The login route hashes in a process pool (see passwords.py); these inline helpers are for scripts
+pwd_context = passwords.pwd_context
 
 # NEW: Tells FastAPI where to get the token from
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
@@ -37,9 +44,92 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-# 4. NEW: THE MISSING ATTRIBUTE FIX
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)):
-    """The dependency that your routers use to verify the user."""
+# 4. USER CACHE
+# Every authenticated request used to load its user row. Read-only routes (get_read_only_user)
+# now take the principal from an in-process cache, keyed by the token subject, for
+# AUTH_USER_CACHE_SECONDS (0 disables the cache) and at most AUTH_USER_CACHE_SIZE users, least
+# recently used first out. Routes that change data (get_current_user) still read the user row on
+# every call, so a deactivation or role change stops writes at once in every worker; their lookup
+# refreshes the cache as well.
+# Role changes and deactivation (users.py) call invalidate_user(), which drops the entry here and,
+# through live_events, in every other worker once the change commits. A lookup that read the row
+# before that commit doesn't cache it afterwards (see _user_generations). The TTL bounds how stale
+# a read-only route can get when a user row is changed any other way or a notification is lost.
+# With AUTH_TRUST_TOKEN_CLAIMS=1, read-only routes (get_read_only_user) take the principal straight
+# from the signed token claims, with no lookup at all; a deactivated user then keeps read access
+# until the token expires (ACCESS_TOKEN_EXPIRE_MINUTES).
+AUTH_USER_CACHE_SECONDS = int(os.getenv("AUTH_USER_CACHE_SECONDS", "60"))
+AUTH_USER_CACHE_SIZE = int(os.getenv("AUTH_USER_CACHE_SIZE", "1024"))
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "0") == "1"
+
+@dataclass(frozen=True)
+class Principal:
+    """The authenticated user, detached from any session. Routers use it like a models.User."""
+    id: int
+    username: str
+    full_name: Optional[str]
+    role: str
+    is_active: bool
+    created_at: Optional[datetime]
+
+_user_cache = OrderedDict() # username -> (Principal, expires at)
+_user_cache_lock = threading.Lock()
+_user_cache_stats = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "claims": 0}
+_user_generations = {} # username -> times forgotten; a lookup caches only if this didn't move meanwhile
+
+def _cached_user(username: str) -> Optional[Principal]:
+    with _user_cache_lock:
+        entry = _user_cache.get(username)
+        if entry is not None and entry[1] > time.monotonic():
+            _user_cache.move_to_end(username)
+            _user_cache_stats["hits"] += 1
+            return entry[0]
+        _user_cache_stats["misses"] += 1
+        return None
+
+def _cache_user(principal: Principal, generation: int):
+    if AUTH_USER_CACHE_SECONDS <= 0:
+        return
+    with _user_cache_lock:
+        if _user_generations.get(principal.username, 0) != generation:
+            return # Invalidated while the row was being read; it may be the old one
+        _user_cache[principal.username] = (principal, time.monotonic() + AUTH_USER_CACHE_SECONDS)
+        _user_cache.move_to_end(principal.username)
+        while len(_user_cache) > AUTH_USER_CACHE_SIZE:
+            _user_cache.popitem(last=False)
+            _user_cache_stats["evictions"] += 1
+
+def _forget_user(username: str):
+    with _user_cache_lock:
+        _user_generations[username] = _user_generations.get(username, 0) + 1
+        if _user_cache.pop(username, None) is not None:
+            _user_cache_stats["invalidations"] += 1
+
+def invalidate_user(db: Session, username: str):
+    """Drops the cached principal in every worker once `db` commits. Call from any write to a user's role, status or name."""
+    # Not before the commit: a request could reload the old row in between and cache it again
+    db.info.setdefault("forget_users", set()).add(username)
+    live_events.publish(db, "user_changed", username=username)
+
+@event.listens_for(database.SessionLocal, "after_commit")
+def _forget_after_commit(session):
+    # This worker at once; the others through the "user_changed" event
+    for username in session.info.pop("forget_users", ()):
+        _forget_user(username)
+
+@event.listens_for(database.SessionLocal, "after_rollback")
+def _keep_after_rollback(session):
+    session.info.pop("forget_users", None)
+
+live_events.on("user_changed", lambda payload: _forget_user(payload["username"]))
+
+def user_cache_stats() -> dict:
+    with _user_cache_lock:
+        return {**_user_cache_stats, "size": len(_user_cache)}
+
+# 5. CURRENT USER DEPENDENCIES
+def _token_payload(token: str, purpose: Optional[str] = None) -> dict:
+    """The verified claims. Access tokens carry no "purpose"; tickets (section 6) can't be used as one, nor the other way round."""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,13 +137,85 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
     )
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
     except JWTError:
         raise credentials_exception
-        
+    if payload.get("sub") is None or payload.get("purpose") != purpose:
+        raise credentials_exception
+    return payload
+
+def _require_active(principal: Principal) -> Principal:
+    if not principal.is_active:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Inactive user",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return principal
+
+def _load_user(db: Session, username: str) -> Principal:
+    """Reads the user row and refreshes its cache entry."""
+    with _user_cache_lock:
+        generation = _user_generations.get(username, 0)
     user = db.query(models.User).filter(models.User.username == username).first()
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    principal = Principal(
+        id=user.id, username=user.username, full_name=user.full_name,
+        role=user.role, is_active=user.is_active is not False,
+        created_at=user.created_at
+    )
+    _cache_user(principal, generation)
+    return principal
+
+def _principal(db: Session, username: str) -> Principal:
+    """The cached principal, or a fresh lookup on a miss."""
+    return _require_active(_cached_user(username) or _load_user(db, username))
+
+def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)) -> Principal:
+    """The dependency that your routers use to verify the user. Reads the user row, so use it for anything that writes."""
+    return _require_active(_load_user(db, _token_payload(token)["sub"]))
+
+def get_read_only_user(token: str = Depends(oauth2_scheme), db: Session = Depends(database.get_db)) -> Principal:
+    """For routes that only read: with AUTH_TRUST_TOKEN_CLAIMS, the signed claims are the principal."""
+    if AUTH_TRUST_TOKEN_CLAIMS:
+        payload = _token_payload(token)
+        if payload.get("uid") is not None and payload.get("role") is not None:
+            with _user_cache_lock:
+                _user_cache_stats["claims"] += 1
+            return Principal(
+                id=payload["uid"], username=payload["sub"], full_name=None,
+                role=payload["role"], is_active=True, created_at=None
+            )
+        # Tokens issued before "uid" was added fall through to the normal lookup
+    return _principal(db, _token_payload(token)["sub"])
+
+# 6. EVENT STREAM TICKETS
+# EventSource can't send an Authorization header, and an access token in the query string of
+# GET /events/stream would end up in access logs. Clients trade their token for a ticket instead
+# (POST /events/ticket): a signed token that only opens the stream, expires after
+# EVENTS_TICKET_SECONDS and is accepted once. Redeemed ticket ids are kept in event_tickets until
+# they would have expired, which also makes them single-use across workers.
+EVENTS_TICKET_SECONDS = int(os.getenv("EVENTS_TICKET_SECONDS", "30"))
+
+def create_events_ticket(principal: Principal) -> str:
+    return create_access_token(
+        {"sub": principal.username, "purpose": "events", "jti": uuid.uuid4().hex},
+        expires_delta=timedelta(seconds=EVENTS_TICKET_SECONDS)
+    )
+
+def redeem_events_ticket(db: Session, ticket: str) -> Principal:
+    """The ticket's user, if the ticket is valid and unused; it can't be used again afterwards."""
+    payload = _token_payload(ticket, purpose="events")
+    now = datetime.utcnow()
+    db.query(models.EventTicket).filter(models.EventTicket.expires_at < now).delete(synchronize_session=False)
+    db.add(models.EventTicket(jti=payload["jti"], expires_at=datetime.utcfromtimestamp(payload["exp"])))
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Ticket already used")
+    return _principal(db, payload["sub"])
@@ -0,0 +1,97 @@
+import argparse
+import statistics
+import threading
+import time
+from fastapi import HTTPException
+from sqlalchemy import func
+from database import SessionLocal
+import models, schemas, inventory
+from routers import vouchers
+
+# Checkout throughput for each CHECKOUT_STOCK_MODE (see inventory.py), first on a single hot SKU
+# and then with every terminal selling its own SKU. The second run shares no stock rows, so it
+# shows what the rows every checkout still touches (counters, ETag versions) cost.
+# Every thread plays a terminal selling in a loop, calling create_voucher with its own session,
+# so the run goes through the real locking and commit path.
+# It writes real vouchers: point DATABASE_URL at a scratch PostgreSQL database, not production.
+# Usage: python bench_checkout.py [--terminals 16] [--seconds 10] [--items 3]
+
+SKU_NAME = "bench-sku-{}"
+START_QUANTITY = 10_000_000
+
+def prepare(skus):
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).order_by(models.User.id).first()
+        if user is None:
+            raise SystemExit("❌ No users found. Create one first (init_db.py does).")
+        product_ids = []
+        for number in range(skus):
+            name = SKU_NAME.format(number)
+            product = db.query(models.Stock).filter(models.Stock.name == name).first()
+            if product is None:
+                product = models.Stock(name=name, price=3.5, cost_price=1.0, quantity=START_QUANTITY, images=[])
+                db.add(product)
+            product.quantity = START_QUANTITY
+            db.flush()
+            product_ids.append(product.id)
+        db.commit()
+        return user.id, product_ids
+    finally:
+        db.close()
+
+def terminal(user_id, product_id, items, deadline, latencies, failures):
+    db = SessionLocal()
+    try:
+        user = db.get(models.User, user_id)
+        batch = schemas.VoucherCreate(vouchers=[{"items": [{"product_id": product_id, "quantity": 1}] * items}])
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            try:
+                vouchers.create_voucher(batch, db=db, current_user=user, idempotency_key=None)
+                latencies.append(time.perf_counter() - start)
+            except HTTPException:
+                failures.append(1)
+    finally:
+        db.close()
+
+def run(mode, terminals, seconds, items, skus):
+    inventory.CHECKOUT_STOCK_MODE = mode
+    user_id, product_ids = prepare(skus)
+    latencies, failures = [], []
+    deadline = time.perf_counter() + seconds
+    threads = [
+        threading.Thread(target=terminal, args=(user_id, product_ids[number % skus], items, deadline, latencies, failures))
+        for number in range(terminals)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    # The shelf must be down by exactly what was sold
+    db = SessionLocal()
+    try:
+        remaining = db.query(func.sum(models.Stock.quantity)).filter(models.Stock.id.in_(product_ids)).scalar()
+    finally:
+        db.close()
+    lost = remaining - (START_QUANTITY * skus - len(latencies) * items)
+
+    p95 = statistics.quantiles(latencies, n=20)[-1] * 1000 if len(latencies) > 1 else 0
+    label = "1 SKU" if skus == 1 else f"{skus} SKUs"
+    print(f"{mode:>8}, {label:>8}: {len(latencies) / seconds:8.1f} checkouts/s, p95 {p95:6.1f} ms, {len(failures)} failed")
+    if lost:
+        # Row locks are a no-op on SQLite, so "locking" mode can lose decrements there
+        print(f"❌ {mode}: {lost} units sold but never taken off the shelf")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Checkout throughput on one hot SKU and on one SKU per terminal.")
+    parser.add_argument("--terminals", type=int, default=16)
+    parser.add_argument("--seconds", type=float, default=10)
+    parser.add_argument("--items", type=int, default=3, help="Lines of the terminal's SKU per voucher")
+    args = parser.parse_args()
+
+    print(f"{args.terminals} terminals, {args.seconds:g}s per mode, {args.items} lines per voucher")
+    for skus in (1, args.terminals):
+        for mode in ("locking", "atomic"):
+            run(mode, args.terminals, args.seconds, args.items, skus)
@@ -0,0 +1,118 @@
+import argparse
+import os
+import random
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+from sqlalchemy import create_engine, insert
+from sqlalchemy.orm import joinedload, sessionmaker
+from database import Base
+import models, profit_analytics
+
+# GET /dashboard/profit figures computed two ways over the same sales history: the NumPy
+# chunked path in profit_analytics.py, and the straightforward ORM loop over VoucherItem
+# objects. Runs on a throwaway SQLite file, checks that both agree and prints the timings.
+# Usage: python bench_profit.py [--lines 5000000]
+
+PRODUCTS = 2000
+CATEGORIES = 40
+LINES_PER_VOUCHER = 5
+SEED_BATCH = 50_000
+
+def seed(Session, lines: int):
+    db = Session()
+    rng = random.Random(42)
+    db.add(models.User(id=1, username="bench", role="manager"))
+    db.add_all(models.Category(id=c, name=f"category {c}") for c in range(1, CATEGORIES + 1))
+    costs = {}
+    for p in range(1, PRODUCTS + 1):
+        costs[p] = round(rng.uniform(1, 50), 2) if p % 10 else None # Some products have no cost price
+        db.add(models.Stock(id=p, name=f"item {p}", price=0, cost_price=costs[p], quantity=0, images=[],
+                            category_id=(p % (CATEGORIES + 1)) or None))
+    db.commit()
+
+    start = datetime(2025, 1, 1)
+    vouchers, items = [], []
+    for v in range(1, lines // LINES_PER_VOUCHER + 1):
+        created_at = start + timedelta(seconds=v * 6)
+        subtotal = 0.0
+        for _ in range(LINES_PER_VOUCHER):
+            product_id = rng.randrange(1, PRODUCTS + 1)
+            quantity = rng.randrange(1, 4)
+            price = round((costs[product_id] or 10) * rng.uniform(0.8, 1.6), 2)
+            subtotal += quantity * price
+            items.append({"voucher_id": v, "product_id": product_id, "quantity": quantity,
+                          "price_at_sale": price, "subtotal": quantity * price, "created_at": created_at})
+        discount = subtotal * 0.1 if v % 7 == 0 else 0.0
+        vouchers.append({"id": v, "voucher_number": f"INV-{v:010d}", "total_amount": subtotal - discount,
+                         "total_discount": discount, "staff_id": 1, "created_at": created_at})
+        if len(items) >= SEED_BATCH:
+            db.execute(insert(models.Voucher), vouchers)
+            db.execute(insert(models.VoucherItem), items)
+            vouchers, items = [], []
+    if vouchers:
+        db.execute(insert(models.Voucher), vouchers)
+        db.execute(insert(models.VoucherItem), items)
+    db.commit()
+    db.close()
+    return start, start + timedelta(seconds=(lines // LINES_PER_VOUCHER + 1) * 6)
+
+def orm_loop(db, start, end) -> dict:
+    """The same figures, one VoucherItem object at a time."""
+    voucher_subtotals = defaultdict(float)
+    lines = []
+    query = db.query(models.VoucherItem).options(
+        joinedload(models.VoucherItem.product), joinedload(models.VoucherItem.voucher)
+    ).filter(models.VoucherItem.created_at >= start, models.VoucherItem.created_at < end).yield_per(10_000)
+    for item in query:
+        voucher_subtotals[item.voucher_id] += item.subtotal
+        lines.append((item.voucher_id, item.voucher.total_amount, item.product_id,
+                      item.product.category_id or 0, item.quantity, item.subtotal, item.product.cost_price or 0))
+
+    revenue, cost = defaultdict(float), defaultdict(float)
+    category_profit = defaultdict(float)
+    for voucher_id, total_amount, product_id, category_id, quantity, subtotal, cost_price in lines:
+        share = subtotal * total_amount / voucher_subtotals[voucher_id] if voucher_subtotals[voucher_id] else 0
+        revenue[product_id] += share
+        cost[product_id] += quantity * cost_price
+        category_profit[category_id] += share - quantity * cost_price
+    best = max(revenue, key=lambda product_id: revenue[product_id] - cost[product_id])
+    return {"revenue": sum(revenue.values()), "cost": sum(cost.values()), "best": best, "categories": category_profit}
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--lines", type=int, default=5_000_000)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as directory:
+        engine = create_engine(f"sqlite:///{os.path.join(directory, 'bench.db')}")
+        Base.metadata.create_all(bind=engine)
+        Session = sessionmaker(bind=engine, autoflush=False)
+
+        began = time.perf_counter()
+        start, end = seed(Session, args.lines)
+        print(f"Seeded {args.lines:,} line items in {time.perf_counter() - began:.1f}s")
+
+        db = Session()
+        began = time.perf_counter()
+        vectorized = profit_analytics.compute(db, start, end)
+        vectorized_seconds = time.perf_counter() - began
+        db.close()
+
+        db = Session()
+        began = time.perf_counter()
+        looped = orm_loop(db, start, end)
+        loop_seconds = time.perf_counter() - began
+        db.close()
+
+        assert abs(vectorized["revenue"] - looped["revenue"]) < 1e-6 * looped["revenue"], (vectorized["revenue"], looped["revenue"])
+        assert abs(vectorized["cost"] - looped["cost"]) < 1e-6 * looped["cost"], (vectorized["cost"], looped["cost"])
+        assert vectorized["top_products"][0]["product_id"] == looped["best"]
+        for category in vectorized["categories"]:
+            expected = looped["categories"][category["category_id"]]
+            assert abs(category["profit"] - expected) < 1e-6 * max(abs(expected), 1), (category, expected)
+
+        print(f"NumPy chunks: {vectorized_seconds:.2f}s")
+        print(f"ORM loop:     {loop_seconds:.2f}s ({loop_seconds / vectorized_seconds:.1f}x slower)")
+        print(f"✅ Same figures: revenue {vectorized['revenue']:,.2f}, profit {vectorized['profit']:,.2f}, margin {vectorized['margin_percent']}%")
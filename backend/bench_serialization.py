@@ -0,0 +1,111 @@
+import time
+from datetime import datetime
+import orjson
+from pydantic import TypeAdapter
+import models, schemas, serializers
+
+# Compares the per-row cost of the old list serialization (a Pydantic model per row,
+# then FastAPI re-validating the whole page against response_model) with the
+# serializers.py fast path (plain dicts + orjson). No database needed.
+# Usage: python bench_serialization.py
+
+ROWS = 500
+ROUNDS = 20
+
+def make_stock_rows():
+    category = models.Category(id=1, name="DRINKS")
+    now = datetime.utcnow()
+    rows = []
+    for i in range(ROWS):
+        stock = models.Stock(
+            id=i, name=f"item {i}", description="A product", quantity=50, price=10.0 + i,
+            cost_price=6.0, discount_percent=10.0, images=[f"static_images/{i}.jpg"],
+            arrival_date=now, created_at=now, updated_at=now, last_sold_at=now
+        )
+        stock.category = category
+        rows.append((stock, i, (10.0 + i) * 0.9, True))
+    return rows
+
+def make_vouchers():
+    customer = models.Customer(id=1, name="Alice", phone="555", points=0, created_at=datetime.utcnow())
+    product = models.Stock(id=1, name="coffee", price=3.0)
+    vouchers = []
+    for i in range(ROWS):
+        voucher = models.Voucher(
+            id=i, voucher_number=f"INV-{i}", total_amount=30.0, total_discount=0.0,
+            discount_percentage=0.0, discount_amount=0.0, created_at=datetime.utcnow(), staff_id=1
+        )
+        voucher.customer = customer
+        for j in range(5):
+            item = models.VoucherItem(product_id=1, quantity=2, price_at_sale=3.0, subtotal=6.0)
+            item.product = product
+            voucher.items.append(item)
+        vouchers.append(voucher)
+    return vouchers
+
+stock_page_adapter = TypeAdapter(schemas.StockPaginationResponse)
+voucher_page_adapter = TypeAdapter(schemas.VoucherPaginationResponse)
+
+def old_stock(rows):
+    items = [
+        schemas.StockOut.model_validate({
+            **stock.__dict__, "total_sold": total_sold, "is_on_sale": on_sale, "sale_price": price
+        })
+        for stock, total_sold, price, on_sale in rows
+    ]
+    page = {"items": items, "total": ROWS, "page": 1, "size": ROWS}
+    return stock_page_adapter.dump_json(stock_page_adapter.validate_python(page, from_attributes=True))
+
+def new_stock(rows):
+    items = [serializers.stock_to_dict(*row) for row in rows]
+    return serializers.FastJSONResponse({"items": items, "total": ROWS, "page": 1, "size": ROWS}).body
+
+def old_vouchers(vouchers):
+    items = []
+    for voucher in vouchers:
+        items_out = [
+            schemas.VoucherItemOut(
+                product_id=item.product_id, product_name=item.product.name, quantity=item.quantity,
+                price_at_sale=item.price_at_sale, subtotal=item.subtotal, total_quantity_sold=0
+            )
+            for item in voucher.items
+        ]
+        items.append(schemas.VoucherOut(
+            id=voucher.id, voucher_number=voucher.voucher_number, total_amount=voucher.total_amount,
+            total_discount=voucher.total_discount, discount_percentage=voucher.discount_percentage,
+            discount_amount=voucher.discount_amount, created_at=voucher.created_at, staff_id=voucher.staff_id,
+            delivery_address=voucher.delivery_address, items=items_out,
+            customer=schemas.CustomerOut.model_validate(voucher.customer)
+        ))
+    page = {"items": items, "total": ROWS, "page": 1, "size": ROWS}
+    return voucher_page_adapter.dump_json(voucher_page_adapter.validate_python(page, from_attributes=True))
+
+def new_vouchers(vouchers):
+    items = [
+        serializers.voucher_to_dict(voucher, [serializers.voucher_item_to_dict(item) for item in voucher.items])
+        for voucher in vouchers
+    ]
+    return serializers.FastJSONResponse({"items": items, "total": ROWS, "page": 1, "size": ROWS}).body
+
+def per_row_us(fn, data):
+    fn(data) # warm up
+    start = time.perf_counter()
+    for _ in range(ROUNDS):
+        fn(data)
+    return (time.perf_counter() - start) / (ROUNDS * ROWS) * 1_000_000
+
+if __name__ == "__main__":
+    stock_rows = make_stock_rows()
+    vouchers = make_vouchers()
+
+    # Both paths must produce the same document
+    assert orjson.loads(old_stock(stock_rows)) == orjson.loads(new_stock(stock_rows)) | {"next_cursor": None}
+    assert orjson.loads(old_vouchers(vouchers)) == orjson.loads(new_vouchers(vouchers)) | {"next_cursor": None}
+
+    for label, old_fn, new_fn, data in [
+        ("/stock", old_stock, new_stock, stock_rows),
+        ("/vouchers (5 items each)", old_vouchers, new_vouchers, vouchers),
+    ]:
+        before = per_row_us(old_fn, data)
+        after = per_row_us(new_fn, data)
+        print(f"{label}: {before:.1f} µs/row before, {after:.1f} µs/row after ({before / after:.1f}x)")
@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta
+import orjson
+from sqlalchemy import create_engine, event
+from sqlalchemy.orm import joinedload, sessionmaker
+from sqlalchemy.pool import StaticPool
+from database import Base
+import models
+from routers import vouchers
+
+# Statement, row and value counts for one page of GET /vouchers/ with large baskets, with the old
+# joined eager loading and with the current selectin loading. Runs on an in-memory SQLite
+# database and fails if the list goes back to a per-line row explosion or to N+1 queries.
+# Usage: python bench_voucher_list.py
+
+PAGE_SIZE = 100
+VOUCHERS = 250
+LINES_PER_VOUCHER = 30
+
+engine = create_engine("sqlite://", poolclass=StaticPool, connect_args={"check_same_thread": False})
+Session = sessionmaker(bind=engine, autoflush=False)
+
+def seed():
+    Base.metadata.create_all(bind=engine)
+    db = Session()
+    db.add(models.User(id=1, username="bench", role="manager"))
+    db.add(models.Customer(id=1, name="Alice", phone="555"))
+    db.add_all(models.Stock(id=i, name=f"item {i}", price=2.0, quantity=100, images=[]) for i in range(1, LINES_PER_VOUCHER + 1))
+    start = datetime(2026, 1, 1)
+    for v in range(1, VOUCHERS + 1):
+        db.add(models.Voucher(id=v, voucher_number=f"INV-{v:08d}", total_amount=60.0, staff_id=1,
+                              customer_id=1 if v % 2 else None, created_at=start + timedelta(minutes=v)))
+        db.add_all(models.VoucherItem(voucher_id=v, product_id=p, quantity=1, price_at_sale=2.0, subtotal=2.0)
+                   for p in range(1, LINES_PER_VOUCHER + 1))
+    db.commit()
+    db.close()
+
+class StatementCounter:
+    """Counts statements, and the rows they return, while active."""
+    def __init__(self):
+        self.statements = []
+        event.listen(engine, "after_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append((statement, parameters))
+
+    def rows_and_values(self):
+        """Re-runs the recorded statements: (rows fetched, values fetched = rows x columns)."""
+        rows = values = 0
+        with engine.connect() as connection:
+            for statement, parameters in self.statements:
+                result = connection.exec_driver_sql(statement, parameters).fetchall()
+                rows += len(result)
+                values += sum(len(row) for row in result)
+        return rows, values
+
+def list_page(page):
+    """The current endpoint, called directly."""
+    db = Session()
+    try:
+        return vouchers.get_vouchers(
+            page=page, limit=PAGE_SIZE, sort_by="created_at", sort_order="desc", customer_name=None, staff_id=None,
+            start_date=None, end_date=None, cursor=None, include_total=False, db=db
+        )
+    finally:
+        db.close()
+
+def old_list_page(page):
+    """What the endpoint did before: joinedload under OFFSET/LIMIT."""
+    db = Session()
+    try:
+        query = db.query(models.Voucher).options(
+            joinedload(models.Voucher.customer),
+            joinedload(models.Voucher.items).joinedload(models.VoucherItem.product)
+        ).order_by(models.Voucher.created_at.desc())
+        query.count()
+        return [(v.id, len(v.items)) for v in query.offset((page - 1) * PAGE_SIZE).limit(PAGE_SIZE).all()]
+    finally:
+        db.close()
+
+def measure(fn):
+    counter = StatementCounter()
+    fn(2)
+    event.remove(engine, "after_cursor_execute", counter._record)
+    return (len(counter.statements), *counter.rows_and_values())
+
+if __name__ == "__main__":
+    seed()
+    page = orjson.loads(list_page(2).body)
+    assert len(page["items"]) == PAGE_SIZE and all(len(v["items"]) == LINES_PER_VOUCHER for v in page["items"])
+    assert page["total"] == VOUCHERS
+
+    old_statements, old_rows, old_values = measure(old_list_page)
+    new_statements, new_rows, new_values = measure(list_page)
+    print(f"Page of {PAGE_SIZE} vouchers x {LINES_PER_VOUCHER} lines:")
+    print(f"  joinedload:   {old_statements} statements, {old_rows} rows, {old_values} values")
+    print(f"  selectinload: {new_statements} statements, {new_rows} rows, {new_values} values")
+
+    # count + page + items + products + customers, independent of the page size
+    assert new_statements <= 5, new_statements
+    # One row per voucher and per line (plus the small lookups); the voucher, customer and product
+    # columns are no longer repeated on every line
+    assert new_rows <= PAGE_SIZE * (LINES_PER_VOUCHER + 1) + LINES_PER_VOUCHER + 2, new_rows
+    assert new_values * 3 < old_values, (new_values, old_values)
+    print("✅ Voucher list loads a page without row explosion or N+1 queries.")
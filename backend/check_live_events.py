@@ -0,0 +1,52 @@
+import asyncio
+import sys
+import time
+from database import SessionLocal, engine
+import live_events
+
+# End-to-end check of live event delivery on PostgreSQL: starts this process's listener thread,
+# commits a published event and waits for it to reach a subscriber through NOTIFY/LISTEN, the
+# path every API worker relies on (SSE streams, "user_changed" cache invalidation, "counters").
+# SQLite delivers events in-process and never exercises the listener, so it is refused here.
+# Usage: DATABASE_URL=postgresql://... python check_live_events.py [--timeout 10]
+
+CHECK_EVENT = "live_events_check"
+
+async def check(timeout: float) -> bool:
+    subscriber = live_events.subscribe()
+    try:
+        live_events.start()
+        # Wait until the listener is connected: it announces itself with a "resync"
+        first = await asyncio.wait_for(subscriber.queue.get(), timeout)
+        if first.get("type") != "resync":
+            print(f"❌ Expected the listener's resync first, got {first}")
+            return False
+
+        token = f"{time.time():.6f}"
+        db = SessionLocal()
+        try:
+            live_events.publish(db, CHECK_EVENT, token=token)
+            db.commit()
+        finally:
+            db.close()
+
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            payload = await asyncio.wait_for(subscriber.queue.get(), deadline - time.monotonic())
+            if payload.get("type") == CHECK_EVENT and payload.get("token") == token:
+                print("✅ Published event arrived through LISTEN.")
+                return True
+        return False
+    except asyncio.TimeoutError:
+        print(f"❌ Nothing arrived within {timeout:g}s; check the listener's log output.")
+        return False
+    finally:
+        live_events.unsubscribe(subscriber)
+        live_events.stop()
+
+if __name__ == "__main__":
+    if engine.dialect.name != "postgresql":
+        print("❌ Point DATABASE_URL at PostgreSQL; other databases don't use the listener.")
+        sys.exit(2)
+    timeout = float(sys.argv[sys.argv.index("--timeout") + 1]) if "--timeout" in sys.argv else 10
+    sys.exit(0 if asyncio.run(check(timeout)) else 1)
@@ -0,0 +1,193 @@
+import logging
+import os
+import random
+import sys
+import threading
+from sqlalchemy import func, text
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from database import SessionLocal
+import models, live_events, voucher_partitions
+
+# Running totals behind GET /dashboard/stats.
+# The write paths (checkout, customer create/delete, stock create/update/delete/import) call
+# add() with what they changed, inside their own transaction, so the totals commit or roll back
+# with the data. The endpoint then reads a handful of rows instead of aggregating vouchers,
+# customers and stock on every refresh.
+# Each counter is spread over DASHBOARD_COUNTER_SHARDS rows and a write increments a random
+# one, so concurrent checkouts don't queue on a single hot row; reads sum the shards.
+# reconcile() recomputes the real aggregates (archived voucher months included) and corrects any
+# drift (manual SQL, restores). It runs every DASHBOARD_RECONCILE_MINUTES in the background and
+# with `python dashboard_counters.py reconcile`.
+# Live dashboards get the totals pushed as "stats" events (see live_events.py). add() publishes
+# a "counters" event that every worker handles itself: a delta can't be told apart from one the
+# client's snapshot already includes, so instead the worker re-reads the totals, at most every
+# DASHBOARD_PUSH_SECONDS, and sends them to its clients whole. Those reads and the streams'
+# snapshots (stats_event()) run one at a time per worker and are numbered, so a higher version
+# always includes everything a lower one did; a stream skips anything older than its snapshot.
+
+COUNTERS = ("total_revenue", "vouchers_issued", "new_customers", "products_in_stock")
+SHARDS = int(os.getenv("DASHBOARD_COUNTER_SHARDS", "8"))
+RECONCILE_INTERVAL_SECONDS = int(os.getenv("DASHBOARD_RECONCILE_MINUTES", "60")) * 60 # 0 disables it
+RECONCILE_LOCK_KEY = 7_340_021 # pg_advisory_lock key, any constant unique to this job
+PUSH_INTERVAL_SECONDS = float(os.getenv("DASHBOARD_PUSH_SECONDS", "1"))
+
+logger = logging.getLogger(__name__)
+
+def add(db: Session, **deltas):
+    """Adds to the named counters, e.g. add(db, vouchers_issued=3, total_revenue=42.5). Call before the write's commit."""
+    deltas = {name: value for name, value in deltas.items() if value}
+    if not deltas:
+        return
+    unknown = set(deltas) - set(COUNTERS)
+    if unknown:
+        raise ValueError(f"Unknown dashboard counters: {sorted(unknown)}")
+
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    table = models.DashboardCounter.__table__
+    shard = random.randrange(SHARDS)
+    # Sorted, so two writers always lock the rows in the same order
+    stmt = insert(table).values([{"name": name, "shard": shard, "value": deltas[name]} for name in sorted(deltas)])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.name, table.c.shard],
+        set_={"value": table.c.value + stmt.excluded.value}
+    ))
+    live_events.publish(db, "counters") # Workers re-read and push the totals, see below
+
+def read(db: Session) -> dict:
+    totals = dict(db.query(models.DashboardCounter.name, func.sum(models.DashboardCounter.value))
+                  .group_by(models.DashboardCounter.name).all())
+    return {name: totals.get(name) or 0 for name in COUNTERS}
+
+_stats_lock = threading.Lock()
+_stats_version = 0
+_stats_changed = threading.Event()
+
+def stats_event(db: Session) -> dict:
+    """The current totals as a "stats" event (same figures as GET /dashboard/stats), with this worker's next version."""
+    global _stats_version
+    with _stats_lock:
+        counters = read(db)
+        _stats_version += 1
+        version = _stats_version
+    return {
+        "type": "stats",
+        "version": version,
+        "total_revenue": counters["total_revenue"],
+        "vouchers_issued": int(counters["vouchers_issued"]),
+        "new_customers": int(counters["new_customers"]),
+        "products_in_stock": int(counters["products_in_stock"])
+    }
+
+live_events.on("counters", lambda payload: _stats_changed.set())
+
+def _actual(db: Session) -> dict:
+    """The four aggregates the dashboard used to run on every call, over live and archived vouchers."""
+    revenue, vouchers = 0, 0
+    for Voucher, _ in voucher_partitions.history_tables(db):
+        tier_revenue, tier_vouchers = db.query(func.sum(Voucher.total_amount), func.count(Voucher.id)).one()
+        revenue += tier_revenue or 0
+        vouchers += tier_vouchers or 0
+    return {
+        "total_revenue": revenue,
+        "vouchers_issued": vouchers,
+        "new_customers": db.query(func.count(models.Customer.id)).scalar() or 0,
+        "products_in_stock": db.query(func.sum(models.Stock.quantity)).scalar() or 0,
+    }
+
+def reconcile(db: Session, tolerance: float = 0.005) -> dict:
+    """
+    Corrects the counters to the real aggregates. Returns {name: (counted, actual)} for every
+    counter that had drifted. The counters and the aggregates are read from one snapshot, and
+    the correction is applied as an increment, so checkouts running meanwhile are not lost.
+    """
+    if db.get_bind().dialect.name != "postgresql":
+        return _reconcile(db, tolerance)
+
+    # Only one reconciler at a time (every API worker runs one), or a drift would be corrected twice
+    with db.get_bind().engine.connect() as lock_connection:
+        if not lock_connection.execute(text("SELECT pg_try_advisory_lock(:key)"), {"key": RECONCILE_LOCK_KEY}).scalar():
+            return {}
+        try:
+            db.connection(execution_options={"isolation_level": "REPEATABLE READ"})
+            return _reconcile(db, tolerance)
+        finally:
+            lock_connection.execute(text("SELECT pg_advisory_unlock(:key)"), {"key": RECONCILE_LOCK_KEY})
+
+def _reconcile(db: Session, tolerance: float) -> dict:
+    counted = read(db)
+    actual = _actual(db)
+    db.commit()
+
+    drift = {
+        name: (counted[name], actual[name])
+        for name in COUNTERS if abs(actual[name] - counted[name]) > tolerance
+    }
+    if drift:
+        add(db, **{name: actual_value - counted_value for name, (counted_value, actual_value) in drift.items()})
+        db.commit()
+    return drift
+
+# --- Background reconciler and live totals ---
+
+_stop = threading.Event()
+_threads = []
+
+def _run():
+    while not _stop.wait(RECONCILE_INTERVAL_SECONDS):
+        db = SessionLocal()
+        try:
+            drift = reconcile(db)
+            if drift:
+                logger.warning("Dashboard counters drifted, corrected: %s", drift)
+        except Exception:
+            logger.exception("Dashboard counter reconciliation failed")
+        finally:
+            db.close()
+
+def _push():
+    while not _stop.is_set():
+        _stats_changed.wait()
+        _stats_changed.clear()
+        if _stop.is_set():
+            break
+        if live_events.has_subscribers():
+            db = SessionLocal()
+            try:
+                live_events.broadcast(stats_event(db))
+            except Exception:
+                logger.exception("Pushing the dashboard totals failed")
+            finally:
+                db.close()
+        _stop.wait(PUSH_INTERVAL_SECONDS) # Changes meanwhile go out together in the next read
+
+def start():
+    if _threads:
+        return
+    _stop.clear()
+    targets = [(_push, "dashboard-push")]
+    if RECONCILE_INTERVAL_SECONDS > 0:
+        targets.append((_run, "dashboard-reconcile"))
+    for target, name in targets:
+        thread = threading.Thread(target=target, name=name, daemon=True)
+        thread.start()
+        _threads.append(thread)
+
+def stop():
+    _stop.set()
+    _stats_changed.set() # Wakes the push thread
+    _threads.clear()
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["reconcile"]:
+        print("Usage: python dashboard_counters.py reconcile")
+        sys.exit(2)
+    db = SessionLocal()
+    try:
+        drift = reconcile(db)
+        if not drift:
+            print("✅ Dashboard counters match the data.")
+        for name, (counted, actual) in drift.items():
+            print(f"❌ {name}: counted {counted}, actual {actual} (off by {counted - actual}); corrected.")
+    finally:
+        db.close()
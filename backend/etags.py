@@ -0,0 +1,75 @@
+import hashlib
+import os
+import random
+from datetime import datetime
+from typing import Optional
+from fastapi import Request, Response
+from sqlalchemy import case, func, or_
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+import models
+
+# Conditional GET support for the catalog endpoints polled by the POS terminals.
+# Every write path calls bump() for the tables it touched, inside its own transaction,
+# so a new version only becomes visible together with the data it describes.
+# Endpoints build an ETag from those versions (plus anything time-dependent) and
+# answer If-None-Match with a 304 before running the real query.
+# Checkout bumps "stock" on every sale, so it passes spread=True: the bump goes to one of
+# ETAG_COUNTER_SHARDS rows named "stock:<n>" and concurrent checkouts don't queue on one row.
+# get_versions() adds a table's shards to its own row; the sum still grows on every bump.
+
+COUNTER_SHARDS = int(os.getenv("ETAG_COUNTER_SHARDS", "8"))
+
+def bump(db: Session, *tables: str, spread: bool = False):
+    """Increments the change counter of each table. Call before the write's commit."""
+    if not tables:
+        return
+    if spread:
+        shard = random.randrange(COUNTER_SHARDS)
+        tables = [f"{table}:{shard}" for table in tables]
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    counter = models.ChangeCounter.__table__
+    # An upsert, so two writers creating the same counter don't collide on its primary key.
+    # Sorted, so they always lock the rows in the same order
+    stmt = insert(counter).values([{"name": table, "version": 1} for table in sorted(set(tables))])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[counter.c.name],
+        set_={"version": counter.c.version + 1}
+    ))
+
+def get_versions(db: Session, *tables: str) -> tuple:
+    rows = db.query(models.ChangeCounter.name, models.ChangeCounter.version).filter(or_(
+        models.ChangeCounter.name.in_(tables),
+        *[models.ChangeCounter.name.like(f"{table}:%") for table in tables]
+    )).all()
+    versions = {}
+    for name, version in rows:
+        table = name.split(":", 1)[0]
+        versions[table] = versions.get(table, 0) + version
+    return tuple(versions.get(table, 0) for table in tables)
+
+def discount_boundaries_passed(db: Session, now: datetime) -> int:
+    """
+    How many discount start/end dates are already behind us. Sale prices change with
+    the clock, not only with writes, and this number moves whenever a window opens or closes.
+    """
+    passed = db.query(
+        func.sum(case((models.Stock.discount_start_date <= now, 1), else_=0)) +
+        func.sum(case((models.Stock.discount_end_date < now, 1), else_=0))
+    ).filter(models.Stock.discount_percent > 0).scalar()
+    return int(passed or 0)
+
+def make_etag(*parts) -> str:
+    """A strong ETag: the quoted hash of the given parts."""
+    digest = hashlib.sha1("|".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """Returns a 304 response if the client's If-None-Match already matches etag, else None."""
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    candidates = [tag.strip() for tag in header.split(",")]
+    if "*" in candidates or etag in candidates:
+        return Response(status_code=304, headers={"ETag": etag})
+    return None
@@ -0,0 +1,82 @@
+import hashlib
+import os
+import sys
+from datetime import datetime, timedelta
+from typing import Optional
+from fastapi import HTTPException, Response
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from database import SessionLocal
+import models
+
+# Idempotent checkout.
+# A terminal sends an Idempotency-Key header (a fresh UUID per sale attempt) and reuses it when
+# it retries. The first request claims the key by inserting its row before doing any work and
+# stores the response in the same transaction as the sale, so the key and the sale commit or
+# roll back together. A retry finds the row and gets the stored response back without touching
+# stock; a concurrent duplicate blocks on the key's primary key until the first one finishes,
+# then replays it. Failed checkouts roll the claim back, so they can simply be retried.
+# Keys expire after IDEMPOTENCY_KEY_TTL_HOURS; `python idempotency.py purge` deletes old rows.
+
+IDEMPOTENCY_KEY_TTL = timedelta(hours=float(os.getenv("IDEMPOTENCY_KEY_TTL_HOURS", "24")))
+MAX_KEY_LENGTH = 255
+
+def request_hash(body: bytes) -> str:
+    return hashlib.sha256(body).hexdigest()
+
+def _replay(record: models.IdempotencyKey, user_id: int, body_hash: str) -> Response:
+    if record.user_id != user_id or record.request_hash != body_hash:
+        raise HTTPException(status_code=422, detail="This Idempotency-Key was already used for a different request.")
+    return Response(
+        content=record.response_body, status_code=record.status_code, media_type="application/json",
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+def claim(db: Session, key: str, user_id: int, body_hash: str, now: datetime):
+    """
+    Returns (record, None) when this request owns the key and must do the work, or
+    (None, response) with the stored response when it is a retry of a finished request.
+    """
+    if len(key) > MAX_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail=f"Idempotency-Key must be at most {MAX_KEY_LENGTH} characters.")
+
+    record = db.get(models.IdempotencyKey, key)
+    if record is not None:
+        if record.expires_at > now:
+            return None, _replay(record, user_id, body_hash)
+        db.delete(record) # Expired: the key may be used again
+
+    record = models.IdempotencyKey(key=key, user_id=user_id, request_hash=body_hash, expires_at=now + IDEMPOTENCY_KEY_TTL)
+    db.add(record)
+    try:
+        db.flush() # Waits here if another request holds the same key
+    except IntegrityError:
+        db.rollback()
+        record = db.get(models.IdempotencyKey, key)
+        if record is None or record.response_body is None:
+            raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is still in progress.")
+        return None, _replay(record, user_id, body_hash)
+    return record, None
+
+def store(record: Optional[models.IdempotencyKey], response: Response):
+    """Saves the response on the claimed key. Call before the checkout's commit."""
+    if record is not None:
+        record.status_code = response.status_code
+        record.response_body = response.body.decode()
+
+def purge_expired(db: Session, now: datetime = None) -> int:
+    deleted = db.query(models.IdempotencyKey).filter(
+        models.IdempotencyKey.expires_at <= (now or datetime.utcnow())
+    ).delete(synchronize_session=False)
+    db.commit()
+    return deleted
+
+if __name__ == "__main__":
+    if sys.argv[1:] != ["purge"]:
+        print("Usage: python idempotency.py purge")
+        sys.exit(2)
+    db = SessionLocal()
+    try:
+        print(f"✅ Deleted {purge_expired(db)} expired idempotency keys.")
+    finally:
+        db.close()
@@ -0,0 +1,59 @@
+import os
+import re
+from urllib.parse import quote
+from starlette.datastructures import Headers
+from starlette.responses import FileResponse, Response
+from starlette.staticfiles import NotModifiedResponse, StaticFiles
+
+# Serving for /static_images.
+# Uploaded images (and their thumbnails) are named after the SHA-256 of their content, so the
+# URL itself is the version: those responses are marked immutable for a year and get a strong
+# ETag taken from the hash, and browsers stop re-validating them on every catalog view.
+# Older, non-hashed files are served with no-cache, so they are re-validated (cheap 304s).
+# Range requests are handled by Starlette's FileResponse.
+#
+# IMAGE_SENDFILE_MODE lets a fronting proxy send the bytes instead of the Python worker:
+#   "x-accel"    -> X-Accel-Redirect: <IMAGE_ACCEL_PREFIX><path>   (nginx, `internal` location)
+#   "x-sendfile" -> X-Sendfile: <absolute path>                    (Apache mod_xsendfile, lighttpd)
+
+IMAGE_SENDFILE_MODE = os.getenv("IMAGE_SENDFILE_MODE", "").lower()
+IMAGE_ACCEL_PREFIX = os.getenv("IMAGE_ACCEL_PREFIX", "/protected_static_images/")
+
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+REVALIDATE_CACHE_CONTROL = "no-cache"
+
+# <sha256>.<ext> for originals, <sha256>_<width>.<ext> for thumbnails
+HASHED_NAME = re.compile(r"^([0-9a-f]{64})(?:_(\d+))?\.\w+$")
+
+class ImageFiles(StaticFiles):
+    def file_response(self, full_path, stat_result, scope, status_code: int = 200) -> Response:
+        name = os.path.basename(full_path)
+        match = HASHED_NAME.match(name)
+        headers = {}
+        if match:
+            digest, width = match.groups()
+            headers["etag"] = f'"{digest}-{width}"' if width else f'"{digest}"'
+            headers["cache-control"] = IMMUTABLE_CACHE_CONTROL
+        else:
+            headers["cache-control"] = REVALIDATE_CACHE_CONTROL
+
+        response = FileResponse(full_path, status_code=status_code, stat_result=stat_result, headers=headers)
+        if self.is_not_modified(response.headers, Headers(scope=scope)):
+            return NotModifiedResponse(response.headers)
+
+        if IMAGE_SENDFILE_MODE in ("x-accel", "x-sendfile"):
+            return self._offload(response, full_path)
+        return response
+
+    def _offload(self, response: FileResponse, full_path) -> Response:
+        """Hands the body over to the proxy; only the headers are sent from here."""
+        headers = {
+            key: value for key, value in response.headers.items()
+            if key in ("content-type", "etag", "cache-control", "last-modified")
+        }
+        if IMAGE_SENDFILE_MODE == "x-accel":
+            relative_path = os.path.relpath(full_path, self.directory).replace(os.sep, "/")
+            headers["x-accel-redirect"] = IMAGE_ACCEL_PREFIX + quote(relative_path)
+        else:
+            headers["x-sendfile"] = os.path.abspath(full_path)
+        return Response(status_code=200, headers=headers)
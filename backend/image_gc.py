@@ -0,0 +1,136 @@
+import logging
+import os
+import sys
+import threading
+import time
+from database import SessionLocal
+import models
+from image_store import BASE_DIR, IMAGE_UPLOAD_DIR, RECENT_SECONDS
+
+# Garbage collector for image files no product refers to anymore
+# (deleted products, failed uploads, files replaced before content addressing, ...).
+#
+# One sweep:
+#  1. Streams Stock.images / Stock.thumbnails in batches into a set of referenced paths.
+#     It is a plain SELECT (no row or table locks) and there is no per-file query.
+#  2. Moves unreferenced files older than IMAGE_GC_MIN_AGE_MINUTES into a quarantine directory
+#     outside static_images (so they are no longer served).
+#  3. Restores quarantined files that are referenced again, and deletes the ones that have been
+#     in quarantine longer than IMAGE_GC_QUARANTINE_DAYS, reporting the bytes reclaimed.
+
+QUARANTINE_DIR = os.path.join(BASE_DIR, "image_quarantine")
+MIN_AGE_SECONDS = RECENT_SECONDS # IMAGE_GC_MIN_AGE_MINUTES, shared with image_store.release()
+QUARANTINE_SECONDS = float(os.getenv("IMAGE_GC_QUARANTINE_DAYS", "7")) * 86400
+INTERVAL_SECONDS = int(os.getenv("IMAGE_GC_INTERVAL_MINUTES", "360")) * 60 # 0 disables the background sweeper
+BATCH_SIZE = 1000
+
+logger = logging.getLogger(__name__)
+
+def referenced_paths() -> set:
+    """Every image path (relative to BASE_DIR) still used by a product, thumbnails included."""
+    referenced = set()
+    db = SessionLocal()
+    try:
+        query = db.query(models.Stock.images, models.Stock.thumbnails).yield_per(BATCH_SIZE)
+        for images, thumbnails in query:
+            referenced.update(images or [])
+            for variants in (thumbnails or {}).values():
+                referenced.update(variants.values())
+    finally:
+        db.close()
+    return {os.path.normpath(path) for path in referenced}
+
+def _walk(root: str):
+    """Yields (full_path, stat) for every regular file under root."""
+    stack = [root]
+    while stack:
+        with os.scandir(stack.pop()) as entries:
+            for entry in entries:
+                if entry.is_dir(follow_symlinks=False):
+                    stack.append(entry.path)
+                elif entry.is_file(follow_symlinks=False):
+                    yield entry.path, entry.stat()
+
+def sweep(dry_run: bool = False) -> dict:
+    report = {"scanned": 0, "quarantined": 0, "restored": 0, "deleted": 0, "reclaimed_bytes": 0}
+    referenced = referenced_paths()
+    now = time.time()
+
+    # 1. Quarantine orphans
+    for full_path, stat in _walk(IMAGE_UPLOAD_DIR):
+        report["scanned"] += 1
+        name = os.path.basename(full_path)
+        if name.startswith(".upload-") or name.endswith(".tmp"):
+            continue # An upload or thumbnail still being written
+        relative_path = os.path.relpath(full_path, BASE_DIR)
+        if relative_path in referenced or now - stat.st_mtime < MIN_AGE_SECONDS:
+            continue
+        report["quarantined"] += 1
+        if not dry_run:
+            target = os.path.join(QUARANTINE_DIR, relative_path)
+            os.makedirs(os.path.dirname(target), exist_ok=True)
+            try:
+                os.replace(full_path, target)
+                if time.time() - os.stat(target).st_mtime < MIN_AGE_SECONDS:
+                    os.replace(target, full_path) # A dedupe hit claimed it after the scan
+                    report["quarantined"] -= 1
+                    continue
+                os.utime(target) # The quarantine clock starts now
+            except FileNotFoundError:
+                pass # Another worker got there first
+
+    if not os.path.isdir(QUARANTINE_DIR):
+        return report
+
+    # 2. Restore what is referenced again, purge what has waited long enough
+    for full_path, stat in _walk(QUARANTINE_DIR):
+        relative_path = os.path.relpath(full_path, QUARANTINE_DIR)
+        try:
+            if relative_path in referenced:
+                report["restored"] += 1
+                if not dry_run:
+                    os.replace(full_path, os.path.join(BASE_DIR, relative_path))
+            elif now - stat.st_mtime >= QUARANTINE_SECONDS:
+                report["deleted"] += 1
+                report["reclaimed_bytes"] += stat.st_size
+                if not dry_run:
+                    os.remove(full_path)
+        except FileNotFoundError:
+            pass
+
+    return report
+
+# --- Background sweeper ---
+
+_stop = threading.Event()
+_thread = None
+
+def _run():
+    while not _stop.wait(INTERVAL_SECONDS):
+        try:
+            report = sweep()
+            logger.info("Image GC: %s", report)
+        except Exception:
+            logger.exception("Image GC sweep failed")
+
+def start():
+    global _thread
+    if INTERVAL_SECONDS <= 0 or _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_run, name="image-gc", daemon=True)
+    _thread.start()
+
+def stop():
+    global _thread
+    _stop.set()
+    _thread = None
+
+if __name__ == "__main__":
+    dry_run = "--dry-run" in sys.argv
+    if "--purge-now" in sys.argv:
+        QUARANTINE_SECONDS = 0
+    report = sweep(dry_run=dry_run)
+    prefix = "🔍 (dry run) " if dry_run else "✅ "
+    print(f"{prefix}Scanned {report['scanned']} files: {report['quarantined']} quarantined, "
+          f"{report['restored']} restored, {report['deleted']} deleted, {report['reclaimed_bytes']} bytes reclaimed.")
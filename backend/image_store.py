@@ -0,0 +1,120 @@
+import glob
+import hashlib
+import os
+import re
+import tempfile
+import time
+import uuid
+from fastapi import HTTPException, UploadFile
+from sqlalchemy import String, cast
+from sqlalchemy.orm import Session
+import models
+
+# Product image storage.
+# Uploads are copied to disk in chunks (the stock endpoints are plain `def`, so this runs in
+# FastAPI's threadpool, never on the event loop), hashed while they are written, and then
+# atomically renamed to <sha256>.<ext>. Two different files called "image.jpg" no longer
+# overwrite each other, and the same picture uploaded twice is stored once.
+# Because files can be shared between products, deletes go through release().
+# A dedupe hit touches the stored file, and neither release() nor image_gc.py removes a file
+# touched within RECENT_SECONDS, so an upload whose stock row hasn't committed yet keeps its file.
+
+# Determine the base directory of the backend application (D:/smart-pos/backend)
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+IMAGE_UPLOAD_DIR = os.path.join(BASE_DIR, "static_images")
+THUMBNAIL_DIR = os.path.join(IMAGE_UPLOAD_DIR, "thumbs") # Written by thumbnails.py
+
+MAX_IMAGE_BYTES = int(os.getenv("MAX_IMAGE_BYTES", str(10 * 1024 * 1024)))
+CHUNK_SIZE = 1024 * 1024
+RECENT_SECONDS = int(os.getenv("IMAGE_GC_MIN_AGE_MINUTES", "60")) * 60 # Leaves room for in-flight uploads
+ALLOWED_EXTENSIONS = {".jpg", ".jpeg", ".png", ".webp", ".gif"}
+CONTENT_TYPE_EXTENSIONS = {"image/jpeg": ".jpg", "image/png": ".png", "image/webp": ".webp", "image/gif": ".gif"}
+
+# Ensure the directory exists when the app starts
+if not os.path.exists(IMAGE_UPLOAD_DIR):
+    os.makedirs(IMAGE_UPLOAD_DIR)
+
+def _extension_for(upload: UploadFile) -> str:
+    ext = os.path.splitext(upload.filename or "")[1].lower()
+    if ext == ".jpeg":
+        ext = ".jpg"
+    if not ext:
+        ext = CONTENT_TYPE_EXTENSIONS.get(upload.content_type, "")
+    if ext not in ALLOWED_EXTENSIONS:
+        raise HTTPException(status_code=400, detail=f"Unsupported image type for '{upload.filename}'.")
+    return ext
+
+def save_upload(upload: UploadFile) -> str:
+    """Stores one uploaded image and returns its path relative to BASE_DIR (what Stock.images holds)."""
+    ext = _extension_for(upload)
+    digest = hashlib.sha256()
+    size = 0
+
+    fd, tmp_path = tempfile.mkstemp(dir=IMAGE_UPLOAD_DIR, prefix=".upload-", suffix=ext)
+    try:
+        with os.fdopen(fd, "wb") as buffer:
+            while True:
+                chunk = upload.file.read(CHUNK_SIZE)
+                if not chunk:
+                    break
+                size += len(chunk)
+                if size > MAX_IMAGE_BYTES:
+                    raise HTTPException(status_code=413, detail=f"Image '{upload.filename}' is larger than {MAX_IMAGE_BYTES // (1024 * 1024)} MB.")
+                digest.update(chunk)
+                buffer.write(chunk)
+        if size == 0:
+            raise HTTPException(status_code=400, detail=f"Image '{upload.filename}' is empty.")
+
+        final_path = os.path.join(IMAGE_UPLOAD_DIR, digest.hexdigest() + ext)
+        try:
+            os.utime(final_path) # Identical content is already stored; claim it as a fresh upload
+            os.remove(tmp_path)
+        except FileNotFoundError:
+            os.replace(tmp_path, final_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    return os.path.relpath(final_path, BASE_DIR)
+
+def save_uploads(files) -> list:
+    saved_paths = []
+    for upload in files or []:
+        path = save_upload(upload)
+        if path not in saved_paths:
+            saved_paths.append(path)
+    return saved_paths
+
+def _remove_unless_recent(full_path: str) -> bool:
+    """Deletes full_path unless an upload touched it within RECENT_SECONDS. Returns True if it's gone."""
+    # Rename first so a concurrent dedupe hit either touches the file before we look at its mtime,
+    # or finds it missing and stores its own copy
+    claimed_path = f"{full_path}.{uuid.uuid4().hex}.tmp"
+    try:
+        os.replace(full_path, claimed_path)
+    except FileNotFoundError:
+        return True
+    if time.time() - os.stat(claimed_path).st_mtime < RECENT_SECONDS:
+        os.replace(claimed_path, full_path) # Claimed by an upload that hasn't committed yet
+        return False
+    os.remove(claimed_path)
+    return True
+
+def release(db: Session, relative_paths, stock_id: int):
+    """Deletes image files that stock_id no longer uses, unless another product still references them."""
+    for relative_path in relative_paths or []:
+        still_used = db.query(models.Stock.id).filter(
+            models.Stock.id != stock_id,
+            cast(models.Stock.images, String).like(f'%"{relative_path}"%')
+        ).first()
+        if still_used:
+            continue
+        full_path = os.path.join(BASE_DIR, relative_path)
+        if not _remove_unless_recent(full_path):
+            continue
+        # Thumbnails are named after the original's hash: <hash>_<width>.<ext>
+        stem = os.path.splitext(os.path.basename(relative_path))[0]
+        for thumbnail_path in glob.glob(os.path.join(THUMBNAIL_DIR, glob.escape(stem) + "_*")):
+            if re.fullmatch(r"\d+\.\w+", os.path.basename(thumbnail_path)[len(stem) + 1:]):
+                os.remove(thumbnail_path)
@@ -4,6 +4,7 @@ from sqlalchemy.orm import Session
 from database import engine, SessionLocal, Base
 import models
 import auth
+import voucher_partitions
 
 def init_db():
     # RETRY LOGIC: Try to connect 5 times before giving up
@@ -34,6 +35,11 @@ def init_db():
                     print("✅ First Manager Created! Login: admin / admin123")
                 else:
                     print("✅ Database already initialized.")
+
+                # 3. Make sure the coming months have voucher partitions (no-op unless partitioned)
+                created = voucher_partitions.ensure_partitions(db)
+                if created:
+                    print(f"✅ Created voucher partitions for {created} new months.")
             finally:
                 db.close()
                 
@@ -0,0 +1,42 @@
+import os
+from datetime import datetime
+from typing import Dict, Optional
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+import models
+
+# Stock decrements for checkout.
+# CHECKOUT_STOCK_MODE picks how create_voucher protects quantities:
+#   "atomic"  (default) -> no SELECT ... FOR UPDATE. Each product is decremented with one
+#                         conditional UPDATE (quantity >= n), in product id order, as the last
+#                         writes before commit. A hot SKU is locked only for the tail of the
+#                         transaction instead of for the whole checkout.
+#   "locking"           -> the original behaviour: the stock rows are locked up front
+#                         (now in id order) and decremented through the ORM.
+# Every checkout takes its locks in the same order (stock rows by id, then product_sales by id,
+# then a stock change counter shard, the dashboard counters and the sales rollups), so two
+# batches can no longer deadlock each other. Everything else create_voucher writes or reads
+# comes before the decrement, so none of it runs while the stock rows are locked.
+
+CHECKOUT_STOCK_MODE = os.getenv("CHECKOUT_STOCK_MODE", "atomic").lower()
+
+def decrement_stock(db: Session, quantities: Dict[int, int], sold_at: datetime, remaining: Optional[dict] = None) -> Optional[int]:
+    """
+    Takes {product_id: quantity} off the shelf. Returns None on success, or the id of the first
+    product that didn't have enough left, in which case the caller must roll back.
+    If `remaining` is given, it is filled with {product_id: quantity left}.
+    """
+    for product_id in sorted(quantities):
+        quantity = quantities[product_id]
+        left = db.execute(
+            update(models.Stock)
+            .where(models.Stock.id == product_id, models.Stock.quantity >= quantity)
+            .values(quantity=models.Stock.quantity - quantity, last_sold_at=sold_at)
+            .returning(models.Stock.quantity)
+            .execution_options(synchronize_session=False)
+        ).scalar()
+        if left is None:
+            return product_id
+        if remaining is not None:
+            remaining[product_id] = left
+    return None
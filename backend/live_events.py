@@ -0,0 +1,186 @@
+import asyncio
+import json
+import logging
+import os
+import select
+import threading
+from datetime import datetime
+from sqlalchemy import event, func, select as sql_select # `select` is the stdlib module the listener polls with
+from sqlalchemy.orm import Session
+from database import SessionLocal, engine
+
+# Live updates for the dashboard and inventory screens (GET /events/stream, Server-Sent Events).
+# The write paths call publish() inside their own transaction, like etags.bump() and
+# dashboard_counters.add(). Events are held on the session and go out only if the write commits:
+#   "sale"          {"vouchers": [{id, voucher_number, total_amount, staff_id, created_at}]}
+#   "stats"         {total_revenue, vouchers_issued, ...}  (dashboard totals, see dashboard_counters.py)
+#   "stock"         {"items": [{id, quantity}]}      (new quantities after checkout, edits, imports)
+#   "stock_deleted" {"ids": [...]}
+#   "resync"        {}  sent by the server when a client may have missed events; refetch
+#
+# On PostgreSQL they are sent right after the commit with pg_notify() on LIVE_EVENT_CHANNEL, all
+# in one statement on a pooled connection, so publishing adds nothing to a transaction that
+# holds row locks. The server delivers them to every API worker; each worker runs one listener
+# thread on its own connection and fans every notification out to the clients connected to
+# that worker, so one event costs one NOTIFY however many screens are open. Events are lost if
+# the worker dies between the commit and the NOTIFY; the screens catch up with the next change
+# or when they reconnect. On other databases (SQLite in development) the events are fanned out
+# in-process after the commit.
+# The same channel carries events for the workers themselves (e.g. "user_changed", see auth.py,
+# and "counters", see dashboard_counters.py): those have a handler registered with on() and are
+# not sent to clients. broadcast() delivers an event within the current worker only.
+
+LIVE_EVENT_CHANNEL = "pos_live_events"
+ITEMS_PER_EVENT = 100 # Keeps each NOTIFY payload well under PostgreSQL's 8000-byte limit
+SUBSCRIBER_QUEUE_SIZE = 256
+LISTEN_POLL_SECONDS = 5
+LIVE_EVENTS_ENABLED = os.getenv("LIVE_EVENTS_ENABLED", "1") != "0"
+
+logger = logging.getLogger(__name__)
+
+def _json_default(value):
+    return value.isoformat() if isinstance(value, datetime) else str(value)
+
+def _is_postgres(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
+
+def publish(db: Session, event_type: str, **data):
+    """Queues an event for delivery when `db` commits. A long "items" or "ids" list is split over several events."""
+    if not LIVE_EVENTS_ENABLED:
+        return
+    for key in ("items", "ids", "vouchers"):
+        values = data.get(key)
+        if values is not None and len(values) > ITEMS_PER_EVENT:
+            for start in range(0, len(values), ITEMS_PER_EVENT):
+                publish(db, event_type, **{**data, key: values[start:start + ITEMS_PER_EVENT]})
+            return
+
+    payload = json.dumps({"type": event_type, **data}, default=_json_default)
+    db.info.setdefault("live_events", []).append(payload)
+
+def _notify(payloads):
+    try:
+        with engine.connect() as connection:
+            for start in range(0, len(payloads), ITEMS_PER_EVENT):
+                connection.execute(sql_select(*[
+                    func.pg_notify(LIVE_EVENT_CHANNEL, payload) for payload in payloads[start:start + ITEMS_PER_EVENT]
+                ]))
+            connection.commit()
+    except Exception:
+        # The write has committed already; don't fail the request over its notifications
+        logger.exception("Couldn't send %d live events", len(payloads))
+
+@event.listens_for(SessionLocal, "after_commit")
+def _after_commit(session):
+    payloads = session.info.pop("live_events", [])
+    if not payloads:
+        return
+    if _is_postgres(session):
+        _notify(payloads)
+    else:
+        for payload in payloads:
+            broadcast(json.loads(payload))
+
+@event.listens_for(SessionLocal, "after_rollback")
+def _after_rollback(session):
+    session.info.pop("live_events", None)
+
+# --- Per-worker fan-out ---
+
+class Subscriber:
+    """One connected client: a bounded queue read by its stream, fed from any thread."""
+    def __init__(self, loop: asyncio.AbstractEventLoop):
+        self.loop = loop
+        self.queue = asyncio.Queue(maxsize=SUBSCRIBER_QUEUE_SIZE)
+
+    def offer(self, payload: dict):
+        # Runs on the subscriber's event loop
+        try:
+            self.queue.put_nowait(payload)
+        except asyncio.QueueFull:
+            # A stalled client: drop its backlog and tell it to refetch instead of queueing forever
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait({"type": "resync"})
+
+_subscribers = set()
+_subscribers_lock = threading.Lock()
+_handlers = {} # event type -> callback(payload), for events consumed by the workers
+
+def on(event_type: str, handler):
+    """Handles `event_type` in every worker (after the publishing transaction commits) instead of sending it to clients."""
+    _handlers[event_type] = handler
+
+def subscribe() -> Subscriber:
+    """Call from the event loop that will read the subscriber's queue."""
+    subscriber = Subscriber(asyncio.get_running_loop())
+    with _subscribers_lock:
+        _subscribers.add(subscriber)
+    return subscriber
+
+def unsubscribe(subscriber: Subscriber):
+    with _subscribers_lock:
+        _subscribers.discard(subscriber)
+
+def has_subscribers() -> bool:
+    with _subscribers_lock:
+        return bool(_subscribers)
+
+def broadcast(payload: dict):
+    """Delivers an event in this worker only: to its handler, or else to every connected client."""
+    handler = _handlers.get(payload.get("type"))
+    if handler is not None:
+        try:
+            handler(payload)
+        except Exception:
+            logger.exception("Live event handler for %s failed", payload.get("type"))
+        return
+    with _subscribers_lock:
+        subscribers = list(_subscribers)
+    for subscriber in subscribers:
+        try:
+            subscriber.loop.call_soon_threadsafe(subscriber.offer, payload)
+        except RuntimeError:
+            unsubscribe(subscriber) # Its loop has closed
+
+# --- PostgreSQL listener (one per worker) ---
+
+_stop = threading.Event()
+_thread = None
+
+def _listen():
+    while not _stop.is_set():
+        connection = None
+        try:
+            # A dedicated connection outside the pool, since it is held for the life of the worker
+            cargs, cparams = engine.dialect.create_connect_args(engine.url)
+            connection = engine.dialect.dbapi.connect(*cargs, **cparams)
+            connection.autocommit = True
+            connection.cursor().execute(f"LISTEN {LIVE_EVENT_CHANNEL}")
+            broadcast({"type": "resync"}) # Anything sent while we weren't listening is lost
+            while not _stop.is_set():
+                if select.select([connection], [], [], LISTEN_POLL_SECONDS) == ([], [], []):
+                    continue
+                connection.poll()
+                while connection.notifies:
+                    notification = connection.notifies.pop(0)
+                    broadcast(json.loads(notification.payload))
+        except Exception:
+            logger.exception("Live event listener failed; reconnecting")
+            _stop.wait(LISTEN_POLL_SECONDS)
+        finally:
+            if connection is not None:
+                connection.close()
+
+def start():
+    global _thread
+    if not LIVE_EVENTS_ENABLED or engine.dialect.name != "postgresql" or _thread is not None:
+        return
+    _stop.clear()
+    _thread = threading.Thread(target=_listen, name="live-events", daemon=True)
+    _thread.start()
+
+def stop():
+    global _thread
+    _stop.set()
+    _thread = None
@@ -1,9 +1,9 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-import os
 import init_db
-from routers import stock, categories, auth_routes, vouchers, customers, dashboard
+import thumbnails, image_gc, dashboard_counters, live_events, passwords
+import image_store, image_files
+from routers import stock, categories, auth_routes, vouchers, customers, dashboard, events
 
 app = FastAPI(title="Smart POS API")
 
@@ -22,14 +22,24 @@ app.add_middleware(
 )
 
 # 2. STATIC FILES SETUP
-if not os.path.exists("static_images"):
-    os.makedirs("static_images")
-app.mount("/static_images", StaticFiles(directory="static_images"), name="static_images")
+# Content-addressed product images are served as immutable (see image_files.py)
+app.mount("/static_images", image_files.ImageFiles(directory=image_store.IMAGE_UPLOAD_DIR), name="static_images")
 
 # 3. DATABASE INITIALIZATION
 @app.on_event("startup")
 def on_startup():
     init_db.init_db()
+    image_gc.start() # Orphaned image sweeper (IMAGE_GC_INTERVAL_MINUTES=0 disables it)
+    dashboard_counters.start() # Drift correction for the dashboard totals
+    live_events.start() # LISTENs for live events from every worker (PostgreSQL only)
+
+@app.on_event("shutdown")
+def on_shutdown():
+    thumbnails.shutdown()
+    passwords.shutdown()
+    image_gc.stop()
+    dashboard_counters.stop()
+    live_events.stop()
 
 # 4. REGISTER THE ROUTERS
 @app.get("/")
@@ -42,3 +52,4 @@ app.include_router(categories.router)
 app.include_router(vouchers.router)
 app.include_router(customers.router)
 app.include_router(dashboard.router)
+app.include_router(events.router)
@@ -1,6 +1,6 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Float, JSON
+from sqlalchemy import Column, Integer, BigInteger, String, Boolean, ForeignKey, DateTime, Float, JSON, Sequence, LargeBinary
 from sqlalchemy.orm import relationship
-from sqlalchemy.ext.mutable import MutableList
+from sqlalchemy.ext.mutable import MutableList, MutableDict
 from datetime import datetime
 from database import Base
 
@@ -31,7 +31,7 @@ class Stock(Base):
     __tablename__ = "stock"
 
     id = Column(Integer, primary_key=True, index=True)
-    name = Column(String, index=True)
+    name = Column(String, unique=True, index=True) # Always stored stripped and lowercased
     description = Column(String, nullable=True)
     quantity = Column(Integer, default=0)
     price = Column(Float)  # Selling Price
@@ -45,6 +45,8 @@ class Stock(Base):
     # --- THIS IS THE CHANGE ---
     # Stores a list of file paths like ["uploads/espresso_1.jpg", "uploads/espresso_2.jpg"]
     images = Column(MutableList.as_mutable(JSON), default=[]) 
+    # Filled in by the background thumbnail workers: {"static_images/<hash>.jpg": {"160": "static_images/thumbs/<hash>_160.webp", ...}}
+    thumbnails = Column(MutableDict.as_mutable(JSON), default={})
     
     category_id = Column(Integer, ForeignKey("categories.id"), nullable=True)
     arrival_date = Column(DateTime, nullable=True)
@@ -54,6 +56,7 @@ class Stock(Base):
     
     # Relationships
     category = relationship("Category", back_populates="products")
+    sales = relationship("ProductSales", uselist=False, back_populates="product")
 
 # 4. CUSTOMERS TABLE
 class Customer(Base):
@@ -76,7 +79,9 @@ class Voucher(Base):
     __tablename__ = "vouchers"
 
     id = Column(Integer, primary_key=True, index=True)
-    voucher_number = Column(String, unique=True, index=True) # E.g., "INV-2025-001"
+    # E.g., "INV-2025-001". Not unique in the database: on PostgreSQL the table is partitioned by
+    # created_at, which every unique index would have to include; voucher_numbers.py guarantees it.
+    voucher_number = Column(String, index=True)
     total_amount = Column(Float)
     
     # Discount fields
@@ -102,6 +107,7 @@ class VoucherItem(Base):
     id = Column(Integer, primary_key=True, index=True)
     voucher_id = Column(Integer, ForeignKey("vouchers.id"))
     product_id = Column(Integer, ForeignKey("stock.id"))
+    created_at = Column(DateTime, default=datetime.utcnow) # Copy of the voucher's created_at: the partition key on PostgreSQL
     
     quantity = Column(Integer)
     price_at_sale = Column(Float) # Important: Price might change later, this locks it.
@@ -124,4 +130,79 @@ class AuditLog(Base):
     new_value = Column(JSON, nullable=True) # Snapshot after change
     
     user_id = Column(Integer, ForeignKey("users.id"))
-    timestamp = Column(DateTime, default=datetime.utcnow)
\ No newline at end of file
+    timestamp = Column(DateTime, default=datetime.utcnow)
+
+# 8. PRODUCT SALES SUMMARY (Running totals per product, kept up to date at checkout)
+class ProductSales(Base):
+    __tablename__ = "product_sales"
+
+    product_id = Column(Integer, ForeignKey("stock.id"), primary_key=True)
+    total_sold = Column(Integer, nullable=False, default=0)
+    total_revenue = Column(Float, nullable=False, default=0) # Sum of VoucherItem.subtotal
+    last_sold_at = Column(DateTime, nullable=True)
+
+    # Relationship
+    product = relationship("Stock", back_populates="sales")
+
+
+# 9. CHANGE COUNTERS (One row per table, bumped by every write; used to build HTTP ETags)
+class ChangeCounter(Base):
+    __tablename__ = "change_counters"
+
+    name = Column(String, primary_key=True) # e.g., "stock", "categories"
+    version = Column(BigInteger, nullable=False, default=0)
+
+# 10. VOUCHER NUMBER SEQUENCE (PostgreSQL; each nextval reserves a block of VOUCHER_NUMBER_BLOCK numbers, see voucher_numbers.py)
+# Changing the block size needs an ALTER SEQUENCE ... INCREMENT BY as well.
+VOUCHER_NUMBER_BLOCK = 100
+voucher_number_seq = Sequence("voucher_number_seq", start=1, increment=VOUCHER_NUMBER_BLOCK, metadata=Base.metadata)
+
+# 11. IDEMPOTENCY KEYS (Stored checkout responses, replayed when a terminal retries with the same Idempotency-Key)
+class IdempotencyKey(Base):
+    __tablename__ = "idempotency_keys"
+
+    key = Column(String, primary_key=True) # Chosen by the client, e.g. a UUID per sale attempt
+    user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    request_hash = Column(String, nullable=False) # SHA-256 of the request body
+    status_code = Column(Integer, nullable=True)
+    response_body = Column(String, nullable=True) # Filled in by the same transaction that made the sale
+    created_at = Column(DateTime, default=datetime.utcnow)
+    expires_at = Column(DateTime, nullable=False, index=True)
+
+# 12. VOUCHER RECEIPTS (Rendered once at checkout; a sale never changes, so reprints just read this row)
+class VoucherReceipt(Base):
+    __tablename__ = "voucher_receipts"
+
+    voucher_id = Column(Integer, primary_key=True) # No foreign key: vouchers is partitioned on PostgreSQL
+    text = Column(String, nullable=False)
+    escpos = Column(LargeBinary, nullable=False)
+    html = Column(String, nullable=False)
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+# 13. DASHBOARD COUNTERS (Running totals for /dashboard/stats, sharded to spread the write load; see dashboard_counters.py)
+class DashboardCounter(Base):
+    __tablename__ = "dashboard_counters"
+
+    name = Column(String, primary_key=True) # e.g., "total_revenue", "vouchers_issued"
+    shard = Column(Integer, primary_key=True, default=0)
+    value = Column(Float, nullable=False, default=0)
+
+# 14. SALES ROLLUPS (Hourly and daily sales per staff member and category; see sales_rollups.py)
+class SalesRollup(Base):
+    __tablename__ = "sales_rollups"
+
+    granularity = Column(String, primary_key=True) # "hour" or "day"
+    bucket = Column(DateTime, primary_key=True) # Start of the hour/day (UTC)
+    staff_id = Column(Integer, primary_key=True)
+    category_id = Column(Integer, primary_key=True) # -1 = all categories, 0 = uncategorized
+    revenue = Column(Float, nullable=False, default=0)
+    discount = Column(Float, nullable=False, default=0)
+    units = Column(Integer, nullable=False, default=0)
+    voucher_count = Column(Integer, nullable=False, default=0)
+
+# 15. EVENT STREAM TICKETS (Redeemed single-use tickets for GET /events/stream; see auth.py)
+class EventTicket(Base):
+    __tablename__ = "event_tickets"
+
+    jti = Column(String, primary_key=True) # The ticket's unique id
+    expires_at = Column(DateTime, nullable=False, index=True) # Kept until the ticket would have expired anyway
@@ -0,0 +1,68 @@
+import base64
+import json
+from datetime import datetime
+from typing import Optional
+from fastapi import HTTPException
+from sqlalchemy import and_, or_
+
+# Keyset ("cursor") pagination shared by the list endpoints.
+# Instead of OFFSET, each page seeks past the (sort value, id) of the last row it returned,
+# so page 5,000 costs the same as page 1. Rows with a NULL sort value always come last.
+
+def encode_cursor(sort_value, row_id: int) -> str:
+    """Packs the last row's sort value and id into an opaque, URL-safe token."""
+    if isinstance(sort_value, datetime):
+        payload = {"v": sort_value.isoformat(), "t": "dt", "id": row_id}
+    else:
+        payload = {"v": sort_value, "id": row_id}
+    raw = json.dumps(payload, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str):
+    """Returns (sort_value, id) from a token made by encode_cursor()."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        payload = json.loads(raw)
+        sort_value = payload["v"]
+        if payload.get("t") == "dt":
+            sort_value = datetime.fromisoformat(sort_value)
+        return sort_value, int(payload["id"])
+    except (ValueError, TypeError, KeyError):
+        raise HTTPException(status_code=400, detail="Invalid pagination cursor.")
+
+def apply_cursor(query, sort_col, id_col, descending: bool, cursor: Optional[str]):
+    """
+    Orders the query by (sort_col, id_col) and, when a cursor is given,
+    filters it down to the rows that come after that cursor.
+    An empty cursor string means "first page".
+    """
+    if descending:
+        query = query.order_by(sort_col.is_(None), sort_col.desc(), id_col.desc())
+    else:
+        query = query.order_by(sort_col.is_(None), sort_col.asc(), id_col.asc())
+
+    if not cursor:
+        return query
+
+    last_value, last_id = decode_cursor(cursor)
+    id_after = id_col < last_id if descending else id_col > last_id
+    if last_value is None:
+        # Already in the NULL tail; only the id tie-breaker is left
+        return query.filter(sort_col.is_(None), id_after)
+
+    value_after = sort_col < last_value if descending else sort_col > last_value
+    return query.filter(or_(
+        value_after,
+        and_(sort_col == last_value, id_after),
+        sort_col.is_(None)
+    ))
+
+def next_cursor(rows: list, limit: int, key) -> Optional[str]:
+    """
+    Expects rows fetched with limit + 1. If the extra row is there, another page exists
+    and the cursor points at the last row that will actually be returned.
+    key(row) must return (sort_value, id).
+    """
+    if len(rows) <= limit:
+        return None
+    return encode_cursor(*key(rows[limit - 1]))
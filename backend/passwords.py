@@ -0,0 +1,108 @@
+import asyncio
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional, Tuple
+from passlib.context import CryptContext
+
+# Password hashing off the API workers.
+# bcrypt is deliberately slow (~250 ms at 12 rounds), and at a shift change dozens of logins
+# arrive at once. Running it inline filled the threadpool every sync endpoint shares, so the
+# whole API stalled behind the logins. Hashes are now computed in a small process pool of
+# PASSWORD_HASH_WORKERS, with at most PASSWORD_HASH_MAX_PENDING requests running or queued;
+# beyond that callers get PasswordHasherBusy straight away (the login route answers 503
+# with Retry-After) instead of waiting in an ever longer queue. The same goes for the calls
+# caught in a pool whose worker died; the pool is replaced on the next call.
+#
+# BCRYPT_ROUNDS sets the cost. Hashes made with a different cost (or a deprecated scheme)
+# are reported by verify_and_update() with a fresh hash, so the login route re-hashes
+# passwords transparently after the cost is changed.
+# This module imports nothing from the app, so the spawned workers start quickly.
+
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_PENDING = int(os.getenv("PASSWORD_HASH_MAX_PENDING", str(PASSWORD_HASH_WORKERS * 8)))
+
+# min_rounds = max_rounds = the configured cost, so any other cost counts as needing an update
+pwd_context = CryptContext(
+    schemes=["bcrypt"], deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS, bcrypt__min_rounds=BCRYPT_ROUNDS, bcrypt__max_rounds=BCRYPT_ROUNDS
+)
+
+class PasswordHasherBusy(Exception):
+    """Raised when PASSWORD_HASH_MAX_PENDING hashes are already running or queued."""
+
+_executor = None
+_executor_lock = threading.Lock()
+_pending = 0
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # "spawn" so the children don't inherit the API process's threads and DB connections
+            _executor = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+# --- Run in the worker processes ---
+
+def _hash(password: str) -> str:
+    return pwd_context.hash(password)
+
+def _verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    return pwd_context.verify_and_update(password, hashed_password)
+
+# --- API side ---
+
+def _release(_future):
+    global _pending
+    with _executor_lock:
+        _pending -= 1
+
+def _discard(executor: ProcessPoolExecutor):
+    """A worker died, which breaks the whole pool: shut it down and let the next call start a new one."""
+    global _executor
+    with _executor_lock:
+        if _executor is executor:
+            _executor = None
+    executor.shutdown(wait=False, cancel_futures=True)
+
+async def _run(function, *args):
+    global _pending
+    with _executor_lock:
+        if _pending >= PASSWORD_HASH_MAX_PENDING:
+            raise PasswordHasherBusy()
+        _pending += 1
+    executor = None
+    try:
+        executor = _get_executor()
+        future = executor.submit(function, *args)
+    except BrokenProcessPool as error:
+        _release(None)
+        _discard(executor)
+        raise PasswordHasherBusy() from error
+    except Exception:
+        _release(None)
+        raise
+    future.add_done_callback(_release)
+    try:
+        return await asyncio.wrap_future(future)
+    except BrokenProcessPool as error:
+        _discard(executor)
+        raise PasswordHasherBusy() from error
+
+async def hash_password(password: str) -> str:
+    return await _run(_hash, password)
+
+async def verify_and_update(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """(matches, new hash or None). A new hash means the stored one uses outdated parameters."""
+    return await _run(_verify_and_update, password, hashed_password)
@@ -0,0 +1,24 @@
+from datetime import datetime
+from sqlalchemy import and_, case, func, or_
+import models
+
+# The "is this product on sale right now, and what does it cost" rule, written once as SQL.
+# A discount is active when discount_percent > 0 and `now` falls inside the optional
+# start/end window (a missing start means "since forever", a missing end means "until further notice").
+# Because the answer depends on the current time it cannot be a stored/generated column;
+# the expressions take `now` as a bound parameter instead, so they can be used in
+# SELECT, WHERE and ORDER BY alike.
+
+def is_on_sale(now: datetime):
+    return and_(
+        func.coalesce(models.Stock.discount_percent, 0) > 0,
+        or_(models.Stock.discount_start_date.is_(None), models.Stock.discount_start_date <= now),
+        or_(models.Stock.discount_end_date.is_(None), models.Stock.discount_end_date >= now)
+    )
+
+def effective_price(now: datetime):
+    """The price the customer actually pays per unit."""
+    return case(
+        (is_on_sale(now), models.Stock.price * (1 - models.Stock.discount_percent / 100)),
+        else_=models.Stock.price
+    )
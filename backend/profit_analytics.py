@@ -0,0 +1,179 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime
+import numpy as np
+from sqlalchemy import and_, func, select
+from sqlalchemy.orm import Session
+import models, etags, voucher_partitions
+
+# Profit and margin over sales history, for GET /dashboard/profit.
+# Line items are streamed in chunks of PROFIT_CHUNK_ROWS as plain tuples and turned into NumPy
+# columns (voucher, product, category, quantity, subtotal, unit cost, voucher total); every
+# figure is then a vectorized sum or np.bincount group-by, and only per-product and
+# per-category totals are kept between chunks. A year of sales never becomes ORM objects.
+#
+# Revenue is net of voucher-level discounts, spread over the voucher's lines pro rata (as in
+# sales_rollups.py), so it adds up to the voucher totals. Cost is quantity x the product's
+# current cost_price; products without a cost price count as zero cost.
+#
+# Results are cached in-process per (start, end, top). An entry is reused while the "stock"
+# change counter is unchanged (it moves with every checkout and stock edit), and for up to
+# PROFIT_CACHE_MAX_STALE_SECONDS after it moves, so a busy till doesn't force a recompute per sale.
+
+PROFIT_CHUNK_ROWS = int(os.getenv("PROFIT_CHUNK_ROWS", "100000"))
+PROFIT_CACHE_MAX_STALE_SECONDS = int(os.getenv("PROFIT_CACHE_MAX_STALE_SECONDS", "300"))
+PROFIT_CACHE_ENTRIES = 32
+
+UNCATEGORIZED = 0
+
+_cache = OrderedDict() # (start, end, top) -> (stock version, computed at, result)
+_cache_lock = threading.Lock()
+
+def _line_chunks(db: Session, start: datetime, end: datetime, chunk_rows: int):
+    """
+    Yields (voucher_id, product_id, category_id, quantity, subtotal, unit_cost, voucher_total) column arrays.
+    Lines come in voucher order and a chunk never splits a voucher, so pro-rata discounts can be
+    worked out per chunk.
+    """
+    # Archived months are read after the live ones; a voucher and its lines are always in the same tier
+    for Voucher, Item in voucher_partitions.history_tables(db):
+        statement = select(
+            Item.voucher_id, func.coalesce(Item.product_id, 0),
+            func.coalesce(models.Stock.category_id, UNCATEGORIZED),
+            func.coalesce(Item.quantity, 0), func.coalesce(Item.subtotal, 0.0),
+            func.coalesce(models.Stock.cost_price, 0.0),
+            func.coalesce(Voucher.total_amount, 0.0)
+        ).join(Voucher, and_(Voucher.id == Item.voucher_id, Voucher.created_at == Item.created_at))\
+         .outerjoin(models.Stock, models.Stock.id == Item.product_id)\
+         .where(Item.created_at >= start, Item.created_at < end)\
+         .order_by(Item.voucher_id)
+
+        carry = None
+        # Core execution and plain tuples: ORM result processing and NumPy probing each Row object
+        # for the array protocol would otherwise cost more than the arithmetic
+        result = db.connection().execute(statement.execution_options(yield_per=chunk_rows))
+        for rows in result.partitions():
+            table = np.array([tuple(row) for row in rows], dtype=np.float64)
+            if carry is not None:
+                table = np.concatenate([carry, table])
+            # Hold back the last voucher: its remaining lines may be in the next partition
+            last_voucher = table[-1, 0]
+            complete = table[:, 0] != last_voucher
+            carry = table[~complete]
+            if complete.any():
+                yield table[complete].T
+        if carry is not None and len(carry):
+            yield carry.T
+
+def _grow(array: np.ndarray, size: int) -> np.ndarray:
+    if size <= len(array):
+        return array
+    return np.concatenate([array, np.zeros(size - len(array))])
+
+def compute(db: Session, start: datetime, end: datetime, top: int = 10, chunk_rows: int = PROFIT_CHUNK_ROWS) -> dict:
+    """Profit figures for sales in [start, end), without caching."""
+    by_product = {name: np.zeros(0) for name in ("revenue", "cost", "units")}
+    by_category = {name: np.zeros(0) for name in ("revenue", "cost")}
+    voucher_count = 0
+
+    for voucher_ids, product_ids, category_ids, quantities, subtotals, unit_costs, voucher_totals in _line_chunks(db, start, end, chunk_rows):
+        # Per-voucher subtotal -> share of each line that survives the voucher's discount
+        vouchers, line_voucher = np.unique(voucher_ids, return_inverse=True)
+        voucher_subtotals = np.bincount(line_voucher, weights=subtotals)
+        voucher_amounts = np.zeros(len(vouchers))
+        voucher_amounts[line_voucher] = voucher_totals
+        net_ratio = np.divide(voucher_amounts, voucher_subtotals, out=np.zeros(len(vouchers)), where=voucher_subtotals > 0)
+        voucher_count += len(vouchers)
+
+        revenue = subtotals * net_ratio[line_voucher]
+        cost = quantities * unit_costs
+        product_index = product_ids.astype(np.int64)
+        category_index = category_ids.astype(np.int64)
+
+        size = int(product_index.max()) + 1
+        for name, weights in (("revenue", revenue), ("cost", cost), ("units", quantities)):
+            by_product[name] = _grow(by_product[name], size)
+            by_product[name][:size] += np.bincount(product_index, weights=weights, minlength=size)
+        size = int(category_index.max()) + 1
+        for name, weights in (("revenue", revenue), ("cost", cost)):
+            by_category[name] = _grow(by_category[name], size)
+            by_category[name][:size] += np.bincount(category_index, weights=weights, minlength=size)
+
+    total_revenue = float(by_product["revenue"].sum())
+    total_cost = float(by_product["cost"].sum())
+    total_profit = total_revenue - total_cost
+
+    # Top and bottom products by profit, among the products that actually sold
+    product_profit = by_product["revenue"] - by_product["cost"]
+    sold = np.flatnonzero(by_product["units"] > 0)
+    ranked = sold[np.argsort(product_profit[sold], kind="stable")]
+    top_ids, bottom_ids = ranked[::-1][:top], ranked[:top]
+
+    category_profit = by_category["revenue"] - by_category["cost"]
+    category_ids = np.flatnonzero((by_category["revenue"] != 0) | (by_category["cost"] != 0))
+    category_ids = category_ids[np.argsort(-category_profit[category_ids], kind="stable")]
+
+    wanted = {int(product_id) for product_id in np.concatenate([top_ids, bottom_ids])}
+    product_names = dict(db.query(models.Stock.id, models.Stock.name).filter(models.Stock.id.in_(wanted))) if wanted else {}
+    wanted = {int(category_id) for category_id in category_ids if category_id != UNCATEGORIZED}
+    category_names = dict(db.query(models.Category.id, models.Category.name).filter(models.Category.id.in_(wanted))) if wanted else {}
+    category_names[UNCATEGORIZED] = "Uncategorized"
+
+    def margin(revenue, profit):
+        return round(float(profit) / float(revenue) * 100, 2) if revenue else None
+
+    def product_row(product_id):
+        revenue, profit = by_product["revenue"][product_id], product_profit[product_id]
+        return {
+            "product_id": int(product_id),
+            "product_name": product_names.get(int(product_id)),
+            "units_sold": int(by_product["units"][product_id]),
+            "revenue": float(revenue),
+            "cost": float(by_product["cost"][product_id]),
+            "profit": float(profit),
+            "margin_percent": margin(revenue, profit),
+        }
+
+    return {
+        "start": start,
+        "end": end,
+        "vouchers": voucher_count,
+        "revenue": total_revenue,
+        "cost": total_cost,
+        "profit": total_profit,
+        "margin_percent": margin(total_revenue, total_profit),
+        "top_products": [product_row(product_id) for product_id in top_ids],
+        "bottom_products": [product_row(product_id) for product_id in bottom_ids],
+        "categories": [
+            {
+                "category_id": int(category_id),
+                "category_name": category_names.get(int(category_id)),
+                "revenue": float(by_category["revenue"][category_id]),
+                "profit": float(category_profit[category_id]),
+                "margin_percent": margin(by_category["revenue"][category_id], category_profit[category_id]),
+                "profit_share_percent": round(float(category_profit[category_id]) / total_profit * 100, 2) if total_profit else None,
+            }
+            for category_id in category_ids
+        ],
+    }
+
+def get(db: Session, start: datetime, end: datetime, top: int = 10) -> dict:
+    """compute(), served from the per-range cache when it is still fresh enough."""
+    key = (start, end, top)
+    version = etags.get_versions(db, "stock")[0]
+    now = time.monotonic()
+    with _cache_lock:
+        entry = _cache.get(key)
+        if entry is not None and (entry[0] == version or now - entry[1] < PROFIT_CACHE_MAX_STALE_SECONDS):
+            _cache.move_to_end(key)
+            return entry[2]
+
+    result = compute(db, start, end, top)
+    with _cache_lock:
+        _cache[key] = (version, now, result)
+        _cache.move_to_end(key)
+        while len(_cache) > PROFIT_CACHE_ENTRIES:
+            _cache.popitem(last=False)
+    return result
@@ -0,0 +1,165 @@
+import html
+import os
+from datetime import datetime
+from sqlalchemy import insert
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session, selectinload
+import models, serializers
+
+# Server-side receipts.
+# A sale never changes after checkout, so its receipt is rendered once, inside the checkout
+# transaction, as plain text, ESC/POS bytes and HTML, and stored in voucher_receipts keyed by
+# voucher id. A reprint is then a single primary-key lookup. Vouchers created before this table
+# existed are rendered on their first reprint and stored the same way.
+# The layout follows frontend/src/components/Receipt.jsx.
+
+STORE_NAME = os.getenv("STORE_NAME", "SMART POS")
+STORE_ADDRESS = os.getenv("STORE_ADDRESS", "123 Coding Lane, Dev City")
+STORE_PHONE = os.getenv("STORE_PHONE", "555-1234")
+RECEIPT_WIDTH = int(os.getenv("RECEIPT_WIDTH", "42")) # Characters per line; 42 fits 80 mm paper, 32 fits 58 mm
+RECEIPT_ENCODING = os.getenv("RECEIPT_ENCODING", "cp437") # The printer's code page
+
+FORMATS = {
+    "text": "text/plain; charset=utf-8",
+    "escpos": "application/octet-stream",
+    "html": "text/html; charset=utf-8",
+}
+
+# ESC/POS commands
+ESC_INIT = b"\x1b@"
+ESC_ALIGN_LEFT = b"\x1ba\x00"
+ESC_ALIGN_CENTER = b"\x1ba\x01"
+ESC_BOLD_ON = b"\x1bE\x01"
+ESC_BOLD_OFF = b"\x1bE\x00"
+GS_FEED_AND_CUT = b"\x1dVA\x03"
+
+def _money(value) -> str:
+    return f"${(value or 0):.2f}"
+
+def _created_at(voucher: dict) -> str:
+    created_at = voucher["created_at"]
+    if isinstance(created_at, str):
+        created_at = datetime.fromisoformat(created_at)
+    return created_at.strftime("%Y-%m-%d %H:%M")
+
+def _pair(left: str, right: str) -> str:
+    """`left` and `right` on one line, right-aligned; the left part is cut if they don't fit."""
+    room = RECEIPT_WIDTH - len(right) - 1
+    return f"{left[:room]:<{room}} {right}"
+
+def _header_lines(voucher: dict) -> list:
+    customer = voucher.get("customer") or {}
+    lines = [
+        ("Voucher:", voucher["voucher_number"]),
+        ("Date:", _created_at(voucher)),
+        ("Cashier:", str(voucher["staff_id"])),
+        ("Customer:", customer.get("name") or "Walk-in"),
+    ]
+    if customer.get("phone"):
+        lines.append(("Cust. Phone:", customer["phone"]))
+    if customer.get("address"):
+        lines.append(("Cust. Address:", customer["address"]))
+    if voucher.get("delivery_address"):
+        lines.append(("Delivery:", voucher["delivery_address"]))
+    return lines
+
+def _totals_lines(voucher: dict) -> list:
+    subtotal = sum(item["subtotal"] for item in voucher["items"])
+    lines = [("Subtotal:", _money(subtotal))]
+    if (voucher.get("total_discount") or 0) > 0:
+        lines.append(("Discount:", "-" + _money(voucher["total_discount"])))
+    return lines
+
+def _body_lines(voucher: dict) -> list:
+    """Everything between the store header and the TOTAL line, as text lines."""
+    rule = "-" * RECEIPT_WIDTH
+    lines = [rule] + [_pair(label, value) for label, value in _header_lines(voucher)] + [rule]
+    for item in voucher["items"]:
+        lines.append(item["product_name"][:RECEIPT_WIDTH])
+        lines.append(_pair(f"  {item['quantity']} x {_money(item['price_at_sale'])}", _money(item["subtotal"])))
+    lines.append(rule)
+    lines += [_pair(label, value) for label, value in _totals_lines(voucher)]
+    return lines
+
+def render_text(voucher: dict) -> str:
+    """Plain text, `RECEIPT_WIDTH` columns wide. `voucher` has the VoucherOut shape."""
+    lines = [STORE_NAME.center(RECEIPT_WIDTH), STORE_ADDRESS.center(RECEIPT_WIDTH), f"Tel: {STORE_PHONE}".center(RECEIPT_WIDTH)]
+    lines += _body_lines(voucher)
+    lines += [_pair("TOTAL:", _money(voucher["total_amount"])), "", "Thank you for your purchase!".center(RECEIPT_WIDTH)]
+    return "\n".join(line.rstrip() for line in lines) + "\n"
+
+def render_escpos(voucher: dict) -> bytes:
+    """The same receipt as raw ESC/POS printer commands, ending with a feed and cut."""
+    def encode(line: str) -> bytes:
+        return line.encode(RECEIPT_ENCODING, errors="replace") + b"\n"
+
+    out = [ESC_INIT, ESC_ALIGN_CENTER, ESC_BOLD_ON, encode(STORE_NAME), ESC_BOLD_OFF,
+           encode(STORE_ADDRESS), encode(f"Tel: {STORE_PHONE}"), ESC_ALIGN_LEFT]
+    out += [encode(line) for line in _body_lines(voucher)]
+    out += [ESC_BOLD_ON, encode(_pair("TOTAL:", _money(voucher["total_amount"]))), ESC_BOLD_OFF,
+            ESC_ALIGN_CENTER, b"\n", encode("Thank you for your purchase!"), GS_FEED_AND_CUT]
+    return b"".join(out)
+
+def render_html(voucher: dict) -> str:
+    """A standalone HTML page sized for an 80 mm receipt printer."""
+    e = html.escape
+    rows = "".join(
+        f"<div class=\"row\"><span>{e(label)}</span><span>{e(value)}</span></div>"
+        for label, value in _header_lines(voucher)
+    )
+    items = "".join(
+        f"<tr><td>{e(item['product_name'])}</td><td class=\"r\">{item['quantity']}</td>"
+        f"<td class=\"r\">{_money(item['price_at_sale'])}</td><td class=\"r\">{_money(item['subtotal'])}</td></tr>"
+        for item in voucher["items"]
+    )
+    totals = "".join(
+        f"<div class=\"row\"><span>{e(label)}</span><span>{e(value)}</span></div>"
+        for label, value in _totals_lines(voucher)
+    )
+    return (
+        "<!DOCTYPE html><html><head><meta charset=\"utf-8\">"
+        f"<title>{e(voucher['voucher_number'])}</title><style>"
+        "body{font-family:monospace;font-size:10px;width:302px;margin:0;padding:16px}"
+        ".c{text-align:center}.r{text-align:right}.row{display:flex;justify-content:space-between}"
+        "hr{border:0;border-top:1px dashed #000}table{width:100%}th{text-align:left}"
+        ".total{font-weight:bold;font-size:12px;border-top:1px solid #000;padding-top:4px}"
+        "</style></head><body>"
+        f"<div class=\"c\"><h1>{e(STORE_NAME)}</h1><p>{e(STORE_ADDRESS)}</p><p>Tel: {e(STORE_PHONE)}</p></div><hr>"
+        f"{rows}<hr><table><thead><tr><th>ITEM</th><th class=\"r\">QTY</th><th class=\"r\">PRICE</th>"
+        f"<th class=\"r\">TOTAL</th></tr></thead><tbody>{items}</tbody></table><hr>"
+        f"{totals}<div class=\"row total\"><span>TOTAL:</span><span>{_money(voucher['total_amount'])}</span></div>"
+        "<p class=\"c\">Thank you for your purchase!</p></body></html>"
+    )
+
+def _receipt_row(voucher: dict) -> dict:
+    return {
+        "voucher_id": voucher["id"],
+        "text": render_text(voucher),
+        "escpos": render_escpos(voucher),
+        "html": render_html(voucher),
+    }
+
+def store(db: Session, vouchers):
+    """Renders and saves the receipts of freshly created vouchers (VoucherOut-shaped dicts). Call before the checkout's commit."""
+    if vouchers:
+        db.execute(insert(models.VoucherReceipt), [_receipt_row(voucher) for voucher in vouchers])
+
+def get(db: Session, voucher_id: int):
+    """The stored receipt, rendering and saving it first for vouchers that predate the receipt cache. None if there is no such voucher."""
+    receipt = db.get(models.VoucherReceipt, voucher_id)
+    if receipt is not None:
+        return receipt
+
+    voucher = db.query(models.Voucher).options(
+        selectinload(models.Voucher.customer),
+        selectinload(models.Voucher.items).selectinload(models.VoucherItem.product)
+    ).filter(models.Voucher.id == voucher_id).first()
+    if voucher is None:
+        return None
+    data = serializers.voucher_to_dict(voucher, [serializers.voucher_item_to_dict(item) for item in voucher.items])
+    try:
+        store(db, [data])
+        db.commit()
+    except IntegrityError:
+        db.rollback() # Rendered by a concurrent reprint
+    return db.get(models.VoucherReceipt, voucher_id)
@@ -1,23 +1,60 @@
 from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
-import models, schemas, auth, database
+import models, schemas, auth, database, passwords
 
 router = APIRouter(tags=["authentication"])
 
+def _find_user(db: Session, username: str):
+    return db.query(models.User).filter(models.User.username == username).first()
+
+def _store_rehash(db: Session, user_id: int, old_hash: str, new_hash: str):
+    # Only if nobody changed the password meanwhile
+    db.query(models.User).filter(models.User.id == user_id, models.User.hashed_password == old_hash)\
+        .update({models.User.hashed_password: new_hash}, synchronize_session=False)
+    db.commit()
+
 @router.post("/login", response_model=schemas.Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
-    user = db.query(models.User).filter(models.User.username == form_data.username).first()
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(database.get_db)):
+    # async, so a login waiting on bcrypt holds no threadpool thread; the DB calls still run in the pool
+    user = await run_in_threadpool(_find_user, db, form_data.username)
+    verified, new_hash = False, None
+    if user:
+        # Copied out now: storing a rehash commits, which expires `user`, and reloading its
+        # attributes here would run a query on the event loop
+        user_id, hashed_password, is_active = user.id, user.hashed_password, user.is_active
+        claims = {"sub": user.username, "uid": user.id, "role": user.role}
+        try:
+            verified, new_hash = await passwords.verify_and_update(form_data.password, hashed_password)
+        except passwords.PasswordHasherBusy:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Too many logins at once. Please try again in a moment.",
+                headers={"Retry-After": "1"}
+            )
+    if not verified:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED, 
             detail="Incorrect username or password"
         )
+    if new_hash:
+        # Stored with an outdated cost or scheme (see passwords.py): upgrade it now that we know the password
+        await run_in_threadpool(_store_rehash, db, user_id, hashed_password, new_hash)
+    if is_active is False:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Inactive user")
     
-    # Store username and role in the token
-    access_token = auth.create_access_token(data={"sub": user.username, "role": user.role})
+    # Store username, id and role in the token (the id and role let read-only routes skip the user lookup, see auth.py)
+    access_token = auth.create_access_token(data=claims)
     return {"access_token": access_token, "token_type": "bearer"}
 
 @router.get("/users/me", response_model=schemas.UserOut)
 def read_users_me(current_user: models.User = Depends(auth.get_current_user)):
-    return current_user
\ No newline at end of file
+    return current_user
+
+@router.get("/users/cache-stats")
+def read_user_cache_stats(current_user: models.User = Depends(auth.get_current_user)):
+    """Hit/miss counters of the authenticated-user cache, for monitoring."""
+    if current_user.role not in ["manager"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    return auth.user_cache_stats()
@@ -1,7 +1,7 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, status, Request, Response
 from sqlalchemy.orm import Session
 from typing import List
-import models, schemas, database, auth
+import models, schemas, database, auth, etags
 
 router = APIRouter(
     prefix="/categories",
@@ -21,13 +21,19 @@ def create_category(
         
     db_cat = models.Category(name=category.name.upper())
     db.add(db_cat)
+    etags.bump(db, "categories")
     db.commit()
     db.refresh(db_cat)
     return db_cat
 
 @router.get("/", response_model=List[schemas.CategoryOut])
-def get_categories(db: Session = Depends(database.get_db)):
+def get_categories(request: Request, response: Response, db: Session = Depends(database.get_db)):
     """Fetch all categories for the dropdowns and management list."""
+    etag = etags.make_etag(*etags.get_versions(db, "categories"))
+    cached = etags.not_modified(request, etag)
+    if cached:
+        return cached
+    response.headers["ETag"] = etag
     return db.query(models.Category).all()
 
 @router.post("/ss", response_model=schemas.CategoryOut)
@@ -43,6 +49,7 @@ def create_category(
         
     db_cat = models.Category(name=category.name.upper())
     db.add(db_cat)
+    etags.bump(db, "categories")
     db.commit()
     db.refresh(db_cat)
     return db_cat
@@ -64,6 +71,7 @@ def delete_category(
         raise HTTPException(status_code=400, detail="Cannot delete: Category is still assigned to active stock.")
 
     db.delete(db_cat)
+    etags.bump(db, "categories")
     db.commit()
     return {"detail": "Category purged successfully"}
 
@@ -88,6 +96,7 @@ def update_category(
         raise HTTPException(status_code=400, detail="Another category with this name already exists.")
 
     db_cat.name = processed_name
+    etags.bump(db, "categories")
     db.commit()
     db.refresh(db_cat)
     return db_cat
\ No newline at end of file
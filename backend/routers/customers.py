@@ -1,7 +1,7 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
 from typing import List, Optional
-import models, schemas, database, auth
+import models, schemas, database, auth, pagination, dashboard_counters
 
 router = APIRouter(
     prefix="/customers",
@@ -13,11 +13,14 @@ def get_customers(
     page: int = Query(1, ge=1),
     limit: int = Query(10, ge=1),
     search: Optional[str] = Query(None, min_length=2, description="Search for customers by name or phone number."),
+    cursor: Optional[str] = Query(None, description="Opt-in keyset pagination. Pass an empty value for the first page, then the returned next_cursor."),
+    include_total: bool = Query(False, description="In cursor mode, also compute the exact total count."),
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: models.User = Depends(auth.get_read_only_user)
 ):
     """
     Retrieves a paginated list of customers, with optional search.
+    Pass `cursor` to page by id with keyset pagination instead of page numbers.
     """
     query = db.query(models.Customer)
     
@@ -28,21 +31,30 @@ def get_customers(
             (models.Customer.phone.ilike(search_term))
         )
     
-    total = query.count()
-    customers = query.offset((page - 1) * limit).limit(limit).all()
+    next_cursor = None
+    if cursor is not None:
+        total = query.count() if include_total else None
+        query = pagination.apply_cursor(query, models.Customer.id, models.Customer.id, False, cursor)
+        customers = query.limit(limit + 1).all()
+        next_cursor = pagination.next_cursor(customers, limit, lambda c: (c.id, c.id))
+        customers = customers[:limit]
+    else:
+        total = query.count()
+        customers = query.offset((page - 1) * limit).limit(limit).all()
     
     return {
         "items": customers,
         "total": total,
         "page": page,
-        "size": limit
+        "size": limit,
+        "next_cursor": next_cursor
     }
 
 @router.get("/{customer_id}", response_model=schemas.CustomerOut)
 def get_customer(
     customer_id: int,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: models.User = Depends(auth.get_read_only_user)
 ):
     """
     Retrieves a single customer by their ID.
@@ -88,6 +100,7 @@ def delete_customer(
         raise HTTPException(status_code=404, detail="Customer not found")
     
     db.delete(customer)
+    dashboard_counters.add(db, new_customers=-1)
     db.commit()
     return None
 
@@ -103,6 +116,7 @@ def create_customer(
     """
     new_customer = models.Customer(**customer.model_dump())
     db.add(new_customer)
+    dashboard_counters.add(db, new_customers=1)
     db.commit()
     db.refresh(new_customer)
     return new_customer
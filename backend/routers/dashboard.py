@@ -1,10 +1,15 @@
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 from pydantic import BaseModel
+from datetime import datetime
 import database
 import models
-from typing import Optional
+import auth
+import dashboard_counters
+import sales_rollups
+import profit_analytics
+from typing import List, Optional
 
 router = APIRouter(
     prefix="/dashboard",
@@ -19,17 +24,119 @@ class DashboardStats(BaseModel):
 
 @router.get("/stats", response_model=DashboardStats)
 def get_dashboard_stats(db: Session = Depends(database.get_db)):
-    total_revenue = db.query(func.sum(models.Voucher.total_amount)).scalar() or 0
-    vouchers_issued = db.query(func.count(models.Voucher.id)).scalar() or 0
-    new_customers = db.query(func.count(models.Customer.id)).scalar() or 0
-    
-    # Ensure that we handle None from sum() if stock is empty
-    products_in_stock_query = db.query(func.sum(models.Stock.quantity)).scalar()
-    products_in_stock = products_in_stock_query if products_in_stock_query is not None else 0
-
+    # Maintained by the write paths (see dashboard_counters.py), so this is a few rows, not four full-table aggregates
+    counters = dashboard_counters.read(db)
     return {
-        "total_revenue": total_revenue,
-        "vouchers_issued": vouchers_issued,
-        "new_customers": new_customers,
-        "products_in_stock": products_in_stock
+        "total_revenue": counters["total_revenue"],
+        "vouchers_issued": int(counters["vouchers_issued"]),
+        "new_customers": int(counters["new_customers"]),
+        "products_in_stock": int(counters["products_in_stock"])
     }
+
+
+class TimeseriesPoint(BaseModel):
+    bucket: datetime
+    group_id: Optional[int] = None # Category or staff id, depending on group_by
+    group_name: Optional[str] = None
+    revenue: float
+    discount: float
+    units: int
+    voucher_count: int
+
+@router.get("/timeseries", response_model=List[TimeseriesPoint])
+def get_sales_timeseries(
+    granularity: str = Query("day", pattern="^(hour|day|week|month)$"),
+    start: datetime = Query(..., description="Inclusive, UTC."),
+    end: datetime = Query(..., description="Exclusive, UTC."),
+    group_by: str = Query("none", pattern="^(none|category|staff)$"),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_read_only_user)
+):
+    # Read from the pre-aggregated rollups (see sales_rollups.py), never from voucher_items.
+    # Weeks and months are summed from the daily rows.
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'end' must be after 'start'.")
+    Rollup = models.SalesRollup
+    source = "hour" if granularity == "hour" else "day"
+    query = db.query(
+        Rollup.bucket, Rollup.staff_id, Rollup.category_id,
+        Rollup.revenue, Rollup.discount, Rollup.units, Rollup.voucher_count
+    ).filter(
+        Rollup.granularity == source,
+        Rollup.bucket >= sales_rollups.bucket_start(start, source),
+        Rollup.bucket < end
+    )
+    if group_by == "category":
+        query = query.filter(Rollup.category_id != sales_rollups.ALL_CATEGORIES)
+    else:
+        query = query.filter(Rollup.category_id == sales_rollups.ALL_CATEGORIES)
+
+    points = {}
+    for bucket, staff_id, category_id, revenue, discount, units, voucher_count in query:
+        group_id = {"none": None, "category": category_id, "staff": staff_id}[group_by]
+        point = points.setdefault(
+            (sales_rollups.bucket_start(bucket, granularity), group_id),
+            {"revenue": 0.0, "discount": 0.0, "units": 0, "voucher_count": 0}
+        )
+        point["revenue"] += revenue
+        point["discount"] += discount
+        point["units"] += units
+        point["voucher_count"] += voucher_count
+
+    names = {}
+    group_ids = {group_id for _, group_id in points if group_id}
+    if group_by == "category":
+        names = dict(db.query(models.Category.id, models.Category.name).filter(models.Category.id.in_(group_ids))) if group_ids else {}
+        names[sales_rollups.UNCATEGORIZED] = "Uncategorized"
+    elif group_by == "staff" and group_ids:
+        names = dict(db.query(models.User.id, models.User.username).filter(models.User.id.in_(group_ids)))
+
+    return [
+        TimeseriesPoint(bucket=bucket, group_id=group_id, group_name=names.get(group_id), **figures)
+        for (bucket, group_id), figures in sorted(points.items(), key=lambda entry: (entry[0][0], entry[0][1] or 0))
+    ]
+
+
+class ProductProfit(BaseModel):
+    product_id: int
+    product_name: Optional[str] = None
+    units_sold: int
+    revenue: float
+    cost: float
+    profit: float
+    margin_percent: Optional[float] = None
+
+class CategoryProfit(BaseModel):
+    category_id: int
+    category_name: Optional[str] = None
+    revenue: float
+    profit: float
+    margin_percent: Optional[float] = None
+    profit_share_percent: Optional[float] = None
+
+class ProfitReport(BaseModel):
+    start: datetime
+    end: datetime
+    vouchers: int
+    revenue: float
+    cost: float
+    profit: float
+    margin_percent: Optional[float] = None
+    top_products: List[ProductProfit]
+    bottom_products: List[ProductProfit]
+    categories: List[CategoryProfit]
+
+@router.get("/profit", response_model=ProfitReport)
+def get_profit_report(
+    start: datetime = Query(..., description="Inclusive, UTC."),
+    end: datetime = Query(..., description="Exclusive, UTC."),
+    top: int = Query(10, ge=1, le=100, description="How many top and bottom products to list."),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_current_user)
+):
+    # Vectorized over line-item chunks and cached per range (see profit_analytics.py)
+    if current_user.role not in ["manager"]: # Cost prices and margins
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+    if end <= start:
+        raise HTTPException(status_code=400, detail="'end' must be after 'start'.")
+    return profit_analytics.get(db, start, end, top)
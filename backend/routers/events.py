@@ -0,0 +1,77 @@
+import asyncio
+import json
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.concurrency import run_in_threadpool
+from fastapi.responses import StreamingResponse
+import models, auth, dashboard_counters, live_events
+from database import SessionLocal
+
+router = APIRouter(
+    prefix="/events",
+    tags=["Events"]
+)
+
+HEARTBEAT_SECONDS = 15 # Keeps proxies from closing an idle stream
+RETRY_MILLISECONDS = 3000
+
+def _format(payload: dict) -> str:
+    data = {key: value for key, value in payload.items() if key != "type"}
+    return f"event: {payload['type']}\ndata: {json.dumps(data)}\n\n"
+
+@router.post("/ticket")
+def create_ticket(current_user: models.User = Depends(auth.get_current_user)):
+    """A short-lived, single-use ticket for GET /events/stream (see auth.py)."""
+    return {"ticket": auth.create_events_ticket(current_user), "expires_in": auth.EVENTS_TICKET_SECONDS}
+
+def _authenticate_and_snapshot(ticket: str) -> dict:
+    db = SessionLocal()
+    try:
+        auth.redeem_events_ticket(db, ticket)
+        return dashboard_counters.stats_event(db)
+    finally:
+        db.close()
+
+@router.get("/stream")
+async def stream_events(
+    request: Request,
+    ticket: str = Query(..., description="From POST /events/ticket; EventSource can't send an Authorization header.")
+):
+    """
+    Server-Sent Events with live dashboard and stock changes (see live_events.py).
+    Starts with a "stats" event holding the current dashboard totals and sends a new one
+    whenever they change; patch stock rows from "stock" events, and refetch on "resync".
+    """
+    subscriber = live_events.subscribe() # Before the snapshot, so nothing committed in between is missed
+    try:
+        snapshot = await run_in_threadpool(_authenticate_and_snapshot, ticket)
+    except HTTPException:
+        live_events.unsubscribe(subscriber)
+        raise
+    # Events queued meanwhile are kept: "stock" events carry absolute quantities, so one the
+    # client has already seen does no harm, and "stats" events older than the snapshot are skipped
+    version = snapshot.pop("version")
+
+    async def events():
+        nonlocal version
+        try:
+            yield f"retry: {RETRY_MILLISECONDS}\n\n"
+            yield _format(snapshot)
+            while not await request.is_disconnected():
+                try:
+                    payload = await asyncio.wait_for(subscriber.queue.get(), HEARTBEAT_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keepalive\n\n"
+                    continue
+                if payload["type"] == "stats":
+                    if payload["version"] <= version:
+                        continue # Read before the totals this client already has
+                    version = payload["version"]
+                    payload = {key: value for key, value in payload.items() if key != "version"}
+                yield _format(payload)
+        finally:
+            live_events.unsubscribe(subscriber)
+
+    return StreamingResponse(events(), media_type="text/event-stream", headers={
+        "Cache-Control": "no-cache",
+        "X-Accel-Buffering": "no", # Don't let nginx buffer the stream
+    })
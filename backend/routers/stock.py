@@ -1,18 +1,11 @@
-from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, status, UploadFile, File, Form, Query, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, contains_eager
 from sqlalchemy import func
 from datetime import datetime
 from typing import List, Optional
-import os, shutil, json
-import models, schemas, auth, database
-
-# Determine the base directory of the backend application (D:/smart-pos/backend)
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-IMAGE_UPLOAD_DIR = os.path.join(BASE_DIR, "static_images")
-
-# Ensure the directory exists when the app starts
-if not os.path.exists(IMAGE_UPLOAD_DIR):
-    os.makedirs(IMAGE_UPLOAD_DIR)
+import json
+import models, schemas, auth, database, pagination, search, pricing, serializers, etags, stock_import, exports, image_store, thumbnails, dashboard_counters, live_events, voucher_partitions
 
 router = APIRouter(
     prefix="/stock",
@@ -20,7 +13,7 @@ router = APIRouter(
 )
 
 @router.post("/")
-async def create_stock_item(
+def create_stock_item(
     name: str = Form(...),
     price: float = Form(...),
     cost_price: float = Form(None),
@@ -49,14 +42,8 @@ async def create_stock_item(
     if existing_stock:
         raise HTTPException(status_code=400, detail=f"Stock item with name '{name}' already exists.")
 
-    saved_paths = []
-    if files:
-        for file in files:
-            file_path = os.path.join(IMAGE_UPLOAD_DIR, file.filename) # Full path for saving
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            relative_file_path = os.path.relpath(file_path, BASE_DIR) # Store relative path from BASE_DIR in DB
-            saved_paths.append(relative_file_path)
+    # Content-addressed, chunked, atomic writes (see image_store.py)
+    saved_paths = image_store.save_uploads(files)
 
     stock_data = {
         "name": processed_name,
@@ -75,6 +62,10 @@ async def create_stock_item(
         
     new_stock = models.Stock(**stock_data)
     db.add(new_stock)
+    db.flush() # Assigns the id for the live event
+    etags.bump(db, "stock")
+    dashboard_counters.add(db, products_in_stock=quantity)
+    live_events.publish(db, "stock", items=[{"id": new_stock.id, "quantity": new_stock.quantity}])
     db.commit()
     db.refresh(new_stock)
 
@@ -87,188 +78,323 @@ async def create_stock_item(
     )
     db.add(audit)
     db.commit()
+
+    # Thumbnails are produced in the background process pool
+    thumbnails.schedule(new_stock.id, saved_paths)
     return new_stock
 
-@router.get("/", response_model=schemas.StockPaginationResponse)
-def get_stock_inventory(
-    page: int = Query(1, ge=1),
-    limit: int = Query(10, ge=1),
-    sort_by: str = Query("id"),
-    sort_order: str = Query("desc"),
-    name: Optional[str] = None,
-    category_id: Optional[str] = None,
-    sell_price_gt: Optional[str] = None,
-    sell_price_lt: Optional[str] = None,
-    buy_price_gt: Optional[str] = None,
-    buy_price_lt: Optional[str] = None,
-    quantity_gt: Optional[str] = None,
-    quantity_lt: Optional[str] = None,
-    total_sold_gt: Optional[str] = None,
-    total_sold_lt: Optional[str] = None,
-    arrival_date_eq: Optional[str] = None,
-    arrival_date_start: Optional[str] = None,
-    arrival_date_end: Optional[str] = None,
+@router.post("/import", response_model=schemas.StockImportResult)
+def import_stock_items(
+    file: UploadFile = File(...),
+    format: Optional[str] = Query(None, pattern="^(csv|ndjson)$", description="Defaults to the file extension."),
     db: Session = Depends(database.get_db),
     current_user: models.User = Depends(auth.get_current_user)
 ):
-    """Advanced retrieval with dynamic sorting and 'Total Sold' calculation."""
-    # 1. Calculate sales per product
-    sales_sub = db.query(
-        models.VoucherItem.product_id,
-        func.sum(models.VoucherItem.quantity).label("total_sold")
-    ).group_by(models.VoucherItem.product_id).subquery()
+    """
+    Bulk creates or updates stock items from a CSV or NDJSON file, matched by name.
+    Columns: name, price, cost_price, quantity, category (name), description, arrival_date,
+    discount_percent, discount_start_date, discount_end_date.
+    """
+    if current_user.role not in ["manager"]:
+        raise HTTPException(status_code=403, detail="Insufficient permissions")
+
+    fmt = format or ("ndjson" if (file.filename or "").endswith((".ndjson", ".jsonl")) else "csv")
+    return stock_import.import_stock(db, file.file, fmt, current_user.id)
+
+class StockFilters:
+    """The /stock list filters, shared by the paginated list and the export."""
+    def __init__(
+        self,
+        name: Optional[str] = None,
+        category_id: Optional[str] = None,
+        sell_price_gt: Optional[str] = None,
+        sell_price_lt: Optional[str] = None,
+        buy_price_gt: Optional[str] = None,
+        buy_price_lt: Optional[str] = None,
+        quantity_gt: Optional[str] = None,
+        quantity_lt: Optional[str] = None,
+        total_sold_gt: Optional[str] = None,
+        total_sold_lt: Optional[str] = None,
+        arrival_date_eq: Optional[str] = None,
+        arrival_date_start: Optional[str] = None,
+        arrival_date_end: Optional[str] = None,
+        on_sale: Optional[bool] = None,
+        effective_price_gt: Optional[str] = None,
+        effective_price_lt: Optional[str] = None,
+    ):
+        self.name = name
+        self.category_id = category_id
+        self.sell_price_gt = sell_price_gt
+        self.sell_price_lt = sell_price_lt
+        self.buy_price_gt = buy_price_gt
+        self.buy_price_lt = buy_price_lt
+        self.quantity_gt = quantity_gt
+        self.quantity_lt = quantity_lt
+        self.total_sold_gt = total_sold_gt
+        self.total_sold_lt = total_sold_lt
+        self.arrival_date_eq = arrival_date_eq
+        self.arrival_date_start = arrival_date_start
+        self.arrival_date_end = arrival_date_end
+        self.on_sale = on_sale
+        self.effective_price_gt = effective_price_gt
+        self.effective_price_lt = effective_price_lt
+
+def build_stock_query(db: Session, filters: StockFilters, now: datetime):
+    """
+    Returns (query, total_sold_col, effective_price_col) for the filtered inventory.
+    Each row is (Stock, total_sold, effective_price, is_on_sale).
+    """
+    # 1. Sales per product come from the product_sales summary maintained at checkout
+    total_sold_col = func.coalesce(models.ProductSales.total_sold, 0)
+
+    # Discount state is evaluated by the database so it can be filtered and sorted on
+    effective_price_col = pricing.effective_price(now)
+    on_sale_col = pricing.is_on_sale(now)
 
     # 2. Main Query joining Sales and Categories
     query = db.query(
         models.Stock,
-        func.coalesce(sales_sub.c.total_sold, 0).label("total_sold")
-    ).outerjoin(sales_sub, models.Stock.id == sales_sub.c.product_id)\
-     .outerjoin(models.Category, models.Stock.category_id == models.Category.id)
+        total_sold_col.label("total_sold"),
+        effective_price_col.label("effective_price"),
+        on_sale_col.label("is_on_sale")
+    ).outerjoin(models.ProductSales, models.Stock.id == models.ProductSales.product_id)\
+     .outerjoin(models.Category, models.Stock.category_id == models.Category.id)\
+     .options(contains_eager(models.Stock.category))
 
     # 3. Apply Filters
-    if name:
-        query = query.filter(models.Stock.name.ilike(f"%{name}%"))
-    if category_id:
+    if filters.name:
+        query = query.filter(models.Stock.name.ilike(f"%{filters.name}%"))
+    if filters.category_id:
         try:
-            cat_id = int(category_id)
+            cat_id = int(filters.category_id)
             query = query.filter(models.Stock.category_id == cat_id)
         except (ValueError, TypeError):
             pass
-    if sell_price_gt:
+    if filters.sell_price_gt:
         try:
-            price = float(sell_price_gt)
+            price = float(filters.sell_price_gt)
             query = query.filter(models.Stock.price > price)
         except (ValueError, TypeError):
             pass
-    if sell_price_lt:
+    if filters.sell_price_lt:
         try:
-            price = float(sell_price_lt)
+            price = float(filters.sell_price_lt)
             query = query.filter(models.Stock.price < price)
         except (ValueError, TypeError):
             pass
-    if buy_price_gt:
+    if filters.buy_price_gt:
         try:
-            price = float(buy_price_gt)
+            price = float(filters.buy_price_gt)
             query = query.filter(models.Stock.cost_price > price)
         except (ValueError, TypeError):
             pass
-    if buy_price_lt:
+    if filters.buy_price_lt:
         try:
-            price = float(buy_price_lt)
+            price = float(filters.buy_price_lt)
             query = query.filter(models.Stock.cost_price < price)
         except (ValueError, TypeError):
             pass
-    if quantity_gt:
+    if filters.quantity_gt:
         try:
-            qty = int(quantity_gt)
+            qty = int(filters.quantity_gt)
             query = query.filter(models.Stock.quantity > qty)
         except (ValueError, TypeError):
             pass
-    if quantity_lt:
+    if filters.quantity_lt:
         try:
-            qty = int(quantity_lt)
+            qty = int(filters.quantity_lt)
             query = query.filter(models.Stock.quantity < qty)
         except (ValueError, TypeError):
             pass
-    if total_sold_gt:
+    if filters.total_sold_gt:
+        try:
+            qty = int(filters.total_sold_gt)
+            query = query.filter(total_sold_col > qty)
+        except (ValueError, TypeError):
+            pass
+    if filters.total_sold_lt:
         try:
-            qty = int(total_sold_gt)
-            query = query.filter(func.coalesce(sales_sub.c.total_sold, 0) > qty)
+            qty = int(filters.total_sold_lt)
+            query = query.filter(total_sold_col < qty)
         except (ValueError, TypeError):
             pass
-    if total_sold_lt:
+    if filters.on_sale is not None:
+        query = query.filter(on_sale_col if filters.on_sale else ~on_sale_col)
+    if filters.effective_price_gt:
         try:
-            qty = int(total_sold_lt)
-            query = query.filter(func.coalesce(sales_sub.c.total_sold, 0) < qty)
+            price = float(filters.effective_price_gt)
+            query = query.filter(effective_price_col > price)
         except (ValueError, TypeError):
             pass
-    if arrival_date_eq:
+    if filters.effective_price_lt:
         try:
-            date = datetime.fromisoformat(arrival_date_eq)
+            price = float(filters.effective_price_lt)
+            query = query.filter(effective_price_col < price)
+        except (ValueError, TypeError):
+            pass
+    if filters.arrival_date_eq:
+        try:
+            date = datetime.fromisoformat(filters.arrival_date_eq)
             query = query.filter(models.Stock.arrival_date == date)
         except (ValueError, TypeError):
             pass
-    if arrival_date_start and arrival_date_end:
+    if filters.arrival_date_start and filters.arrival_date_end:
         try:
-            start = datetime.fromisoformat(arrival_date_start)
-            end = datetime.fromisoformat(arrival_date_end)
+            start = datetime.fromisoformat(filters.arrival_date_start)
+            end = datetime.fromisoformat(filters.arrival_date_end)
             query = query.filter(models.Stock.arrival_date.between(start, end))
         except (ValueError, TypeError):
             pass
 
+    return query, total_sold_col, effective_price_col
+
+@router.get("/", response_model=schemas.StockPaginationResponse)
+def get_stock_inventory(
+    request: Request,
+    page: int = Query(1, ge=1),
+    limit: int = Query(10, ge=1),
+    sort_by: str = Query("id"),
+    sort_order: str = Query("desc"),
+    filters: StockFilters = Depends(),
+    cursor: Optional[str] = Query(None, description="Opt-in keyset pagination. Pass an empty value for the first page, then the returned next_cursor."),
+    include_total: bool = Query(False, description="In cursor mode, also compute the exact total count."),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_read_only_user)
+):
+    """Advanced retrieval with dynamic sorting and 'Total Sold' calculation."""
+    # 0. Conditional GET: answer unchanged catalogs with a 304 before doing any real work
+    now = datetime.utcnow()
+    etag = etags.make_etag(*etags.get_versions(db, "stock", "categories"), etags.discount_boundaries_passed(db, now))
+    cached = etags.not_modified(request, etag)
+    if cached:
+        return cached
+
+    # 1-3. Filtered inventory query, shared with the export
+    query, total_sold_col, effective_price_col = build_stock_query(db, filters, now)
+
     # 4. Sorting Logic
     if sort_by == "total_sold":
-        sort_attr = func.coalesce(sales_sub.c.total_sold, 0)
+        sort_attr = total_sold_col
+        sort_value = lambda row: (int(row[1]), row[0].id)
+    elif sort_by == "effective_price":
+        sort_attr = effective_price_col
+        sort_value = lambda row: (float(row[2]), row[0].id)
     elif hasattr(models.Stock, sort_by):
         sort_attr = getattr(models.Stock, sort_by)
+        sort_value = lambda row: (getattr(row[0], sort_by), row[0].id)
     else:
         sort_attr = models.Stock.id
-
-    query = query.order_by(sort_attr.desc() if sort_order == "desc" else sort_attr.asc())
+        sort_value = lambda row: (row[0].id, row[0].id)
 
     # 5. Execute with Pagination
-    total_count = query.count()
-    results = query.offset((page - 1) * limit).limit(limit).all()
+    next_cursor = None
+    if cursor is not None:
+        # Keyset mode: seek past the last row instead of OFFSET, and only count when asked
+        total_count = query.count() if include_total else None
+        query = pagination.apply_cursor(query, sort_attr, models.Stock.id, sort_order == "desc", cursor)
+        results = query.limit(limit + 1).all()
+        next_cursor = pagination.next_cursor(results, limit, sort_value)
+        results = results[:limit]
+    else:
+        query = query.order_by(sort_attr.desc() if sort_order == "desc" else sort_attr.asc())
+        total_count = query.count()
+        results = query.offset((page - 1) * limit).limit(limit).all()
+
+    # 6. Serialize rows straight to JSON (see serializers.py)
+    items = [serializers.stock_to_dict(*row) for row in results]
+    return serializers.FastJSONResponse(
+        {"items": items, "total": total_count, "page": page, "size": limit, "next_cursor": next_cursor},
+        headers={"ETag": etag}
+    )
 
-    items = []
-    now = datetime.utcnow()
-    for stock_obj, total_sold in results:
-        is_on_sale = False
-        sale_price = None
-
-        if stock_obj.discount_percent and stock_obj.discount_percent > 0:
-            # A discount is active if the current time is within the date range.
-            # If a start date is not set, the sale is active from the beginning of time.
-            # If an end date is not set, the sale is active indefinitely.
-            is_after_start = stock_obj.discount_start_date is None or now >= stock_obj.discount_start_date
-            is_before_end = stock_obj.discount_end_date is None or now <= stock_obj.discount_end_date
-
-            if is_after_start and is_before_end:
-                is_on_sale = True
-                sale_price = stock_obj.price * (1 - stock_obj.discount_percent / 100)
-
-        item_out = schemas.StockOut.model_validate({
-            **stock_obj.__dict__,
-            "total_sold": int(total_sold),
-            "is_on_sale": is_on_sale,
-            "sale_price": sale_price
-        })
-        items.append(item_out)
-
-    return {"items": items, "total": total_count, "page": page, "size": limit}
+STOCK_EXPORT_COLUMNS = [
+    "id", "name", "category", "price", "sale_price", "is_on_sale", "cost_price", "quantity", "total_sold",
+    "discount_percent", "discount_start_date", "discount_end_date", "arrival_date", "last_sold_at",
+    "created_at", "updated_at",
+]
+
+@router.get("/export")
+def export_stock_inventory(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    filters: StockFilters = Depends(),
+    current_user: models.User = Depends(auth.get_read_only_user)
+):
+    """Streams the whole (filtered) inventory as CSV or NDJSON, using the same filters as GET /stock/."""
+    def generate():
+        # The response outlives the request's session, so the stream owns its own
+        db = database.SessionLocal()
+        try:
+            query, _, _ = build_stock_query(db, filters, datetime.utcnow())
+            rows = (
+                {
+                    **serializers.stock_to_dict(*row),
+                    "category": row[0].category.name if row[0].category else None,
+                }
+                for row in query.order_by(models.Stock.id).yield_per(exports.EXPORT_BATCH)
+            )
+            yield from exports.stream_rows(format, STOCK_EXPORT_COLUMNS, rows)
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type=exports.MEDIA_TYPES[format], headers=exports.download_headers("stock", format))
+
+@router.get("/search", response_model=List[schemas.StockSearchResult])
+def search_stock(
+    q: str = Query(..., min_length=1, description="Part of a product name; typos are tolerated."),
+    limit: int = Query(10, ge=1, le=50),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_read_only_user)
+):
+    """Typeahead search over product names, ranked by trigram similarity."""
+    results = search.search_products(db, q, limit)
+    return [
+        schemas.StockSearchResult(
+            id=stock_obj.id,
+            name=stock_obj.name,
+            price=stock_obj.price,
+            quantity=stock_obj.quantity,
+            score=float(score)
+        )
+        for stock_obj, score in results
+    ]
 
 @router.get("/{stock_id}", response_model=schemas.StockOut)
 def get_stock_item(
     stock_id: int,
+    request: Request,
+    response: Response,
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: models.User = Depends(auth.get_read_only_user)
 ):
     """Retrieves a single stock item by its ID, including total sold quantity and sale price."""
-    db_stock = db.query(models.Stock).filter(models.Stock.id == stock_id).first()
-    if not db_stock:
-        raise HTTPException(status_code=404, detail="Stock item not found")
+    now = datetime.utcnow()
 
-    # Calculate total sold quantity for this specific item
-    total_sold_result = db.query(func.sum(models.VoucherItem.quantity)).filter(models.VoucherItem.product_id == stock_id).scalar()
-    
-    # The result can be None if there are no sales, so default to 0
-    db_stock.total_sold = total_sold_result or 0
+    # Conditional GET: the row's updated_at changes on every edit and sale; the category
+    # counter covers renames, and the sale flag covers discount windows opening or closing.
+    version = db.query(models.Stock.updated_at, pricing.is_on_sale(now)).filter(models.Stock.id == stock_id).first()
+    if version:
+        etag = etags.make_etag(stock_id, version[0], bool(version[1]), *etags.get_versions(db, "categories"))
+        cached = etags.not_modified(request, etag)
+        if cached:
+            return cached
+        response.headers["ETag"] = etag
+
+    row = db.query(
+        models.Stock,
+        pricing.effective_price(now).label("effective_price"),
+        pricing.is_on_sale(now).label("is_on_sale")
+    ).filter(models.Stock.id == stock_id).first()
+    if not row:
+        raise HTTPException(status_code=404, detail="Stock item not found")
+    db_stock, effective_price, is_on_sale = row
 
-    # Calculate sale price
-    is_on_sale = False
-    sale_price = None
-    now = datetime.utcnow()
-    if db_stock.discount_percent and db_stock.discount_percent > 0:
-        is_after_start = db_stock.discount_start_date is None or now >= db_stock.discount_start_date
-        is_before_end = db_stock.discount_end_date is None or now <= db_stock.discount_end_date
-        if is_after_start and is_before_end:
-            is_on_sale = True
-            sale_price = db_stock.price * (1 - db_stock.discount_percent / 100)
+    # Total sold quantity comes from the sales summary; no row means nothing sold yet
+    db_stock.total_sold = db_stock.sales.total_sold if db_stock.sales else 0
 
     return schemas.StockOut.model_validate({
         **db_stock.__dict__,
-        "is_on_sale": is_on_sale,
-        "sale_price": sale_price
+        "is_on_sale": bool(is_on_sale),
+        "sale_price": effective_price if is_on_sale else None
     })
 
 
@@ -286,18 +412,24 @@ def delete_stock_item(
     if not db_stock:
         raise HTTPException(status_code=404, detail="Stock item not found")
 
-    has_been_sold = db.query(models.VoucherItem).filter(models.VoucherItem.product_id == stock_id).first()
+    # Archived sales count too: their lines still reference the product
+    has_been_sold = any(
+        db.query(VoucherItem.id).filter(VoucherItem.product_id == stock_id).first()
+        for _, VoucherItem in voucher_partitions.history_tables(db)
+    )
     if has_been_sold:
         raise HTTPException(status_code=400, detail="Cannot delete item that has been sold. Consider setting quantity to 0.")
 
-    # Also delete images from the filesystem
-    if db_stock.images:
-        for image_path in db_stock.images:
-            if os.path.exists(image_path):
-                os.remove(image_path)
+    image_paths = list(db_stock.images or [])
 
     db.delete(db_stock)
+    etags.bump(db, "stock")
+    dashboard_counters.add(db, products_in_stock=-(db_stock.quantity or 0))
+    live_events.publish(db, "stock_deleted", ids=[stock_id])
     db.commit()
+
+    # Also delete images from the filesystem, unless another product shares them
+    image_store.release(db, image_paths, stock_id)
     return {"detail": "Stock item deleted successfully"}
 
 @router.put("/{stock_id}", response_model=schemas.StockOut)
@@ -322,7 +454,8 @@ def update_stock_item(
     if current_user.role not in ["manager"]:
         raise HTTPException(status_code=403, detail="Insufficient permissions")
 
-    db_stock = db.query(models.Stock).filter(models.Stock.id == stock_id).first()
+    # Locked, so the quantity change recorded on the dashboard counters is exact
+    db_stock = db.query(models.Stock).filter(models.Stock.id == stock_id).with_for_update().first()
     if not db_stock:
         raise HTTPException(status_code=404, detail="Stock item not found")
 
@@ -347,6 +480,7 @@ def update_stock_item(
     # Update other text fields
     db_stock.price = price
     db_stock.cost_price = cost_price
+    dashboard_counters.add(db, products_in_stock=quantity - (db_stock.quantity or 0))
     db_stock.quantity = quantity
     db_stock.category_id = category_id
     db_stock.description = description
@@ -360,19 +494,16 @@ def update_stock_item(
     if db_stock.images is None:
         db_stock.images = []
 
-    # Handle image deletion
+    # Handle image deletion (the files themselves are released after the commit)
+    removed_paths = []
     if images_to_delete:
         to_delete_relative_paths = json.loads(images_to_delete)
         print(f"Parsed to_delete_relative_paths: {to_delete_relative_paths}")
 
         for relative_path in to_delete_relative_paths:
             print(f"Attempting to delete: {relative_path}")
-            full_path_to_delete = os.path.join(BASE_DIR, relative_path)
-            if os.path.exists(full_path_to_delete):
-                os.remove(full_path_to_delete)
-                print(f"Physically deleted file: {full_path_to_delete}")
-            else:
-                print(f"File not found on disk: {full_path_to_delete}")
+            if relative_path in db_stock.images:
+                removed_paths.append(relative_path)
             
             # Filter out the relative_path from db_stock.images directly
             original_images_len = len(db_stock.images)
@@ -384,24 +515,25 @@ def update_stock_item(
 
     print(f"Images in DB in memory after deletion processing: {db_stock.images}")
 
-    # Handle new image uploads
-    saved_paths = []
-    if files:
-        for file in files:
-            file_path = os.path.join(IMAGE_UPLOAD_DIR, file.filename)
-            with open(file_path, "wb") as buffer:
-                shutil.copyfileobj(file.file, buffer)
-            relative_file_path = os.path.relpath(file_path, BASE_DIR)
-            saved_paths.append(relative_file_path)
-
-    # Append new paths to db_stock.images
-    db_stock.images.extend(saved_paths)
+    # Handle new image uploads (content-addressed, see image_store.py)
+    saved_paths = image_store.save_uploads(files)
+
+    # Append new paths to db_stock.images, skipping pictures the product already has
+    db_stock.images.extend([path for path in saved_paths if path not in db_stock.images])
     
     db.add(db_stock) # Explicitly add to session just in case
+    etags.bump(db, "stock")
+    live_events.publish(db, "stock", items=[{"id": stock_id, "quantity": db_stock.quantity}])
     db.commit()
     db.refresh(db_stock)
     print(f"Images in DB after commit and refresh: {db_stock.images}")
 
+    # Remove files that were deleted from this product and aren't used by any other
+    image_store.release(db, [path for path in removed_paths if path not in db_stock.images], stock_id)
+
+    # Thumbnails for the new pictures are produced in the background process pool
+    thumbnails.schedule(stock_id, saved_paths)
+
     # --- VERIFICATION STEP: Re-fetch from DB and print ---
     re_fetched_stock = db.query(models.Stock).filter(models.Stock.id == stock_id).first()
     if re_fetched_stock:
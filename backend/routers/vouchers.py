@@ -1,16 +1,29 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from fastapi.responses import JSONResponse
-from sqlalchemy.orm import Session, joinedload
-from sqlalchemy import func
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, status, Query, Header, Request, Response
+from fastapi.responses import JSONResponse, StreamingResponse
+from sqlalchemy.orm import Session, joinedload, selectinload
+from sqlalchemy import func, insert
+from typing import List, Optional
 from datetime import datetime
-import models, schemas, database, auth
+import models, schemas, database, auth, sales_summary, inventory, voucher_numbers, voucher_partitions, idempotency, receipts, pagination, pricing, serializers, etags, exports, dashboard_counters, sales_rollups, live_events
 
 router = APIRouter(
     prefix="/vouchers",
     tags=["Vouchers"]
 )
 
+def apply_voucher_filters(query, customer_name: str = None, staff_id: int = None, start_date: datetime = None, end_date: datetime = None):
+    """The /vouchers list filters, shared by the paginated list and the export."""
+    if customer_name:
+        # EXISTS rather than a join, so it works the same whatever the query already joins
+        query = query.filter(models.Voucher.customer.has(models.Customer.name.ilike(f"%{customer_name}%")))
+    if staff_id:
+        query = query.filter(models.Voucher.staff_id == staff_id)
+    if start_date:
+        query = query.filter(models.Voucher.created_at >= start_date)
+    if end_date:
+        query = query.filter(models.Voucher.created_at <= end_date)
+    return query
+
 @router.get("/", response_model=schemas.VoucherPaginationResponse)
 def get_vouchers(
     page: int = Query(1, ge=1),
@@ -21,75 +34,166 @@ def get_vouchers(
     staff_id: int = None,
     start_date: datetime = None,
     end_date: datetime = None,
+    cursor: Optional[str] = Query(None, description="Opt-in keyset pagination. Pass an empty value for the first page, then the returned next_cursor."),
+    include_total: bool = Query(False, description="In cursor mode, also compute the exact total count."),
     db: Session = Depends(database.get_db)
 ):
     """
     Retrieves a paginated list of vouchers with sorting and filtering.
+    Pass `cursor` to page with keyset pagination instead of page numbers.
     """
+    # The page (and the count) is taken over vouchers alone; items, products and customers are
+    # then loaded for just that page with one SELECT ... IN each. Joined eager loading would
+    # multiply every voucher by its number of lines before OFFSET/LIMIT.
     query = db.query(models.Voucher).options(
-        joinedload(models.Voucher.customer),
-        joinedload(models.Voucher.items).joinedload(models.VoucherItem.product)
+        selectinload(models.Voucher.customer),
+        selectinload(models.Voucher.items).selectinload(models.VoucherItem.product)
     )
 
     # Filtering
-    if customer_name:
-        query = query.join(models.Customer).filter(models.Customer.name.ilike(f"%{customer_name}%"))
-    if staff_id:
-        query = query.filter(models.Voucher.staff_id == staff_id)
-    if start_date:
-        query = query.filter(models.Voucher.created_at >= start_date)
-    if end_date:
-        query = query.filter(models.Voucher.created_at <= end_date)
+    query = apply_voucher_filters(query, customer_name, staff_id, start_date, end_date)
 
-    # Sorting
-    if hasattr(models.Voucher, sort_by):
+    # Pagination
+    next_cursor = None
+    if cursor is not None:
+        # Keyset mode: seek on (sort column, id) and skip the exact count unless asked
+        if not hasattr(models.Voucher, sort_by):
+            sort_by = "id"
         sort_column = getattr(models.Voucher, sort_by)
-        if sort_order == "desc":
-            query = query.order_by(sort_column.desc())
-        else:
-            query = query.order_by(sort_column.asc())
+        total = query.count() if include_total else None
+        query = pagination.apply_cursor(query, sort_column, models.Voucher.id, sort_order == "desc", cursor)
+        vouchers = query.limit(limit + 1).all()
+        next_cursor = pagination.next_cursor(vouchers, limit, lambda v: (getattr(v, sort_by), v.id))
+        vouchers = vouchers[:limit]
+    else:
+        # Sorting
+        if hasattr(models.Voucher, sort_by):
+            sort_column = getattr(models.Voucher, sort_by)
+            if sort_order == "desc":
+                query = query.order_by(sort_column.desc())
+            else:
+                query = query.order_by(sort_column.asc())
 
-    # Pagination
-    total = query.count()
-    vouchers = query.offset((page - 1) * limit).limit(limit).all()
-
-    # Manually construct the response to avoid Pydantic serialization errors
-    response_items = []
-    for voucher in vouchers:
-        items_out = []
-        for item in voucher.items:
-            items_out.append(schemas.VoucherItemOut(
-                product_id=item.product_id,
-                product_name=item.product.name if item.product else "N/A",
-                quantity=item.quantity,
-                price_at_sale=item.price_at_sale,
-                subtotal=item.subtotal,
-                total_quantity_sold=0  # Set to 0 for performance on list view
-            ))
-        
-        # Safely create CustomerOut from voucher.customer
-        customer_out = schemas.CustomerOut.from_orm(voucher.customer) if voucher.customer else None
-
-        response_items.append(schemas.VoucherOut(
-            id=voucher.id,
-            voucher_number=voucher.voucher_number,
-            total_amount=voucher.total_amount,
-            total_discount=voucher.total_discount or 0.0,
-            discount_percentage=voucher.discount_percentage or 0.0,
-            discount_amount=voucher.discount_amount or 0.0,
-            created_at=voucher.created_at,
-            staff_id=voucher.staff_id,
-            delivery_address=voucher.delivery_address,
-            items=items_out,
-            customer=customer_out
-        ))
+        total = query.count()
+        vouchers = query.offset((page - 1) * limit).limit(limit).all()
 
-    return {
+    # Serialize straight to JSON (see serializers.py); total_quantity_sold is 0 on the list view
+    response_items = [
+        serializers.voucher_to_dict(voucher, [serializers.voucher_item_to_dict(item) for item in voucher.items])
+        for voucher in vouchers
+    ]
+
+    return serializers.FastJSONResponse({
         "items": response_items,
         "total": total,
         "page": page,
-        "size": limit
-    }
+        "size": limit,
+        "next_cursor": next_cursor
+    })
+
+VOUCHER_EXPORT_COLUMNS = [
+    "voucher_id", "voucher_number", "created_at", "staff_id", "customer_id", "customer_name", "delivery_address",
+    "voucher_total_amount", "voucher_total_discount", "product_id", "product_name", "quantity", "price_at_sale", "subtotal",
+]
+
+@router.get("/export")
+def export_vouchers(
+    format: str = Query("csv", pattern="^(csv|ndjson)$"),
+    customer_name: str = None,
+    staff_id: int = None,
+    start_date: datetime = None,
+    end_date: datetime = None,
+    current_user: models.User = Depends(auth.get_read_only_user)
+):
+    """
+    Streams sales as CSV or NDJSON, one line per voucher item, using the same filters as GET /vouchers/.
+    """
+    def generate():
+        # The response outlives the request's session, so the stream owns its own
+        db = database.SessionLocal()
+        try:
+            query = db.query(
+                models.Voucher.id.label("voucher_id"),
+                models.Voucher.voucher_number,
+                models.Voucher.created_at,
+                models.Voucher.staff_id,
+                models.Voucher.customer_id,
+                models.Customer.name.label("customer_name"),
+                models.Voucher.delivery_address,
+                models.Voucher.total_amount.label("voucher_total_amount"),
+                models.Voucher.total_discount.label("voucher_total_discount"),
+                models.VoucherItem.product_id,
+                models.Stock.name.label("product_name"),
+                models.VoucherItem.quantity,
+                models.VoucherItem.price_at_sale,
+                models.VoucherItem.subtotal
+            ).join(models.VoucherItem, models.VoucherItem.voucher_id == models.Voucher.id)\
+             .outerjoin(models.Stock, models.Stock.id == models.VoucherItem.product_id)\
+             .outerjoin(models.Customer, models.Customer.id == models.Voucher.customer_id)
+            query = apply_voucher_filters(query, customer_name, staff_id, start_date, end_date)
+            rows = (row._asdict() for row in query.order_by(models.Voucher.id, models.VoucherItem.id).yield_per(exports.EXPORT_BATCH))
+            yield from exports.stream_rows(format, VOUCHER_EXPORT_COLUMNS, rows)
+        finally:
+            db.close()
+
+    return StreamingResponse(generate(), media_type=exports.MEDIA_TYPES[format], headers=exports.download_headers("sales", format))
+
+@router.get("/by-number/{voucher_number}", response_model=schemas.VoucherOut)
+def get_voucher_by_number(voucher_number: str, db: Session = Depends(database.get_db)):
+    """
+    Looks a voucher up by its number, including months already moved to the archive (see voucher_partitions.py).
+    """
+    voucher = db.query(models.Voucher).options(
+        selectinload(models.Voucher.customer),
+        selectinload(models.Voucher.items).selectinload(models.VoucherItem.product)
+    ).filter(models.Voucher.voucher_number == voucher_number).first()
+    # total_quantity_sold is 0 here, as on the list view
+    if voucher:
+        return serializers.FastJSONResponse(
+            serializers.voucher_to_dict(voucher, [serializers.voucher_item_to_dict(item) for item in voucher.items])
+        )
+
+    archived = voucher_partitions.find_archived_voucher(db, voucher_number)
+    if archived is None:
+        raise HTTPException(status_code=404, detail="Voucher not found")
+    customer = db.query(models.Customer).filter(models.Customer.id == archived["customer_id"]).first() if archived["customer_id"] else None
+    return serializers.FastJSONResponse({
+        "id": archived["id"],
+        "voucher_number": archived["voucher_number"],
+        "total_amount": archived["total_amount"],
+        "total_discount": archived["total_discount"] or 0.0,
+        "discount_percentage": archived["discount_percentage"] or 0.0,
+        "discount_amount": archived["discount_amount"] or 0.0,
+        "created_at": archived["created_at"],
+        "staff_id": archived["staff_id"],
+        "delivery_address": archived["delivery_address"],
+        "items": [{**item, "product_name": item["product_name"] or "N/A", "total_quantity_sold": 0} for item in archived["items"]],
+        "customer": serializers.customer_to_dict(customer)
+    })
+
+@router.get("/{voucher_id}/receipt")
+def get_voucher_receipt(
+    voucher_id: int,
+    request: Request,
+    format: str = Query("text", pattern="^(text|escpos|html)$"),
+    db: Session = Depends(database.get_db),
+    current_user: models.User = Depends(auth.get_read_only_user)
+):
+    """
+    The receipt of a voucher as plain text, raw ESC/POS printer bytes or HTML.
+    Receipts never change after the sale, so clients may cache them for good.
+    """
+    etag = f'"receipt-{voucher_id}-{format}"'
+    headers = {"ETag": etag, "Cache-Control": "private, max-age=31536000, immutable"}
+    cached = etags.not_modified(request, etag)
+    if cached is not None:
+        cached.headers.update(headers)
+        return cached
+
+    receipt = receipts.get(db, voucher_id)
+    if receipt is None:
+        raise HTTPException(status_code=404, detail="Voucher not found")
+    return Response(content=getattr(receipt, format), media_type=receipts.FORMATS[format], headers=headers)
 
 @router.get("/{voucher_id}", response_model=schemas.VoucherOut)
 def get_voucher(voucher_id: int, db: Session = Depends(database.get_db)):
@@ -104,15 +208,11 @@ def get_voucher(voucher_id: int, db: Session = Depends(database.get_db)):
     if not voucher:
         raise HTTPException(status_code=404, detail="Voucher not found")
     
-    # The total_quantity_sold needs to be calculated for each item
-    # This is not stored in the DB, so we calculate it on the fly
+    # The total_quantity_sold for each item is read from the product_sales summary
     product_ids = [item.product_id for item in voucher.items]
     
-    total_sales = db.query(
-        models.VoucherItem.product_id,
-        func.sum(models.VoucherItem.quantity).label("total_sold")
-    ).filter(models.VoucherItem.product_id.in_(product_ids)).group_by(
-        models.VoucherItem.product_id
+    total_sales = db.query(models.ProductSales).filter(
+        models.ProductSales.product_id.in_(product_ids)
     ).all()
         
     sales_map = {sale.product_id: sale.total_sold for sale in total_sales}
@@ -147,13 +247,28 @@ def get_voucher(voucher_id: int, db: Session = Depends(database.get_db)):
 def create_voucher(
     batch_data: schemas.VoucherCreate, # Now expects a list of SingleVoucherRequest
     db: Session = Depends(database.get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: models.User = Depends(auth.get_current_user),
+    idempotency_key: Optional[str] = Header(None, description="Unique per sale attempt; a retry with the same key returns the original response.")
 ):
     """
     Creates one or more sales vouchers in a batch. Each voucher can have its own customer, discounts, and delivery address.
     """
     
     try:
+        now = datetime.utcnow()
+        # Numbers first: on SQLite a block is reserved on a separate connection, which would wait
+        # on the write lock this session takes once it claims the key. A replay or a rejected
+        # batch leaves a gap in the sequence, which is allowed (see voucher_numbers.py).
+        voucher_numbers_for_batch = voucher_numbers.allocate(db, len(batch_data.vouchers), now)
+
+        # A retry with the same Idempotency-Key gets the stored response and never touches stock (see idempotency.py)
+        idempotency_record = None
+        if idempotency_key:
+            body_hash = idempotency.request_hash(batch_data.model_dump_json().encode())
+            idempotency_record, replay = idempotency.claim(db, idempotency_key, current_user.id, body_hash, now)
+            if replay is not None:
+                return replay
+
         all_voucher_items_to_create_across_batch = []
         all_product_ids_across_batch = set()
 
@@ -173,24 +288,35 @@ def create_voucher(
         for item_in in all_voucher_items_to_create_across_batch:
             consolidated_quantities[item_in.product_id] = consolidated_quantities.get(item_in.product_id, 0) + item_in.quantity
 
-        products = db.query(models.Stock).filter(models.Stock.id.in_(list(all_product_ids_across_batch))).with_for_update().all()
+        locking = inventory.CHECKOUT_STOCK_MODE == "locking"
+        stock_query = db.query(models.Stock, pricing.effective_price(now).label("effective_price"))\
+            .filter(models.Stock.id.in_(list(all_product_ids_across_batch))).order_by(models.Stock.id)
+        if locking:
+            stock_query = stock_query.with_for_update(of=models.Stock)
+        rows = stock_query.all()
+        products = [product for product, _ in rows]
         product_map = {p.id: p for p in products}
+        product_names = {p.id: p.name for p in products}
+        price_map = {product.id: effective_price for product, effective_price in rows}
 
         if len(products) != len(all_product_ids_across_batch):
             found_ids = {p.id for p in products}
             missing_ids = all_product_ids_across_batch - found_ids
             raise HTTPException(status_code=404, detail=f"One or more products not found: {list(missing_ids)}")
 
-        now = datetime.utcnow()
         for product_id, requested_quantity in consolidated_quantities.items():
             product = product_map.get(product_id)
             if product.quantity < requested_quantity:
                 raise HTTPException(status_code=400, detail=f"Insufficient stock for '{product.name}'. Available: {product.quantity}, Requested across batch: {requested_quantity}")
-            # Temporarily decrement quantity for validation of subsequent vouchers in the same batch
-            product.quantity -= requested_quantity # Decrement here for the whole batch
+            if locking:
+                # The row is locked, so decrement it here for the whole batch (written at commit)
+                product.quantity -= requested_quantity
 
-        created_vouchers = []
-        for single_voucher_request in batch_data.vouchers:
+        # 2. Build every header and item row in memory
+        voucher_rows = []
+        voucher_item_rows = [] # One list of item dicts per voucher
+        sales_totals = {} # product_id -> (quantity, revenue) for the product_sales summary
+        for index, single_voucher_request in enumerate(batch_data.vouchers):
             voucher_items_for_this_voucher = []
             subtotal_for_this_voucher = 0
 
@@ -198,15 +324,13 @@ def create_voucher(
             for item_in in single_voucher_request.items:
                 product = product_map.get(item_in.product_id) # Get from the already fetched and updated map
                 
-                price_for_this_sale = product.price
-                if product.discount_percent and product.discount_percent > 0:
-                    is_after_start = product.discount_start_date is None or now >= product.discount_start_date
-                    is_before_end = product.discount_end_date is None or now <= product.discount_end_date
-                    if is_after_start and is_before_end:
-                        price_for_this_sale = product.price * (1 - product.discount_percent / 100)
+                price_for_this_sale = price_map[product.id] # Discount already applied by the database
                 
                 item_subtotal = price_for_this_sale * item_in.quantity
                 subtotal_for_this_voucher += item_subtotal
+
+                sold_so_far, revenue_so_far = sales_totals.get(product.id, (0, 0.0))
+                sales_totals[product.id] = (sold_so_far + item_in.quantity, revenue_so_far + item_subtotal)
                 
                 voucher_items_for_this_voucher.append({
                     "product_id": product.id,
@@ -222,71 +346,115 @@ def create_voucher(
             if final_amount < 0:
                 final_amount = 0
 
-            new_voucher = models.Voucher(
-                voucher_number=f"INV-{datetime.utcnow().strftime('%Y%m%d-%H%M%S%f')}",
-                total_amount=final_amount,
-                total_discount=total_calculated_discount,
-                discount_percentage=single_voucher_request.discount_percentage,
-                discount_amount=single_voucher_request.discount_amount,
-                staff_id=current_user.id,
-                customer_id=single_voucher_request.customer_id,
-                delivery_address=single_voucher_request.delivery_address
-            )
-            db.add(new_voucher)
-            db.flush() 
-
-            for item_data in voucher_items_for_this_voucher:
-                new_item = models.VoucherItem(
-                    voucher_id=new_voucher.id,
-                    product_id=item_data["product_id"],
-                    quantity=item_data["quantity"],
-                    price_at_sale=item_data["price_at_sale"],
-                    subtotal=item_data["subtotal"]
-                )
-                db.add(new_item)
-            
-            created_vouchers.append(new_voucher)
+            voucher_rows.append({
+                "voucher_number": voucher_numbers_for_batch[index],
+                "total_amount": final_amount,
+                "total_discount": total_calculated_discount,
+                "discount_percentage": single_voucher_request.discount_percentage,
+                "discount_amount": single_voucher_request.discount_amount,
+                "created_at": now,
+                "staff_id": current_user.id,
+                "customer_id": single_voucher_request.customer_id,
+                "delivery_address": single_voucher_request.delivery_address
+            })
+            voucher_item_rows.append(voucher_items_for_this_voucher)
 
-        # 4. Update real stock quantities once (already done in step 1, now just mark last_sold_at for all affected products)
-        for product_id in all_product_ids_across_batch:
-            product_map.get(product_id).last_sold_at = datetime.utcnow()
+        # 3. Insert all headers in one multi-row INSERT ... RETURNING id, then all items in one INSERT
+        # Voucher numbers are unique (see voucher_numbers.py), so RETURNING them maps ids back without relying on row order
+        inserted = db.execute(
+            insert(models.Voucher).returning(models.Voucher.voucher_number, models.Voucher.id),
+            voucher_rows
+        ).all()
+        ids_by_number = dict(inserted)
+        voucher_ids = [ids_by_number[row["voucher_number"]] for row in voucher_rows]
+        for voucher_id, items in zip(voucher_ids, voucher_item_rows):
+            for item_data in items:
+                item_data["voucher_id"] = voucher_id
+                item_data["created_at"] = now # Same partition as its voucher
+        db.execute(insert(models.VoucherItem), [item for items in voucher_item_rows for item in items])
 
-        db.commit()
+        # Customers for the response, in one query
+        customer_ids = {row["customer_id"] for row in voucher_rows if row["customer_id"]}
+        customers = {}
+        if customer_ids:
+            customers = {
+                customer.id: serializers.customer_to_dict(customer)
+                for customer in db.query(models.Customer).filter(models.Customer.id.in_(customer_ids))
+            }
 
-        # 5. Refresh and construct response
+        # 4. Construct the response from what was inserted; no re-reads
         response_vouchers = []
-        for v in created_vouchers:
-            db.refresh(v)
-            # Eagerly load relationships needed for the response
-            db.query(models.Voucher).filter_by(id=v.id).options(joinedload(models.Voucher.items).joinedload(models.VoucherItem.product), joinedload(models.Voucher.customer)).one()
-
-            items_out = []
-            for item in v.items:
-                items_out.append(schemas.VoucherItemOut(
-                    product_id=item.product.id, # Use item.product.id
-                    product_name=item.product.name if item.product else "N/A",
-                    quantity=item.quantity,
-                    price_at_sale=item.price_at_sale,
-                    subtotal=item.subtotal,
-                    total_quantity_sold=0 # Set to 0 for a new voucher creation
-                ))
-            
-            customer_out = schemas.CustomerOut.from_orm(v.customer) if v.customer else None
-
-            response_vouchers.append(schemas.VoucherOut(
-                id=v.id,
-                voucher_number=v.voucher_number,
-                total_amount=v.total_amount,
-                total_discount=v.total_discount or 0.0,
-                discount_percentage=v.discount_percentage or 0.0,
-                discount_amount=v.discount_amount or 0.0,
-                created_at=v.created_at,
-                staff_id=v.staff_id,
-                delivery_address=v.delivery_address,
-                items=items_out,
-                customer=customer_out
-            ))
-        return response_vouchers
+        for voucher_id, row, items in zip(voucher_ids, voucher_rows, voucher_item_rows):
+            response_vouchers.append({
+                "id": voucher_id,
+                "voucher_number": row["voucher_number"],
+                "total_amount": row["total_amount"],
+                "total_discount": row["total_discount"] or 0.0,
+                "discount_percentage": row["discount_percentage"] or 0.0,
+                "discount_amount": row["discount_amount"] or 0.0,
+                "created_at": row["created_at"],
+                "staff_id": row["staff_id"],
+                "delivery_address": row["delivery_address"],
+                "items": [{
+                    "product_id": item["product_id"],
+                    "product_name": product_names[item["product_id"]],
+                    "quantity": item["quantity"],
+                    "price_at_sale": item["price_at_sale"],
+                    "subtotal": item["subtotal"],
+                    "total_quantity_sold": 0 # Set to 0 for a new voucher creation
+                } for item in items],
+                "customer": customers.get(row["customer_id"])
+            })
+        # Receipts are rendered now, once, so reprints are a single lookup (see receipts.py)
+        receipts.store(db, response_vouchers)
+
+        # Pushed to the live dashboard and stock screens after the commit (see live_events.py)
+        live_events.publish(db, "sale", vouchers=[{
+            key: voucher[key] for key in ("id", "voucher_number", "total_amount", "staff_id", "created_at")
+        } for voucher in response_vouchers])
+
+        response = serializers.FastJSONResponse(response_vouchers, status_code=status.HTTP_201_CREATED)
+        idempotency.store(idempotency_record, response)
+        db.flush() # Writes the stored response now rather than at commit, after the stock locks
+
+        # 5. Update real stock quantities once, as late as possible (see inventory.py).
+        # From here on the stock rows are locked, so only the decrement and the shared
+        # counters follow, in the lock order inventory.py describes, and then the commit.
+        remaining = {} # product_id -> quantity left, for the live stock screens
+        if locking:
+            for product_id in all_product_ids_across_batch:
+                product_map.get(product_id).last_sold_at = now
+                remaining[product_id] = product_map.get(product_id).quantity
+        else:
+            short_product_id = inventory.decrement_stock(db, consolidated_quantities, now, remaining)
+            if short_product_id is not None:
+                # Another checkout sold it in the meantime; the rollback below undoes the inserts
+                available = db.query(models.Stock.quantity).filter(models.Stock.id == short_product_id).scalar()
+                raise HTTPException(status_code=400, detail=f"Insufficient stock for '{product_names[short_product_id]}'. Available: {available}, Requested across batch: {consolidated_quantities[short_product_id]}")
+
+        # Keep the per-product sales totals in step with this checkout
+        sales_summary.record_sales(db, sales_totals, now)
+
+        # Quantities and sales totals changed, so cached catalog pages are stale
+        etags.bump(db, "stock", spread=True)
+        dashboard_counters.add(
+            db,
+            total_revenue=sum(row["total_amount"] for row in voucher_rows),
+            vouchers_issued=len(voucher_rows),
+            products_in_stock=-sum(consolidated_quantities.values())
+        )
+        # Hourly/daily sales for the analytics charts (see sales_rollups.py)
+        sales_rollups.record(db, [
+            (now, current_user.id, row["total_amount"],
+             [(product_map[item["product_id"]].category_id, item["quantity"], item["subtotal"]) for item in items])
+            for row, items in zip(voucher_rows, voucher_item_rows)
+        ])
+        live_events.publish(db, "stock", items=[
+            {"id": product_id, "quantity": quantity} for product_id, quantity in sorted(remaining.items())
+        ])
+
+        db.commit()
+        return response
 
     except HTTPException as e:
         db.rollback()
@@ -0,0 +1,146 @@
+import argparse
+from collections import defaultdict
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Tuple
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from database import SessionLocal
+import models, voucher_partitions
+
+# Pre-aggregated sales per hour and per day, for charts over long ranges.
+# Checkout calls record() with the vouchers it just created; each voucher adds to the
+# (hour/day, staff, category) rows it touches, plus one "all categories" row per staff
+# (category_id = ALL_CATEGORIES) that carries whole-voucher figures, so voucher counts don't
+# double up when a basket spans several categories. Uncategorized products count under 0.
+# Line revenue is net of the voucher's discount, spread over its lines pro rata, so the
+# per-category rows add up to the voucher totals.
+# A year of daily data for one store is a few thousand rows, whatever the number of line items.
+# rebuild() recomputes a time range from the voucher history (`python sales_rollups.py --since ...`).
+
+GRANULARITIES = ("hour", "day")
+ALL_CATEGORIES = -1
+UNCATEGORIZED = 0
+FIGURES = ("revenue", "discount", "units", "voucher_count")
+WRITE_BATCH = 1000 # Rows per INSERT; keeps rebuilds under the bind-parameter limit
+
+def bucket_start(moment: datetime, granularity: str) -> datetime:
+    if granularity == "hour":
+        return moment.replace(minute=0, second=0, microsecond=0)
+    if granularity == "day":
+        return moment.replace(hour=0, minute=0, second=0, microsecond=0)
+    if granularity == "week":
+        day = moment.replace(hour=0, minute=0, second=0, microsecond=0)
+        return day - timedelta(days=day.weekday()) # Weeks start on Monday
+    if granularity == "month":
+        return moment.replace(day=1, hour=0, minute=0, second=0, microsecond=0)
+    raise ValueError(f"Unknown granularity '{granularity}'.")
+
+def _new_totals():
+    return {"revenue": 0.0, "discount": 0.0, "units": 0, "voucher_count": 0}
+
+def accumulate(totals: Dict[Tuple, dict], created_at: datetime, staff_id: int, total_amount: float, lines: Iterable[Tuple]):
+    """
+    Adds one voucher to `totals` ({(granularity, bucket, staff_id, category_id): figures}).
+    `lines` are (category_id, quantity, subtotal) tuples.
+    """
+    lines = list(lines)
+    subtotal = sum(line_subtotal for _, _, line_subtotal in lines)
+    net_ratio = (total_amount or 0) / subtotal if subtotal else 0.0
+    staff_id = staff_id or 0
+
+    per_category = defaultdict(_new_totals)
+    for category_id, quantity, line_subtotal in lines:
+        figures = per_category[category_id or UNCATEGORIZED]
+        figures["revenue"] += line_subtotal * net_ratio
+        figures["discount"] += line_subtotal * (1 - net_ratio)
+        figures["units"] += quantity
+    per_category[ALL_CATEGORIES] = {
+        "revenue": total_amount or 0.0,
+        "discount": subtotal - (total_amount or 0.0),
+        "units": sum(quantity for _, quantity, _ in lines),
+    }
+
+    for granularity in GRANULARITIES:
+        bucket = bucket_start(created_at, granularity)
+        for category_id, figures in per_category.items():
+            row = totals.setdefault((granularity, bucket, staff_id, category_id), _new_totals())
+            row["revenue"] += figures["revenue"]
+            row["discount"] += figures["discount"]
+            row["units"] += figures["units"]
+            row["voucher_count"] += 1
+
+def _write(db: Session, totals: Dict[Tuple, dict], replace: bool = False):
+    """Upserts the rows in key order (so concurrent checkouts lock them in the same order), adding or replacing."""
+    if not totals:
+        return
+    insert = postgresql.insert if db.get_bind().dialect.name == "postgresql" else sqlite.insert
+    table = models.SalesRollup.__table__
+    rows = [
+        {"granularity": granularity, "bucket": bucket, "staff_id": staff_id, "category_id": category_id, **figures}
+        for (granularity, bucket, staff_id, category_id), figures in sorted(totals.items())
+    ]
+    for start in range(0, len(rows), WRITE_BATCH):
+        stmt = insert(table).values(rows[start:start + WRITE_BATCH])
+        db.execute(stmt.on_conflict_do_update(
+            index_elements=[table.c.granularity, table.c.bucket, table.c.staff_id, table.c.category_id],
+            set_={name: stmt.excluded[name] if replace else table.c[name] + stmt.excluded[name] for name in FIGURES}
+        ))
+
+def record(db: Session, vouchers: Iterable[Tuple]):
+    """
+    Adds freshly created vouchers to the rollups. Call inside the checkout transaction.
+    `vouchers` are (created_at, staff_id, total_amount, lines) with lines as in accumulate().
+    """
+    totals = {}
+    for created_at, staff_id, total_amount, lines in vouchers:
+        accumulate(totals, created_at, staff_id, total_amount, lines)
+    _write(db, totals)
+
+def rebuild(db: Session, since: datetime, until: datetime, batch_size: int = 5000) -> int:
+    """
+    Recomputes the rollups for whole days in [since, until) from the voucher history. Returns the
+    number of rows written. Checkouts only ever add to the current hour and day, so keep `until`
+    at or before the start of today (the default) while the store is open.
+    """
+    since, until = bucket_start(since, "day"), bucket_start(until, "day")
+    db.query(models.SalesRollup).filter(
+        models.SalesRollup.bucket >= since, models.SalesRollup.bucket < until
+    ).delete(synchronize_session=False)
+
+    totals = {}
+    # Archived months too, so rebuilding an old range doesn't empty it
+    for Voucher, VoucherItem in voucher_partitions.history_tables(db):
+        lines = db.query(
+            Voucher.id, Voucher.created_at, Voucher.staff_id, Voucher.total_amount,
+            models.Stock.category_id, VoucherItem.quantity, VoucherItem.subtotal
+        ).join(VoucherItem, VoucherItem.voucher_id == Voucher.id)\
+         .outerjoin(models.Stock, models.Stock.id == VoucherItem.product_id)\
+         .filter(Voucher.created_at >= since, Voucher.created_at < until)\
+         .order_by(Voucher.id).yield_per(batch_size)
+
+        current, voucher_lines = None, []
+        for voucher_id, created_at, staff_id, total_amount, category_id, quantity, subtotal in lines:
+            if current is not None and current[0] != voucher_id:
+                accumulate(totals, *current[1:], voucher_lines)
+                voucher_lines = []
+            current = (voucher_id, created_at, staff_id, total_amount)
+            voucher_lines.append((category_id, quantity or 0, subtotal or 0.0))
+        if current is not None:
+            accumulate(totals, *current[1:], voucher_lines)
+
+    _write(db, totals, replace=True)
+    db.commit()
+    return len(totals)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Rebuild the hourly/daily sales rollups from voucher history.")
+    parser.add_argument("--since", type=datetime.fromisoformat, required=True, help="First day to rebuild, e.g. 2025-01-01")
+    parser.add_argument("--until", type=datetime.fromisoformat, default=datetime.utcnow(), help="Day to stop before (default: today)")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        rows = rebuild(db, args.since, args.until)
+        print(f"✅ Rebuilt {rows} rollup rows from {args.since.date()} up to {bucket_start(args.until, 'day').date()}.")
+    finally:
+        db.close()
@@ -0,0 +1,107 @@
+import sys
+from datetime import datetime
+from typing import Dict, Tuple
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from database import SessionLocal
+import models, voucher_partitions
+
+# The product_sales table holds one running total per product so that the stock
+# and voucher screens never have to aggregate the whole voucher_items table.
+# Checkout keeps it current; rebuild()/verify() exist for repairs and audits.
+
+def record_sales(db: Session, totals: Dict[int, Tuple[int, float]], sold_at: datetime):
+    """
+    Adds {product_id: (quantity, revenue)} to the running totals.
+    Must be called inside the checkout transaction. It is one INSERT ... ON CONFLICT DO UPDATE
+    that increments in the database, in product id order, so concurrent checkouts of the
+    same product cannot lose an update and don't need the stock rows to be locked first.
+    """
+    if not totals:
+        return
+
+    dialect = db.get_bind().dialect.name
+    insert = postgresql.insert if dialect == "postgresql" else sqlite.insert
+    table = models.ProductSales.__table__
+    stmt = insert(table).values([
+        {"product_id": product_id, "total_sold": totals[product_id][0], "total_revenue": totals[product_id][1], "last_sold_at": sold_at}
+        for product_id in sorted(totals)
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[table.c.product_id],
+        set_={
+            "total_sold": table.c.total_sold + stmt.excluded.total_sold,
+            "total_revenue": table.c.total_revenue + stmt.excluded.total_revenue,
+            "last_sold_at": stmt.excluded.last_sold_at,
+        }
+    ))
+
+def _aggregate_from_history(db: Session) -> Dict[int, dict]:
+    """Recomputes the totals the slow way, straight from voucher_items (archived months included)."""
+    history = {}
+    for Voucher, VoucherItem in voucher_partitions.history_tables(db):
+        rows = db.query(
+            VoucherItem.product_id,
+            func.sum(VoucherItem.quantity).label("total_sold"),
+            func.sum(VoucherItem.subtotal).label("total_revenue"),
+            func.max(Voucher.created_at).label("last_sold_at")
+        ).join(Voucher, Voucher.id == VoucherItem.voucher_id)\
+         .group_by(VoucherItem.product_id).all()
+        for row in rows:
+            totals = history.setdefault(row.product_id, {"total_sold": 0, "total_revenue": 0.0, "last_sold_at": None})
+            totals["total_sold"] += int(row.total_sold or 0)
+            totals["total_revenue"] += float(row.total_revenue or 0)
+            if row.last_sold_at is not None and (totals["last_sold_at"] is None or row.last_sold_at > totals["last_sold_at"]):
+                totals["last_sold_at"] = row.last_sold_at
+    return history
+
+def rebuild(db: Session) -> int:
+    """Throws away the summary and recomputes it from the full sales history."""
+    db.query(models.ProductSales).delete(synchronize_session=False)
+    history = _aggregate_from_history(db)
+    db.bulk_insert_mappings(models.ProductSales, [
+        {"product_id": product_id, **totals} for product_id, totals in history.items()
+    ])
+    db.commit()
+    return len(history)
+
+def verify(db: Session, tolerance: float = 0.01):
+    """Returns a list of (product_id, expected, actual) for every product whose summary has drifted."""
+    expected = {
+        product_id: (totals["total_sold"], totals["total_revenue"])
+        for product_id, totals in _aggregate_from_history(db).items()
+    }
+    actual = {
+        row.product_id: (row.total_sold, row.total_revenue)
+        for row in db.query(models.ProductSales).all()
+    }
+
+    mismatches = []
+    for product_id in set(expected) | set(actual):
+        exp_sold, exp_revenue = expected.get(product_id, (0, 0.0))
+        act_sold, act_revenue = actual.get(product_id, (0, 0.0))
+        if exp_sold != act_sold or abs(exp_revenue - act_revenue) > tolerance:
+            mismatches.append((product_id, (exp_sold, exp_revenue), (act_sold, act_revenue)))
+    return mismatches
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else "verify"
+    db = SessionLocal()
+    try:
+        if command == "rebuild":
+            count = rebuild(db)
+            print(f"✅ Rebuilt sales summary for {count} products.")
+        elif command == "verify":
+            mismatches = verify(db)
+            if not mismatches:
+                print("✅ Sales summary matches voucher history.")
+            else:
+                for product_id, expected, actual in mismatches:
+                    print(f"❌ Product {product_id}: expected (sold, revenue)={expected}, found {actual}")
+                sys.exit(1)
+        else:
+            print("Usage: python sales_summary.py [rebuild|verify]")
+            sys.exit(2)
+    finally:
+        db.close()
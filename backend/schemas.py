@@ -1,5 +1,5 @@
 from pydantic import BaseModel
-from typing import List, Optional
+from typing import Dict, List, Optional
 from datetime import datetime
 
 # --- TOKEN SCHEMAS ---
@@ -60,9 +60,10 @@ class CustomerOut(CustomerBase):
 # Pagination Wrapper for Customers
 class CustomerPaginationResponse(BaseModel):
     items: List[CustomerOut]
-    total: int
+    total: Optional[int] = None # None in cursor mode unless include_total=true
     page: int
     size: int
+    next_cursor: Optional[str] = None
 
 class CustomerUpdate(BaseModel):
     name: Optional[str] = None
@@ -104,6 +105,7 @@ class StockOut(StockBase):
     id: int
     category: Optional[CategoryOut] = None 
     images: List[str] = [] 
+    thumbnails: Dict[str, Dict[str, str]] = {} # original image path -> {width: thumbnail path}
     last_sold_at: Optional[datetime] = None
     created_at: datetime
     updated_at: datetime
@@ -117,9 +119,31 @@ class StockOut(StockBase):
 # Pagination Wrapper
 class StockPaginationResponse(BaseModel):
     items: List[StockOut]
-    total: int
+    total: Optional[int] = None # None in cursor mode unless include_total=true
     page: int
     size: int
+    next_cursor: Optional[str] = None
+
+# Typeahead search result
+class StockSearchResult(BaseModel):
+    id: int
+    name: str
+    price: float
+    quantity: int
+    score: float
+
+# Bulk import report
+class StockImportError(BaseModel):
+    row: int
+    name: Optional[str] = None
+    error: str
+
+class StockImportResult(BaseModel):
+    processed: int
+    inserted: int
+    updated: int
+    failed: int
+    errors: List[StockImportError]
 
 # --- VOUCHER / SALES SCHEMAS ---
 class VoucherItemCreate(BaseModel):
@@ -165,6 +189,7 @@ class VoucherOut(BaseModel):
 # Pagination Wrapper for Vouchers
 class VoucherPaginationResponse(BaseModel):
     items: List[VoucherOut]
-    total: int
+    total: Optional[int] = None # None in cursor mode unless include_total=true
     page: int
-    size: int
\ No newline at end of file
+    size: int
+    next_cursor: Optional[str] = None
\ No newline at end of file
@@ -0,0 +1,95 @@
+import re
+import threading
+from collections import defaultdict
+from sqlalchemy import func, literal, or_
+from sqlalchemy.orm import Session
+import models
+
+# Fuzzy product search for the cashier typeahead.
+# On PostgreSQL this uses pg_trgm: the GIN indexes from the trigram migration serve both
+# ILIKE '%term%' and the word-similarity operator (<%), and results are ranked by word_similarity().
+# Other databases (SQLite in tests) fall back to an in-process trigram index with the same scoring idea.
+
+SIMILARITY_THRESHOLD = 0.3 # pg_trgm's default
+
+def _escape_like(term: str) -> str:
+    return term.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+def search_products(db: Session, term: str, limit: int = 10):
+    """Returns a list of (Stock, score) pairs, best match first."""
+    term = term.strip().lower()
+    if not term:
+        return []
+    if db.get_bind().dialect.name == "postgresql":
+        return _search_postgres(db, term, limit)
+    return _search_fallback(db, term, limit)
+
+def _search_postgres(db: Session, term: str, limit: int):
+    score = func.word_similarity(term, models.Stock.name)
+    return db.query(models.Stock, score.label("score")).filter(or_(
+        models.Stock.name.ilike(f"%{_escape_like(term)}%", escape="\\"),
+        literal(term).op("<%")(models.Stock.name)
+    )).order_by(score.desc(), models.Stock.name).limit(limit).all()
+
+# --- Pure-Python fallback ---
+
+def trigrams(text: str) -> set:
+    """Trigrams the way pg_trgm builds them: per word, lowercased, padded with two spaces in front and one behind."""
+    grams = set()
+    for word in re.findall(r"[a-z0-9]+", text.lower()):
+        padded = f"  {word} "
+        for i in range(len(padded) - 2):
+            grams.add(padded[i:i + 3])
+    return grams
+
+class TrigramIndex:
+    """An inverted index from trigram to product ids."""
+
+    def __init__(self, rows):
+        self.names = {}
+        self.postings = defaultdict(set)
+        for product_id, name in rows:
+            self.names[product_id] = name or ""
+            for gram in trigrams(name or ""):
+                self.postings[gram].add(product_id)
+
+    def search(self, term: str, limit: int):
+        """Returns [(product_id, score)] ranked by the share of the term's trigrams found in the name."""
+        term_grams = trigrams(term)
+        if not term_grams:
+            return []
+
+        hits = defaultdict(int)
+        for gram in term_grams:
+            for product_id in self.postings.get(gram, ()):
+                hits[product_id] += 1
+
+        results = []
+        for product_id, shared in hits.items():
+            score = shared / len(term_grams)
+            is_substring = term in self.names[product_id]
+            if score >= SIMILARITY_THRESHOLD or is_substring:
+                results.append((product_id, score, is_substring))
+        results.sort(key=lambda r: (-r[1], not r[2], self.names[r[0]]))
+        return [(product_id, score) for product_id, score, _ in results[:limit]]
+
+_fallback_lock = threading.Lock()
+_fallback_index = None
+_fallback_signature = None
+
+def _search_fallback(db: Session, term: str, limit: int):
+    global _fallback_index, _fallback_signature
+
+    # Rebuild only when the catalog has changed since the index was built
+    signature = db.query(func.count(models.Stock.id), func.max(models.Stock.updated_at)).one()
+    with _fallback_lock:
+        if _fallback_index is None or tuple(signature) != _fallback_signature:
+            _fallback_index = TrigramIndex(db.query(models.Stock.id, models.Stock.name).all())
+            _fallback_signature = tuple(signature)
+        ranked = _fallback_index.search(term, limit)
+
+    if not ranked:
+        return []
+    products = db.query(models.Stock).filter(models.Stock.id.in_([pid for pid, _ in ranked])).all()
+    product_map = {p.id: p for p in products}
+    return [(product_map[pid], score) for pid, score in ranked if pid in product_map]
@@ -0,0 +1,92 @@
+import orjson
+from fastapi.responses import Response
+
+# Fast path for the big list responses.
+# Building a Pydantic model per row (and letting FastAPI validate it all again against
+# response_model) costs more CPU than the query itself at large page sizes. These helpers
+# go straight from ORM objects to plain dicts with exactly the StockOut / VoucherOut shape,
+# and FastJSONResponse turns them into bytes with orjson. Returning a Response from an
+# endpoint makes FastAPI skip response_model validation; the model is still used for the docs.
+# Column values are read from the instance __dict__ rather than through the (much slower)
+# instrumented attributes; callers pass freshly queried objects, so the columns are loaded.
+
+class FastJSONResponse(Response):
+    media_type = "application/json"
+
+    def render(self, content) -> bytes:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+
+def category_to_dict(category):
+    if category is None:
+        return None
+    return {"id": category.id, "name": category.name}
+
+def customer_to_dict(customer):
+    if customer is None:
+        return None
+    d = customer.__dict__
+    return {
+        "name": d.get("name"),
+        "phone": d.get("phone"),
+        "email": d.get("email"),
+        "address": d.get("address"),
+        "remark": d.get("remark"),
+        "id": d.get("id"),
+        "points": d.get("points"),
+        "created_at": d.get("created_at"),
+    }
+
+def stock_to_dict(stock, total_sold, effective_price, is_on_sale):
+    """Same fields as schemas.StockOut."""
+    d = stock.__dict__
+    return {
+        "name": d.get("name"),
+        "description": d.get("description"),
+        "price": d.get("price"),
+        "cost_price": d.get("cost_price"),
+        "quantity": d.get("quantity"),
+        "arrival_date": d.get("arrival_date"),
+        "discount_percent": d.get("discount_percent"),
+        "discount_start_date": d.get("discount_start_date"),
+        "discount_end_date": d.get("discount_end_date"),
+        "id": d.get("id"),
+        "category": category_to_dict(d.get("category")),
+        "images": list(d.get("images") or []),
+        "thumbnails": dict(d.get("thumbnails") or {}),
+        "last_sold_at": d.get("last_sold_at"),
+        "created_at": d.get("created_at"),
+        "updated_at": d.get("updated_at"),
+        "total_sold": int(total_sold or 0),
+        "is_on_sale": bool(is_on_sale),
+        "sale_price": effective_price if is_on_sale else None,
+    }
+
+def voucher_item_to_dict(item, total_quantity_sold=0):
+    """Same fields as schemas.VoucherItemOut."""
+    d = item.__dict__
+    product = item.product
+    return {
+        "product_id": d.get("product_id"),
+        "product_name": product.__dict__.get("name") if product else "N/A",
+        "quantity": d.get("quantity"),
+        "price_at_sale": d.get("price_at_sale"),
+        "subtotal": d.get("subtotal"),
+        "total_quantity_sold": total_quantity_sold,
+    }
+
+def voucher_to_dict(voucher, items):
+    """Same fields as schemas.VoucherOut; `items` are already-built item dicts."""
+    d = voucher.__dict__
+    return {
+        "id": d.get("id"),
+        "voucher_number": d.get("voucher_number"),
+        "total_amount": d.get("total_amount"),
+        "total_discount": d.get("total_discount") or 0.0,
+        "discount_percentage": d.get("discount_percentage") or 0.0,
+        "discount_amount": d.get("discount_amount") or 0.0,
+        "created_at": d.get("created_at"),
+        "staff_id": d.get("staff_id"),
+        "delivery_address": d.get("delivery_address"),
+        "items": items,
+        "customer": customer_to_dict(voucher.customer),
+    }
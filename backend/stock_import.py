@@ -0,0 +1,217 @@
+import argparse
+import csv
+import io
+import json
+import sys
+from datetime import datetime
+from sqlalchemy import func
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from database import SessionLocal
+import models, etags, dashboard_counters, live_events
+
+# Bulk stock import from CSV or NDJSON.
+# Rows are read one at a time from the stream and written in chunks: each chunk resolves its
+# category names with one query, upserts all of its products with a single multi-row
+# INSERT ... ON CONFLICT (name) DO UPDATE, writes one summarized audit entry and commits.
+# Names are normalized (stripped, lowercased) exactly like POST /stock/ does. On update, a
+# column that is missing/empty in the file keeps its current value.
+
+CHUNK_SIZE = 1000
+
+FIELD_PARSERS = {
+    "price": float,
+    "cost_price": float,
+    "quantity": int,
+    "description": str,
+    "arrival_date": datetime.fromisoformat,
+    "discount_percent": float,
+    "discount_start_date": datetime.fromisoformat,
+    "discount_end_date": datetime.fromisoformat,
+}
+
+def read_rows(stream, fmt: str):
+    """Yields (row_number, dict) from a binary stream. Undecodable NDJSON lines yield (row_number, ValueError)."""
+    text = io.TextIOWrapper(stream, encoding="utf-8-sig", newline="")
+    if fmt == "csv":
+        for row_number, raw in enumerate(csv.DictReader(text), start=1):
+            yield row_number, raw
+    elif fmt == "ndjson":
+        for row_number, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                raw = json.loads(line)
+                if not isinstance(raw, dict):
+                    raise ValueError("each line must be a JSON object")
+                yield row_number, raw
+            except ValueError as e:
+                yield row_number, ValueError(f"Invalid JSON: {e}")
+    else:
+        raise ValueError(f"Unsupported import format '{fmt}'. Use 'csv' or 'ndjson'.")
+
+def parse_row(raw: dict) -> dict:
+    """Validates one input row and returns the values to import. Raises ValueError."""
+    name = str(raw.get("name") or "").strip().lower()
+    if not name:
+        raise ValueError("Stock item name cannot be empty.")
+
+    parsed = {"name": name}
+    for field, parser in FIELD_PARSERS.items():
+        value = raw.get(field)
+        if value is None or (isinstance(value, str) and not value.strip()):
+            parsed[field] = None
+            continue
+        try:
+            parsed[field] = parser(value.strip() if isinstance(value, str) else value)
+        except (ValueError, TypeError):
+            raise ValueError(f"Invalid value for '{field}': {value!r}")
+
+    if parsed["price"] is not None and parsed["price"] < 0:
+        raise ValueError("price cannot be negative.")
+    if parsed["quantity"] is not None and parsed["quantity"] < 0:
+        raise ValueError("quantity cannot be negative.")
+
+    category = raw.get("category")
+    parsed["category"] = str(category).strip().upper() if category and str(category).strip() else None
+    return parsed
+
+def _insert_for(db: Session):
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        return postgresql.insert
+    if dialect == "sqlite":
+        return sqlite.insert
+    raise RuntimeError(f"Bulk import is not supported on '{dialect}'.")
+
+def _resolve_categories(db: Session, insert, names: set) -> dict:
+    """Returns {NAME: id}, creating any categories that don't exist yet."""
+    if not names:
+        return {}
+    existing = dict(db.query(models.Category.name, models.Category.id).filter(models.Category.name.in_(names)).all())
+    missing = names - set(existing)
+    if missing:
+        db.execute(insert(models.Category.__table__).values([{"name": n} for n in missing]).on_conflict_do_nothing())
+        etags.bump(db, "categories")
+        existing = dict(db.query(models.Category.name, models.Category.id).filter(models.Category.name.in_(names)).all())
+    return existing
+
+def _flush_chunk(db: Session, chunk: dict, user_id: int, report: dict):
+    """Writes one chunk ({name: (row_number, parsed_row)}) in a single transaction."""
+    insert = _insert_for(db)
+    now = datetime.utcnow()
+
+    category_ids = _resolve_categories(db, insert, {row["category"] for _, row in chunk.values() if row["category"]})
+    # Locked (in id order, like checkout) so the quantity change for the dashboard counters is exact
+    existing_quantities = dict(db.query(models.Stock.name, models.Stock.quantity).filter(models.Stock.name.in_(list(chunk)))
+                               .order_by(models.Stock.id).with_for_update().all())
+    existing_names = set(existing_quantities)
+
+    values = []
+    for name, (row_number, row) in chunk.items():
+        if name not in existing_names and row["price"] is None:
+            report["errors"].append({"row": row_number, "name": name, "error": "price is required for new items."})
+            continue
+        is_new = name not in existing_names
+        values.append({
+            "name": name,
+            "price": row["price"],
+            "cost_price": row["cost_price"],
+            "quantity": row["quantity"] if row["quantity"] is not None or not is_new else 0,
+            "description": row["description"],
+            "arrival_date": row["arrival_date"],
+            "discount_percent": row["discount_percent"] if row["discount_percent"] is not None or not is_new else 0,
+            "discount_start_date": row["discount_start_date"],
+            "discount_end_date": row["discount_end_date"],
+            "category_id": category_ids.get(row["category"]),
+            "images": [],
+            "created_at": now,
+            "updated_at": now,
+        })
+    if not values:
+        return
+
+    stock = models.Stock.__table__
+    stmt = insert(stock).values(values)
+    keep_if_missing = list(FIELD_PARSERS) + ["category_id"]
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[stock.c.name],
+        set_={**{col: func.coalesce(stmt.excluded[col], stock.c[col]) for col in keep_if_missing}, "updated_at": now}
+    )
+    changed = db.execute(stmt.returning(stock.c.id, stock.c.quantity)).all()
+
+    inserted = sum(1 for v in values if v["name"] not in existing_names)
+    updated = len(values) - inserted
+    report["inserted"] += inserted
+    report["updated"] += updated
+
+    db.add(models.AuditLog(
+        action="IMPORT_STOCK", table_name="stock", record_id=None,
+        new_value=json.dumps({
+            "inserted": inserted,
+            "updated": updated,
+            "first_row": min(row_number for row_number, _ in chunk.values()),
+            "last_row": max(row_number for row_number, _ in chunk.values()),
+        }),
+        user_id=user_id
+    ))
+    etags.bump(db, "stock")
+    dashboard_counters.add(db, products_in_stock=sum(
+        v["quantity"] - (existing_quantities.get(v["name"]) or 0)
+        for v in values if v["quantity"] is not None
+    ))
+    live_events.publish(db, "stock", items=[{"id": stock_id, "quantity": quantity} for stock_id, quantity in changed])
+    db.commit()
+
+def import_stock(db: Session, stream, fmt: str, user_id: int, chunk_size: int = CHUNK_SIZE) -> dict:
+    """Imports every row of the stream and returns a report with a per-row error list."""
+    report = {"processed": 0, "inserted": 0, "updated": 0, "failed": 0, "errors": []}
+    chunk = {}
+    try:
+        for row_number, raw in read_rows(stream, fmt):
+            report["processed"] += 1
+            try:
+                if isinstance(raw, Exception):
+                    raise raw
+                row = parse_row(raw)
+            except ValueError as e:
+                name = raw.get("name") if isinstance(raw, dict) else None
+                report["errors"].append({"row": row_number, "name": None if name is None else str(name), "error": str(e)})
+                continue
+            # A name repeated in the file: the later row wins
+            chunk.pop(row["name"], None)
+            chunk[row["name"]] = (row_number, row)
+            if len(chunk) >= chunk_size:
+                _flush_chunk(db, chunk, user_id, report)
+                chunk = {}
+        if chunk:
+            _flush_chunk(db, chunk, user_id, report)
+    except Exception:
+        db.rollback()
+        raise
+
+    report["failed"] = len(report["errors"])
+    return report
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Bulk import stock items from a CSV or NDJSON file.")
+    parser.add_argument("path")
+    parser.add_argument("--format", choices=["csv", "ndjson"], help="Defaults to the file extension.")
+    parser.add_argument("--user", default="admin", help="Username recorded in the audit log.")
+    parser.add_argument("--chunk-size", type=int, default=CHUNK_SIZE)
+    args = parser.parse_args()
+
+    fmt = args.format or ("ndjson" if args.path.endswith((".ndjson", ".jsonl")) else "csv")
+    db = SessionLocal()
+    try:
+        user = db.query(models.User).filter(models.User.username == args.user).first()
+        if not user:
+            print(f"❌ Unknown user '{args.user}'")
+            sys.exit(2)
+        with open(args.path, "rb") as f:
+            report = import_stock(db, f, fmt, user.id, args.chunk_size)
+        print(f"✅ Processed {report['processed']} rows: {report['inserted']} inserted, {report['updated']} updated, {report['failed']} failed.")
+        for error in report["errors"]:
+            print(f"❌ Row {error['row']} ({error['name']}): {error['error']}")
+    finally:
+        db.close()
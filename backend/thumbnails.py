@@ -0,0 +1,108 @@
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from database import SessionLocal
+import models, etags
+from image_store import BASE_DIR, THUMBNAIL_DIR
+
+# Background thumbnail generation for product images.
+# The stock endpoints call schedule() after their commit. Resizing runs in a separate process
+# pool, so API workers never spend CPU (or the GIL) on image work. The child processes only
+# read the original and write the thumbnails; the done-callback, back in the API process,
+# records the paths in Stock.thumbnails ({original_path: {width: thumbnail_path}}).
+# Originals are content-addressed, so thumbnails are too: a shared image is resized once.
+
+THUMBNAIL_WIDTHS = (160, 320, 640)
+THUMBNAIL_FORMAT = os.getenv("THUMBNAIL_FORMAT", "webp") # "webp" or "jpeg"
+THUMBNAIL_WORKERS = int(os.getenv("THUMBNAIL_WORKERS", "2"))
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            # "spawn" so the children don't inherit the API process's threads and DB connections
+            _executor = ProcessPoolExecutor(max_workers=THUMBNAIL_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        return _executor
+
+def shutdown():
+    global _executor
+    with _executor_lock:
+        if _executor is not None:
+            _executor.shutdown(wait=False, cancel_futures=True)
+            _executor = None
+
+def render_thumbnails(relative_path: str) -> dict:
+    """Runs in a worker process. Returns {width: thumbnail_path} for one original image."""
+    from PIL import Image, ImageOps
+
+    os.makedirs(THUMBNAIL_DIR, exist_ok=True)
+    stem = os.path.splitext(os.path.basename(relative_path))[0]
+    ext = ".webp" if THUMBNAIL_FORMAT == "webp" else ".jpg"
+    result = {}
+
+    with Image.open(os.path.join(BASE_DIR, relative_path)) as original:
+        original = ImageOps.exif_transpose(original)
+        for width in THUMBNAIL_WIDTHS:
+            target = os.path.join(THUMBNAIL_DIR, f"{stem}_{width}{ext}")
+            if not os.path.exists(target):
+                image = original.copy()
+                if image.width > width:
+                    image = image.resize((width, max(1, round(image.height * width / image.width))), Image.LANCZOS)
+                if ext == ".jpg" and image.mode not in ("RGB", "L"):
+                    image = image.convert("RGB")
+                tmp_target = target + ".tmp"
+                image.save(tmp_target, format=THUMBNAIL_FORMAT.upper(), quality=80)
+                os.replace(tmp_target, target)
+            result[str(width)] = os.path.relpath(target, BASE_DIR)
+    return result
+
+def _record(stock_id: int, relative_path: str, future):
+    """Done-callback (API process): stores the thumbnail paths next to Stock.images."""
+    try:
+        variants = future.result()
+    except Exception:
+        logger.exception("Thumbnail generation failed for %s", relative_path)
+        return
+
+    db = SessionLocal()
+    try:
+        stock = db.query(models.Stock).filter(models.Stock.id == stock_id).with_for_update().first()
+        if stock is None or relative_path not in (stock.images or []):
+            return # The product or the image was deleted meanwhile
+        thumbs = {path: value for path, value in (stock.thumbnails or {}).items() if path in stock.images}
+        thumbs[relative_path] = variants
+        stock.thumbnails = thumbs
+        etags.bump(db, "stock")
+        db.commit()
+    finally:
+        db.close()
+
+def schedule(stock_id: int, relative_paths):
+    """Queues thumbnail generation for the given images of a product."""
+    for relative_path in relative_paths or []:
+        future = _get_executor().submit(render_thumbnails, relative_path)
+        future.add_done_callback(lambda f, path=relative_path: _record(stock_id, path, f))
+
+if __name__ == "__main__":
+    # Backfill: generate thumbnails for every image that doesn't have them yet
+    db = SessionLocal()
+    try:
+        pending = []
+        for stock in db.query(models.Stock).filter(models.Stock.images.isnot(None)).yield_per(500):
+            missing = [path for path in stock.images or [] if path not in (stock.thumbnails or {})]
+            if missing:
+                pending.append((stock.id, missing))
+    finally:
+        db.close()
+
+    for stock_id, paths in pending:
+        schedule(stock_id, paths)
+    _get_executor().shutdown(wait=True)
+    print(f"✅ Generated thumbnails for {sum(len(paths) for _, paths in pending)} images.")
@@ -0,0 +1,57 @@
+import argparse
+from sqlalchemy.orm import Session
+from database import SessionLocal
+import models, auth
+
+# Role and status changes for staff accounts.
+# Both go through here so the cached principal (see auth.py) is invalidated in every API worker
+# in the same transaction as the change.
+# Usage: python users.py set-role <username> manager|staff
+#        python users.py deactivate|activate <username>
+
+ROLES = ("manager", "staff")
+
+def _get(db: Session, username: str) -> models.User:
+    user = db.query(models.User).filter(models.User.username == username).with_for_update().first()
+    if user is None:
+        raise ValueError(f"No user '{username}'.")
+    return user
+
+def set_role(db: Session, username: str, role: str) -> models.User:
+    if role not in ROLES:
+        raise ValueError(f"Role must be one of {', '.join(ROLES)}.")
+    user = _get(db, username)
+    user.role = role
+    auth.invalidate_user(db, username)
+    db.commit()
+    return user
+
+def set_active(db: Session, username: str, active: bool) -> models.User:
+    user = _get(db, username)
+    user.is_active = active
+    auth.invalidate_user(db, username)
+    db.commit()
+    return user
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Change a user's role or status.")
+    commands = parser.add_subparsers(dest="command", required=True)
+    role_command = commands.add_parser("set-role")
+    role_command.add_argument("username")
+    role_command.add_argument("role", choices=ROLES)
+    for name in ("deactivate", "activate"):
+        commands.add_parser(name).add_argument("username")
+    args = parser.parse_args()
+
+    db = SessionLocal()
+    try:
+        if args.command == "set-role":
+            set_role(db, args.username, args.role)
+            print(f"✅ {args.username} is now {args.role}.")
+        else:
+            set_active(db, args.username, args.command == "activate")
+            print(f"✅ {args.username} {args.command}d.")
+    except ValueError as e:
+        print(f"❌ {e}")
+    finally:
+        db.close()
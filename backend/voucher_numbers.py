@@ -0,0 +1,74 @@
+import os
+import threading
+from datetime import datetime
+from typing import List
+from sqlalchemy import select, update
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+import models
+
+# Voucher number allocation.
+# Numbers used to be the checkout timestamp, which collides when two workers check out in the
+# same microsecond. Now each one carries a sequence value that is unique across all processes:
+# a worker reserves a whole block of numbers with a single nextval() (models.voucher_number_seq
+# increments by VOUCHER_NUMBER_BLOCK) and hands them out from memory, so a checkout costs one
+# round trip per block instead of one per voucher. Sequences aren't transactional, so the
+# reservation never waits on (or holds up) other checkouts. Numbers left in a block when a
+# worker stops are skipped, so the sequence has gaps but never repeats.
+# On databases without sequences (SQLite in development) the block is reserved by bumping a
+# "voucher_number" row in change_counters in its own short transaction.
+#
+# VOUCHER_NUMBER_FORMAT is a str.format() template with:
+#   {store} -> STORE_CODE (e.g. "S01"), {date} -> checkout time (datetime, use format specs),
+#   {seq}   -> the sequence value (required; it is what makes the number unique)
+
+STORE_CODE = os.getenv("STORE_CODE", "")
+VOUCHER_NUMBER_FORMAT = os.getenv("VOUCHER_NUMBER_FORMAT", "INV-{store}{date:%Y%m%d}-{seq:08d}")
+
+if "{seq" not in VOUCHER_NUMBER_FORMAT:
+    raise RuntimeError("VOUCHER_NUMBER_FORMAT must contain {seq}, otherwise voucher numbers are not unique.")
+
+_lock = threading.Lock()
+_block = {"pid": None, "next": 0, "end": 0} # Numbers next..end-1 are reserved for this process
+
+def _reserve_block(db: Session) -> int:
+    """Reserves VOUCHER_NUMBER_BLOCK numbers and returns the first one."""
+    block = models.VOUCHER_NUMBER_BLOCK
+    if db.get_bind().dialect.name == "postgresql":
+        return db.execute(select(models.voucher_number_seq.next_value())).scalar()
+
+    counter = models.ChangeCounter.__table__
+    while True:
+        with db.get_bind().engine.begin() as connection:
+            last = connection.execute(
+                update(counter).where(counter.c.name == "voucher_number")
+                .values(version=counter.c.version + block).returning(counter.c.version)
+            ).scalar()
+            if last is not None:
+                return last - block + 1
+        try:
+            with db.get_bind().engine.begin() as connection:
+                connection.execute(counter.insert().values(name="voucher_number", version=block))
+            return 1
+        except IntegrityError:
+            continue # Another process created the row first; take the next block from it
+
+def next_numbers(db: Session, count: int) -> List[int]:
+    """Returns `count` unused sequence values, reserving new blocks only when this process runs out."""
+    numbers = []
+    with _lock:
+        if _block["pid"] != os.getpid():
+            # A block reserved before a fork would be shared with the parent; start afresh
+            _block.update(pid=os.getpid(), next=0, end=0)
+        while len(numbers) < count:
+            if _block["next"] >= _block["end"]:
+                start = _reserve_block(db)
+                _block.update(next=start, end=start + models.VOUCHER_NUMBER_BLOCK)
+            take = min(count - len(numbers), _block["end"] - _block["next"])
+            numbers.extend(range(_block["next"], _block["next"] + take))
+            _block["next"] += take
+    return numbers
+
+def allocate(db: Session, count: int, now: datetime) -> List[str]:
+    """Formatted voucher numbers for a checkout of `count` vouchers."""
+    return [VOUCHER_NUMBER_FORMAT.format(store=STORE_CODE, date=now, seq=seq) for seq in next_numbers(db, count)]
@@ -0,0 +1,177 @@
+import os
+import sys
+from datetime import date, datetime
+from typing import List, Optional, Tuple
+from sqlalchemy import MetaData, text
+from sqlalchemy.orm import Session, aliased
+from database import SessionLocal
+import models
+
+# Monthly partitions for vouchers / voucher_items (PostgreSQL, see migration a7e1d3f58c20).
+# Both tables are range-partitioned on created_at with one partition per month, named
+# <table>_YYYY_MM, and a voucher's items always live in the same month as the voucher.
+# Queries that filter on created_at (the /vouchers date filters, the dashboard ranges) only
+# touch the months they need; PostgreSQL prunes the rest at plan time.
+#
+# ensure_partitions() creates the coming PARTITION_MONTHS_AHEAD months ahead of time (run at
+# startup and from cron). If it didn't run for a while, sales of a month without a partition
+# land in the <table>_default partitions; the month is then created from those rows (moved out
+# of the default partition before the new one is attached), so the default stays empty.
+# archive_partitions() detaches months older than VOUCHER_RETENTION_MONTHS and attaches them
+# under archive.vouchers / archive.voucher_items, optionally on a cheaper tablespace
+# (VOUCHER_ARCHIVE_TABLESPACE). Live queries (voucher lists, receipts, dashboard ranges) stop
+# seeing them; find_archived_voucher() still reads them by voucher_number for old receipts.
+# Whatever needs the whole sales history (sales_summary, the dashboard reconcile, sales_rollups
+# rebuilds, profit_analytics, the "has been sold" check before deleting a product) runs its
+# query once per pair from history_tables(), which adds the archive to the live tables.
+# On other databases (SQLite in development) the tables aren't partitioned and all of this is a no-op.
+
+PARTITION_MONTHS_AHEAD = int(os.getenv("VOUCHER_PARTITION_MONTHS_AHEAD", "12"))
+VOUCHER_RETENTION_MONTHS = int(os.getenv("VOUCHER_RETENTION_MONTHS", "24"))
+VOUCHER_ARCHIVE_TABLESPACE = os.getenv("VOUCHER_ARCHIVE_TABLESPACE", "")
+
+# The archive parents, mapped like the live tables
+_archive_metadata = MetaData(schema="archive")
+ArchivedVoucher = aliased(models.Voucher, models.Voucher.__table__.to_metadata(_archive_metadata), adapt_on_names=True)
+ArchivedVoucherItem = aliased(models.VoucherItem, models.VoucherItem.__table__.to_metadata(_archive_metadata), adapt_on_names=True)
+
+def _add_months(month: date, months: int) -> date:
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+def is_partitioned(db: Session) -> bool:
+    if db.get_bind().dialect.name != "postgresql":
+        return False
+    return db.execute(text(
+        "SELECT EXISTS (SELECT 1 FROM pg_partitioned_table WHERE partrelid = 'public.vouchers'::regclass)"
+    )).scalar()
+
+def history_tables(db: Session) -> List[Tuple]:
+    """(Voucher, VoucherItem) entities for each tier of the sales history: the live tables, then the archive if there is one."""
+    tables = [(models.Voucher, models.VoucherItem)]
+    if is_partitioned(db):
+        tables.append((ArchivedVoucher, ArchivedVoucherItem))
+    return tables
+
+def _partition_months(db: Session, schema: str) -> List[date]:
+    """The months that currently have a partition under <schema>.vouchers."""
+    names = db.execute(text("""
+        SELECT child.relname FROM pg_inherits
+        JOIN pg_class parent ON parent.oid = pg_inherits.inhparent
+        JOIN pg_namespace ns ON ns.oid = parent.relnamespace
+        JOIN pg_class child ON child.oid = pg_inherits.inhrelid
+        WHERE ns.nspname = :schema AND parent.relname = 'vouchers'
+    """), {"schema": schema}).scalars().all()
+    months = []
+    for name in names:
+        try:
+            months.append(datetime.strptime(name, "vouchers_%Y_%m").date())
+        except ValueError:
+            continue # vouchers_default
+    return sorted(months)
+
+def _create_month(db: Session, month: date):
+    suffix = f"{month:%Y_%m}"
+    lower, upper = month.isoformat(), _add_months(month, 1).isoformat()
+    bounds = f"FOR VALUES FROM ('{lower}') TO ('{upper}')"
+    in_month = f"created_at >= '{lower}' AND created_at < '{upper}'"
+    stranded = db.execute(text(f"SELECT EXISTS (SELECT 1 FROM vouchers_default WHERE {in_month})")).scalar()
+    if not stranded:
+        for table in ("vouchers", "voucher_items"):
+            db.execute(text(f"CREATE TABLE IF NOT EXISTS {table}_{suffix} PARTITION OF {table} {bounds}"))
+        return
+
+    # PostgreSQL won't create a partition whose range the default partition has rows in, so the
+    # month is built as a plain table, the rows are moved into it and it is attached afterwards.
+    # Items go first both ways: their foreign key points at the vouchers parent.
+    for table in ("vouchers", "voucher_items"):
+        db.execute(text(f"CREATE TABLE {table}_{suffix} (LIKE {table} INCLUDING DEFAULTS INCLUDING CONSTRAINTS)"))
+        db.execute(text(f"INSERT INTO {table}_{suffix} SELECT * FROM {table}_default WHERE {in_month}"))
+    for table in ("voucher_items", "vouchers"):
+        db.execute(text(f"DELETE FROM {table}_default WHERE {in_month}"))
+    for table in ("vouchers", "voucher_items"):
+        db.execute(text(f"ALTER TABLE {table} ATTACH PARTITION {table}_{suffix} {bounds}"))
+
+def ensure_partitions(db: Session, now: datetime = None, months_ahead: int = PARTITION_MONTHS_AHEAD) -> int:
+    """Creates any missing partitions from this month to `months_ahead` months out. Returns how many months were added."""
+    if not is_partitioned(db):
+        return 0
+    this_month = (now or datetime.utcnow()).date().replace(day=1)
+    existing = set(_partition_months(db, "public"))
+    # Months that ended up in the default partition (say the cron stopped) get their own too
+    stranded = db.execute(text(
+        "SELECT DISTINCT date_trunc('month', created_at)::date FROM vouchers_default"
+    )).scalars().all()
+    months = {_add_months(this_month, offset) for offset in range(months_ahead + 1)} | set(stranded)
+    created = 0
+    for month in sorted(months - existing):
+        _create_month(db, month)
+        db.commit() # One month at a time, so the parent tables are locked only briefly
+        created += 1
+    return created
+
+def archive_partitions(db: Session, now: datetime = None, keep_months: int = VOUCHER_RETENTION_MONTHS) -> List[str]:
+    """Moves every month older than `keep_months` to the archive tier. Returns the archived partition names."""
+    if not is_partitioned(db):
+        return []
+    cutoff = _add_months((now or datetime.utcnow()).date().replace(day=1), -keep_months)
+    archived = []
+    for month in _partition_months(db, "public"):
+        if month >= cutoff:
+            break
+        suffix = f"{month:%Y_%m}"
+        bounds = f"FOR VALUES FROM ('{month.isoformat()}') TO ('{_add_months(month, 1).isoformat()}')"
+        # Items first: their foreign key points at the live vouchers parent, so it is dropped
+        # before the vouchers month leaves it
+        db.execute(text(f"ALTER TABLE voucher_items DETACH PARTITION voucher_items_{suffix}"))
+        foreign_keys = db.execute(text(
+            "SELECT conname FROM pg_constraint WHERE conrelid = CAST(:table AS regclass) AND contype = 'f' "
+            "AND confrelid = 'public.vouchers'::regclass"
+        ), {"table": f"public.voucher_items_{suffix}"}).scalars().all()
+        for name in foreign_keys:
+            db.execute(text(f'ALTER TABLE voucher_items_{suffix} DROP CONSTRAINT "{name}"'))
+        db.execute(text(f"ALTER TABLE vouchers DETACH PARTITION vouchers_{suffix}"))
+
+        for table in (f"vouchers_{suffix}", f"voucher_items_{suffix}"):
+            db.execute(text(f"ALTER TABLE {table} SET SCHEMA archive"))
+            if VOUCHER_ARCHIVE_TABLESPACE:
+                db.execute(text(f'ALTER TABLE archive.{table} SET TABLESPACE "{VOUCHER_ARCHIVE_TABLESPACE}"'))
+        db.execute(text(f"ALTER TABLE archive.vouchers ATTACH PARTITION archive.vouchers_{suffix} {bounds}"))
+        db.execute(text(f"ALTER TABLE archive.voucher_items ATTACH PARTITION archive.voucher_items_{suffix} {bounds}"))
+        db.commit() # One month at a time, so the parent tables are locked only briefly
+        archived.append(f"vouchers_{suffix}")
+    return archived
+
+def find_archived_voucher(db: Session, voucher_number: str) -> Optional[dict]:
+    """Reads one archived voucher with its items ({...voucher columns, "items": [...]}) or returns None."""
+    if not is_partitioned(db):
+        return None
+    voucher = db.execute(text("""
+        SELECT id, voucher_number, total_amount, total_discount, discount_percentage, discount_amount,
+               created_at, staff_id, customer_id, delivery_address
+        FROM archive.vouchers WHERE voucher_number = :number
+    """), {"number": voucher_number}).mappings().first()
+    if voucher is None:
+        return None
+    items = db.execute(text("""
+        SELECT item.product_id, stock.name AS product_name, item.quantity, item.price_at_sale, item.subtotal
+        FROM archive.voucher_items item LEFT JOIN stock ON stock.id = item.product_id
+        WHERE item.voucher_id = :id AND item.created_at = :created_at
+        ORDER BY item.id
+    """), {"id": voucher["id"], "created_at": voucher["created_at"]}).mappings().all()
+    return {**voucher, "items": [dict(item) for item in items]}
+
+if __name__ == "__main__":
+    command = sys.argv[1] if len(sys.argv) > 1 else ""
+    db = SessionLocal()
+    try:
+        if command == "ensure":
+            print(f"✅ Created partitions for {ensure_partitions(db)} new months.")
+        elif command == "archive":
+            archived = archive_partitions(db)
+            print(f"✅ Archived {len(archived)} months: {', '.join(archived) or '-'}")
+        else:
+            print("Usage: python voucher_partitions.py [ensure|archive]")
+            sys.exit(2)
+    finally:
+        db.close()
@@ -0,0 +1,59 @@
+import { useEffect, useRef } from 'react';
+import api from '../api';
+
+const RECONNECT_DELAY_MS = 3000;
+
+// Subscribes to the server's live event stream (GET /events/stream) while the component is mounted.
+// `handlers` maps event names ("stats", "sale", "stock", "stock_deleted", "resync")
+// to callbacks that receive the parsed event data.
+// The stream is opened with a single-use ticket (POST /events/ticket), so EventSource can't
+// reconnect by itself: on an error the hook fetches a new ticket, reopens the stream and calls
+// "resync", since events may have been missed in between.
+function useLiveEvents(handlers) {
+  const handlersRef = useRef(handlers);
+  useEffect(() => {
+    handlersRef.current = handlers;
+  });
+
+  useEffect(() => {
+    if (!localStorage.getItem('token')) return undefined;
+    const names = ['stats', 'sale', 'stock', 'stock_deleted', 'resync'];
+    let source = null;
+    let retryTimer = null;
+    let closed = false;
+
+    const connect = async (isReconnect) => {
+      const retry = () => {
+        if (!closed) retryTimer = setTimeout(() => connect(true), RECONNECT_DELAY_MS);
+      };
+      let ticket;
+      try {
+        ticket = (await api.post('/events/ticket')).data.ticket;
+      } catch {
+        retry();
+        return;
+      }
+      if (closed) return;
+      source = new EventSource(`${api.defaults.baseURL}/events/stream?ticket=${encodeURIComponent(ticket)}`);
+      names.forEach((name) => {
+        source.addEventListener(name, (event) => handlersRef.current[name]?.(JSON.parse(event.data)));
+      });
+      source.onopen = () => {
+        if (isReconnect) handlersRef.current.resync?.();
+      };
+      source.onerror = () => {
+        source.close();
+        retry();
+      };
+    };
+
+    connect(false);
+    return () => {
+      closed = true;
+      clearTimeout(retryTimer);
+      source?.close();
+    };
+  }, []);
+}
+
+export default useLiveEvents;
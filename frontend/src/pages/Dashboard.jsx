@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import api from '../api';
+import useLiveEvents from '../hooks/useLiveEvents';
 
 const Dashboard = ({ theme }) => {
   const [stats, setStats] = useState(null);
@@ -20,6 +21,12 @@ const Dashboard = ({ theme }) => {
     fetchStats();
   }, []);
 
+  // Kept current by the server's push channel; no re-polling
+  useLiveEvents({
+    stats: (totals) => { setStats(totals); setLoading(false); },
+    resync: () => api.get('/dashboard/stats').then((res) => setStats(res.data)).catch(() => {}),
+  });
+
   const currentTheme = theme === 'midnight' ? 'bg-[#1E293B] border-white/10' :
                        theme === 'slate' ? 'bg-[#475569] border-white/20' : 'bg-white border-slate-200';
   const accentColor = theme === 'midnight' ? 'text-sky-400' :
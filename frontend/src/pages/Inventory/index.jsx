@@ -19,6 +19,7 @@ import {
 import AdvancedSearch from "./AdvancedSearch";
 import Pagination from "~/components/Pagination";
 import usePrevious from "~/hooks/usePrevious";
+import useLiveEvents from "~/hooks/useLiveEvents";
 
 const InventoryIndex = () => {
   const [products, setProducts] = useState([]);
@@ -103,6 +104,18 @@ const InventoryIndex = () => {
 
   useEffect(() => { fetchProducts(); }, [fetchProducts]);
 
+  // Patch quantities on the current page as sales and edits happen elsewhere
+  useLiveEvents({
+    stock: ({ items }) => {
+      const quantities = new Map(items.map((item) => [item.id, item.quantity]));
+      setProducts((current) => current.map((product) =>
+        quantities.has(product.id) ? { ...product, quantity: quantities.get(product.id) } : product
+      ));
+    },
+    stock_deleted: ({ ids }) => setProducts((current) => current.filter((product) => !ids.includes(product.id))),
+    resync: () => fetchProducts(),
+  });
+
   const { showDialog } = useDialog();
   const handleDelete = async (stockId) => {
     showDialog(